@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+
+运行各项基准测试并输出结果报告。
+
+用法:
+  python benchmarks/run_benchmarks.py
+"""
+
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 启动路径不应加载的重量级模块
+HEAVY_MODULES = ["edge_tts", "ffmpeg", "numpy"]
+
+
+def _time_command(args: list, repeat: int) -> dict:
+    """多次运行CLI命令，统计耗时和导入的重量级模块"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=PROJECT_ROOT,
+                       capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+
+    # -X importtime 把每个导入的模块写到stderr
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    imported = sorted(
+        name for name in HEAVY_MODULES
+        if any(line.rstrip().endswith(f"| {name}") for line in result.stderr.splitlines())
+    )
+
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "heavy_imports": imported,
+    }
+
+
+def bench_startup(repeat: int = 5) -> dict:
+    """CLI启动耗时：--help、参数错误和--plan路径"""
+    cases = {
+        "help": ["fencing_trainer.py", "--help"],
+        "validation_error": ["fencing_trainer.py", "--mode", "stationary", "--position", "3", "--count", "0"],
+        "plan": ["fencing_trainer.py", "--mode", "stationary,lunge", "--position", "3,4,5",
+                 "--count", "50", "--plan"],
+    }
+    return {name: _time_command(args, repeat) for name, args in cases.items()}
+
+
+def bench_probe(count: int = 1000) -> dict:
+    """音频时长探测：进程内解析与ffprobe子进程对比"""
+    from src.audio_probe import probe_audio
+    from src.mp3_frames import build_info_frame
+
+    # MPEG-1 Layer III 128kbps 44.1kHz的空帧
+    frame = b"\xff\xfb\x90\x00" + bytes(413)
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        files = {
+            "mp3_xing": temp_path / "xing.mp3",
+            "mp3_frames": temp_path / "frames.mp3",
+        }
+        stream = frame * 200
+        files["mp3_xing"].write_bytes(build_info_frame(frame, 200, len(stream) + len(frame)) + stream)
+        files["mp3_frames"].write_bytes(stream)
+
+        for name, path in files.items():
+            start = time.perf_counter()
+            for _ in range(count):
+                probe_audio(path)
+            elapsed = time.perf_counter() - start
+            results[name] = {"probes": count, "total_ms": elapsed * 1000, "per_probe_us": elapsed / count * 1e6}
+
+        if shutil.which("ffprobe"):
+            repeat = 20
+            start = time.perf_counter()
+            for _ in range(repeat):
+                subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                                str(files["mp3_xing"])], capture_output=True)
+            elapsed = time.perf_counter() - start
+            results["ffprobe"] = {"probes": repeat, "total_ms": elapsed * 1000,
+                                  "per_probe_us": elapsed / repeat * 1e6}
+    return results
+
+
+def bench_loop_lag(programs: int = 4, seconds: float = 20.0, phrases: int = 40) -> dict:
+    """事件循环延迟：同步编码与异步编码（asyncio子进程）分别与模拟的网络合成并行"""
+    import asyncio
+    import numpy as np
+    from src.audio_processor import AudioProcessor
+    from src.loop_monitor import LoopLagMonitor
+
+    processor = AudioProcessor()
+    rng = np.random.default_rng(0)
+    samples = (0.1 * rng.standard_normal(int(seconds * processor.sample_rate))).astype(np.float32)
+
+    async def synthesize():
+        # 模拟网络合成：每个短语等待20毫秒的响应
+        for _ in range(phrases):
+            await asyncio.sleep(0.02)
+
+    async def workload(mode: str, output_dir: Path) -> dict:
+        async def encode(index: int):
+            output_path = output_dir / f"{mode}_{index}.mp3"
+            if mode == "sync":
+                processor.encode_pcm(samples, output_path)
+            else:
+                await processor.encode_pcm_async(samples, output_path)
+
+        start = time.perf_counter()
+        async with LoopLagMonitor() as monitor:
+            await asyncio.gather(synthesize(), *(encode(i) for i in range(programs)))
+        return dict(monitor.get_stats(), wall_ms=(time.perf_counter() - start) * 1000)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        return {mode: asyncio.run(workload(mode, Path(temp_dir))) for mode in ("sync", "async")}
+
+
+def bench_timeline(commands: int = 900, phrases: int = 30, repeat: int = 3) -> dict:
+    """时间线拼接：逐个追加、逐命令放置与按短语分组的向量化拼接对比"""
+    import numpy as np
+    from src.audio_processor import AudioProcessor
+    from src.pcm_cache import PCMCache
+
+    def best(func) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        processor = AudioProcessor(pcm_cache=PCMCache(cache_dir=temp_path / "pcm"))
+        rng = np.random.default_rng(0)
+        clips = []
+        for index in range(phrases):
+            samples = 0.1 * rng.standard_normal(int(rng.uniform(0.4, 2.5) * processor.sample_rate))
+            clips.append(processor.encode_pcm(samples.astype(np.float32), temp_path / f"clip_{index}.mp3"))
+        audio_files = [clips[index] for index in rng.integers(0, phrases, commands)]
+        gap = int(processor.silence_duration * processor.sample_rate)
+        processor.render_pcm(audio_files)  # 预先解码，只测拼接
+
+        def layout_loop():
+            offsets, position = [], 0
+            for i, audio_file in enumerate(audio_files):
+                length = len(processor.pcm_cache.get(audio_file))
+                offsets.append((position, position + length))
+                position += length + (gap if i < len(audio_files) - 1 else 0)
+            return offsets, position
+
+        def append():
+            pieces = []
+            for i, audio_file in enumerate(audio_files):
+                pieces.append(processor.pcm_cache.get(audio_file))
+                if i < len(audio_files) - 1:
+                    pieces.append(np.zeros(gap, dtype=np.float32))
+            return np.concatenate(pieces)
+
+        def per_command():
+            offsets, total = layout_loop()
+            output = np.zeros(total, dtype=np.float32)
+            for audio_file, (start, end) in zip(audio_files, offsets):
+                output[start:end] = processor.pcm_cache.get(audio_file)
+            return output
+
+        assert np.array_equal(per_command(), processor.render_pcm(audio_files))
+        results = {
+            "layout_loop": {"ms": best(layout_loop)},
+            "layout_cumsum": {"ms": best(lambda: processor.layout_starts(processor.clip_lengths(audio_files)))},
+            "append": {"ms": best(append)},
+            "per_command": {"ms": best(per_command)},
+            "vectorized": {"ms": best(lambda: processor.render_pcm(audio_files))},
+        }
+    results["layout_cumsum"]["speedup"] = results["layout_loop"]["ms"] / results["layout_cumsum"]["ms"]
+    for name in ("append", "per_command", "vectorized"):
+        results[name]["speedup"] = results["append"]["ms"] / results[name]["ms"]
+    return results
+
+
+def bench_batch_plans(programs: int = 10000, count: int = 25) -> dict:
+    """批量节目计划内存：逐命令Python对象（元组）与紧凑数组对比，用tracemalloc统计峰值和保留内存"""
+    import hashlib
+    import tracemalloc
+    from src.drill_sequence import DrillSequenceGenerator
+
+    generator = DrillSequenceGenerator(["stationary", "lunge"], ["3", "4", "5"], count=count)
+
+    def tuple_batch() -> list:
+        # 之前的表示：每个节目两个元组，每个静音时长一个float对象，摘要为十六进制字符串
+        plans, signatures = [], set()
+        for seed in range(programs * 10):
+            if len(plans) == programs:
+                break
+            plan = generator.generate(seed)
+            phrase_ids = tuple(plan.phrase_ids)
+            gaps = tuple(round(gap, 3) for gap in plan.gaps)
+            signature = hashlib.sha1(repr((phrase_ids, gaps)).encode("utf-8")).hexdigest()
+            if signature not in signatures:
+                signatures.add(signature)
+                plans.append((seed, phrase_ids, gaps))
+        return plans
+
+    results = {}
+    for name, build in (("tuples", tuple_batch), ("arrays", lambda: generator.generate_batch(programs, 0))):
+        tracemalloc.start()
+        start = time.perf_counter()
+        plans = build()
+        elapsed = time.perf_counter() - start
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            "programs": len(plans),
+            "peak_mb": peak / 1024 / 1024,
+            "retained_mb": retained / 1024 / 1024,
+            "bytes_per_program": retained / len(plans),
+            "seconds": elapsed,
+        }
+        del plans
+    results["arrays"]["reduction"] = results["tuples"]["retained_mb"] / results["arrays"]["retained_mb"]
+    return results
+
+
+def bench_soak(jobs: int = 2, seconds: float = 30.0, sizes: tuple = (5, 20)) -> dict:
+    """短时浸泡测试：固定并发的完整渲染任务（桩语音后端），完整参数见 benchmarks/soak_test.py"""
+    from benchmarks.soak_test import SoakTest
+
+    report = SoakTest(jobs=jobs, duration=seconds, sizes=list(sizes)).run()
+    results = {"throughput": report["throughput"], "resources": report["resources"]}
+    results.update((f"latency_{name}", stats) for name, stats in report["latency"].items())
+    return results
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "probe": bench_probe,
+    "loop_lag": bench_loop_lag,
+    "timeline": bench_timeline,
+    "batch_plans": bench_batch_plans,
+    "soak": bench_soak,
+}
+
+
+def print_report(results: dict):
+    """打印基准测试报告"""
+    for bench_name, cases in results.items():
+        print(f"=== {bench_name} ===")
+        for case_name, metrics in cases.items():
+            details = ", ".join(
+                f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in metrics.items()
+            )
+            print(f"  {case_name}: {details}")
+
+
+def main():
+    """运行全部基准测试"""
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    results = {}
+    for name in selected:
+        results[name] = BENCHMARKS[name]()
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
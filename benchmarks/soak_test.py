@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+渲染负载/浸泡测试
+
+在持续时长内保持N个并发渲染任务（每个任务是一次完整的CLI运行，独立进程），
+语音合成使用离线桩后端（直接写出静音MP3帧，可设置模拟的网络延迟），
+压力集中在缓存、解码/编码进程和临时目录上。记录吞吐量、任务延迟p50/p99、
+峰值内存、打开的文件描述符和子进程数，输出用于容量规划的报告。
+
+用法:
+  python benchmarks/soak_test.py --jobs 4 --duration 300 --sizes 5,20,50 --report soak.json
+  python benchmarks/soak_test.py --jobs 8 --duration 120 --trainer-args "--pipeline"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 桩后端输出的MP3帧：MPEG-2 Layer III 48kbps 24kHz单声道（与EdgeTTS输出格式相同），全零数据解码为静音
+STUB_FRAME = b"\xff\xf3\x64\xc0" + bytes(140)
+STUB_FRAME_SECONDS = 576 / 24000
+
+# ru_maxrss 在macOS上单位为字节，在Linux上为KB
+_MAXRSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+
+def stub_clip(text: str, seconds_per_char: float = 0.18, overhead: float = 0.2) -> bytes:
+    """
+    生成与文本长度相称的静音MP3片段（能通过片段校验）
+
+    Args:
+        text: 命令文本
+        seconds_per_char: 每字时长(秒)
+        overhead: 首尾额外时长(秒)
+
+    Returns:
+        MP3数据
+    """
+    from src.clip_validator import count_spoken_chars
+
+    duration = max(1, count_spoken_chars(text)) * seconds_per_char + overhead
+    return STUB_FRAME * max(1, round(duration / STUB_FRAME_SECONDS))
+
+
+def install_stub_tts(latency: float):
+    """
+    把TTSGenerator的合成替换为离线桩后端
+
+    Args:
+        latency: 每个短语的模拟合成延迟(秒)
+    """
+    from src.tts_generator import TTSGenerator
+
+    async def generate_audio(self, text: str, output_path: Optional[Path] = None) -> Path:
+        if output_path is None:
+            output_path = self.temp_dir / f"tts_{hash(text) % 1000000}.mp3"
+        await asyncio.sleep(latency)
+        Path(output_path).write_bytes(stub_clip(text))
+        return output_path
+
+    TTSGenerator.generate_audio = generate_audio
+
+
+def run_worker(argv: List[str]):
+    """
+    任务进程入口：安装桩后端后运行一次CLI，退出时把自身和子进程的峰值内存写到统计文件
+
+    Args:
+        argv: --tts-latency、--stats 以及 -- 之后的CLI参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tts-latency", type=float, default=0.0)
+    parser.add_argument("--stats", type=Path, required=True)
+    parser.add_argument("trainer_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    trainer_args = args.trainer_args[1:] if args.trainer_args[:1] == ["--"] else args.trainer_args
+
+    install_stub_tts(args.tts_latency)
+    import fencing_trainer
+
+    sys.argv = ["fencing_trainer.py"] + trainer_args
+    code = 0
+    try:
+        fencing_trainer.main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    finally:
+        args.stats.write_text(json.dumps({
+            "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_SCALE,
+            "children_maxrss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * _MAXRSS_SCALE,
+        }), encoding="utf-8")
+    sys.exit(code)
+
+
+class ProcessSampler:
+    """定期采样本进程所有子孙进程的内存、文件描述符和进程数（Linux读/proc，其它系统需要psutil）"""
+
+    def __init__(self, interval: float = 0.2, worker_name: str = "python"):
+        """
+        初始化采样器
+
+        Args:
+            interval: 采样间隔(秒)
+            worker_name: 任务进程的进程名前缀，其余子进程（ffmpeg等）计为子进程
+        """
+        self.interval = interval
+        self.worker_name = worker_name
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.samples: List[dict] = []
+        self.backend = "proc" if Path("/proc/self/stat").exists() else None
+        if self.backend is None:
+            try:
+                import psutil  # noqa: F401
+                self.backend = "psutil"
+            except ImportError:
+                pass
+
+    def _descendants_proc(self) -> List[tuple]:
+        """从/proc读取子孙进程的(进程名, RSS字节, 文件描述符数)"""
+        children: Dict[int, List[int]] = {}
+        info = {}
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                stat = Path(entry.path, "stat").read_text()
+            except OSError:
+                continue
+            # 进程名可能包含空格和括号，以最后一个右括号为界
+            name = stat[stat.index("(") + 1:stat.rindex(")")]
+            fields = stat[stat.rindex(")") + 2:].split()
+            pid = int(entry.name)
+            children.setdefault(int(fields[1]), []).append(pid)
+            info[pid] = (name, int(fields[21]) * self.page_size)
+
+        result = []
+        stack = list(children.get(os.getpid(), []))
+        while stack:
+            pid = stack.pop()
+            stack.extend(children.get(pid, []))
+            try:
+                fds = len(os.listdir(f"/proc/{pid}/fd"))
+            except OSError:
+                continue  # 进程已退出
+            result.append(info[pid] + (fds,))
+        return result
+
+    def _descendants_psutil(self) -> List[tuple]:
+        """用psutil读取子孙进程的(进程名, RSS字节, 文件描述符数)"""
+        import psutil
+
+        result = []
+        for process in psutil.Process().children(recursive=True):
+            try:
+                with process.oneshot():
+                    result.append((process.name(), process.memory_info().rss, process.num_fds()))
+            except psutil.Error:
+                continue
+        return result
+
+    def sample(self) -> Optional[dict]:
+        """采样一次，返回本次的汇总；不支持的平台返回None"""
+        if self.backend is None:
+            return None
+        processes = self._descendants_proc() if self.backend == "proc" else self._descendants_psutil()
+        workers = [p for p in processes if p[0].startswith(self.worker_name)]
+        snapshot = {
+            "time": time.perf_counter(),
+            "workers": len(workers),
+            "subprocesses": len(processes) - len(workers),
+            "ffmpeg": sum(1 for p in processes if p[0].startswith("ffmpeg")),
+            "rss": sum(p[1] for p in processes),
+            "fds": sum(p[2] for p in processes),
+            "max_worker_fds": max((p[2] for p in workers), default=0),
+        }
+        self.samples.append(snapshot)
+        return snapshot
+
+    async def run(self):
+        """持续采样，直到任务被取消"""
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def summary(self) -> Optional[dict]:
+        """汇总全部采样的峰值和平均值"""
+        if not self.samples:
+            return None
+        mean_rss = sum(s["rss"] for s in self.samples) / len(self.samples)
+        return {
+            "samples": len(self.samples),
+            "peak_rss_mb": max(s["rss"] for s in self.samples) / 1024 / 1024,
+            "mean_rss_mb": mean_rss / 1024 / 1024,
+            "peak_fds": max(s["fds"] for s in self.samples),
+            "peak_worker_fds": max(s["max_worker_fds"] for s in self.samples),
+            "peak_workers": max(s["workers"] for s in self.samples),
+            "peak_subprocesses": max(s["subprocesses"] for s in self.samples),
+            "peak_ffmpeg": max(s["ffmpeg"] for s in self.samples),
+        }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_stats(latencies: List[float]) -> dict:
+    """任务延迟统计(秒)"""
+    return {
+        "jobs": len(latencies),
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "mean": sum(latencies) / len(latencies),
+        "max": max(latencies),
+    }
+
+
+def host_memory() -> Optional[int]:
+    """主机物理内存(字节)，无法获取时返回None"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _dir_usage(path: Path) -> tuple:
+    """目录下的文件数和总字节数"""
+    files = size = 0
+    for file in path.rglob("*"):
+        if file.is_file():
+            files += 1
+            size += file.stat().st_size
+    return files, size
+
+
+class SoakTest:
+    """在持续时长内保持固定并发的渲染任务，收集延迟和资源数据"""
+
+    def __init__(self,
+                 jobs: int = 4,
+                 duration: float = 60.0,
+                 sizes: Optional[List[int]] = None,
+                 voices: str = "chinese_male",
+                 tts_latency: float = 0.05,
+                 trainer_args: Optional[List[str]] = None,
+                 work_dir: Optional[Path] = None,
+                 sample_interval: float = 0.2,
+                 verbose: bool = False):
+        """
+        初始化浸泡测试
+
+        Args:
+            jobs: 同时运行的任务数
+            duration: 持续发起新任务的时长(秒)，到时后等待进行中的任务完成
+            sizes: 任务规模（每个组合的攻击次数），按顺序轮流使用
+            voices: 每个任务生成的语音版本，逗号分隔
+            tts_latency: 桩后端每个短语的模拟合成延迟(秒)
+            trainer_args: 追加到每个任务的CLI参数，如 ["--pipeline"]
+            work_dir: 工作目录（任务的临时目录、缓存和输出），默认新建临时目录并在结束后删除
+            sample_interval: 资源采样间隔(秒)
+            verbose: 每个任务完成时打印一行
+        """
+        self.jobs = jobs
+        self.duration = duration
+        self.sizes = sizes or [5, 20]
+        self.voices = voices
+        self.tts_latency = tts_latency
+        self.trainer_args = trainer_args or []
+        self.work_dir = work_dir
+        self.verbose = verbose
+        self.sampler = ProcessSampler(sample_interval)
+        self.results: List[dict] = []
+
+    def _job_command(self, index: int, size: int, run_dir: Path) -> List[str]:
+        """第index个任务的命令行：每个任务使用不同的随机种子，内容互不相同，跳过渲染结果缓存"""
+        return [
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--tts-latency", str(self.tts_latency),
+            "--stats", str(run_dir / "stats" / f"job_{index:05d}.json"),
+            "--",
+            "--mode", "stationary,lunge", "--position", "3,4,5", "--count", str(size),
+            "--randomize", "--seed", str(index), "--voice", self.voices,
+            "-o", str(run_dir / "out" / f"job_{index:05d}.mp3"),
+            "--no-render-cache",
+        ] + self.trainer_args
+
+    async def _run_job(self, index: int, run_dir: Path, env: dict):
+        """运行一个任务并记录延迟、输出时长和峰值内存，输出文件统计后删除"""
+        from src.audio_probe import probe_audio
+
+        size = self.sizes[index % len(self.sizes)]
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *self._job_command(index, size, run_dir), cwd=PROJECT_ROOT, env=env,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        latency = time.perf_counter() - start
+
+        audio_seconds = output_bytes = 0.0
+        for path in (run_dir / "out").glob(f"job_{index:05d}*"):
+            info = probe_audio(path)
+            if info is not None:
+                audio_seconds += info.duration
+            output_bytes += path.stat().st_size
+            path.unlink()
+
+        stats_path = run_dir / "stats" / f"job_{index:05d}.json"
+        stats = json.loads(stats_path.read_text(encoding="utf-8")) if stats_path.exists() else {}
+        result = {
+            "index": index,
+            "size": size,
+            "start": start,
+            "latency": latency,
+            "ok": process.returncode == 0,
+            "audio_seconds": audio_seconds,
+            "output_bytes": output_bytes,
+            "maxrss": stats.get("maxrss", 0) + stats.get("children_maxrss", 0),
+        }
+        if not result["ok"]:
+            result["error"] = output.decode("utf-8", errors="replace").strip().splitlines()[-3:]
+        self.results.append(result)
+        if self.verbose:
+            status = "完成" if result["ok"] else f"失败: {' / '.join(result['error'])}"
+            print(f"  任务 {index}（次数 {size}）: {latency:.2f} 秒，{status}")
+
+    async def _run(self, run_dir: Path) -> float:
+        """固定数量的工作协程不断领取新任务，直到持续时长结束；返回总耗时"""
+        for name in ("out", "stats", "tmp"):
+            (run_dir / name).mkdir(parents=True, exist_ok=True)
+        # 任务的临时目录和缓存（CACHE_ROOT位于临时目录下）都放在工作目录中，不影响本机的真实缓存
+        env = dict(os.environ, TMPDIR=str(run_dir / "tmp"), PYTHONUNBUFFERED="1")
+        indices = iter(range(1 << 31))
+        start = time.perf_counter()
+        deadline = start + self.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self._run_job(next(indices), run_dir, env)
+
+        sampler = asyncio.ensure_future(self.sampler.run())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.jobs)))
+        finally:
+            sampler.cancel()
+        return time.perf_counter() - start
+
+    def run(self) -> dict:
+        """
+        运行浸泡测试
+
+        Returns:
+            容量规划报告
+        """
+        run_dir = self.work_dir or Path(tempfile.mkdtemp(prefix="fencing_soak_"))
+        try:
+            wall = asyncio.run(self._run(run_dir))
+            temp_files, temp_bytes = _dir_usage(run_dir / "tmp")
+        finally:
+            if self.work_dir is None:
+                shutil.rmtree(run_dir, ignore_errors=True)
+        return self.report(wall, temp_files, temp_bytes)
+
+    def report(self, wall: float, temp_files: int = 0, temp_bytes: int = 0) -> dict:
+        """汇总任务结果和资源采样"""
+        done = [r for r in self.results if r["ok"]]
+        failed = [r for r in self.results if not r["ok"]]
+        memory = host_memory()
+        peak_job_rss = max((r["maxrss"] for r in done), default=0)
+
+        report = {
+            "host": {
+                "cpus": os.cpu_count(),
+                "memory_mb": memory / 1024 / 1024 if memory else None,
+                "platform": sys.platform,
+                "sampler": self.sampler.backend,
+            },
+            "settings": {
+                "jobs": self.jobs,
+                "duration": self.duration,
+                "sizes": self.sizes,
+                "voices": self.voices,
+                "tts_latency": self.tts_latency,
+                "trainer_args": self.trainer_args,
+            },
+            "throughput": {
+                "completed": len(done),
+                "failed": len(failed),
+                "wall_seconds": wall,
+                "jobs_per_minute": len(done) / wall * 60 if wall else 0.0,
+                "audio_seconds": sum(r["audio_seconds"] for r in done),
+                "realtime_factor": sum(r["audio_seconds"] for r in done) / wall if wall else 0.0,
+                "output_mb": sum(r["output_bytes"] for r in done) / 1024 / 1024,
+            },
+            "latency": {},
+            "resources": dict(self.sampler.summary() or {},
+                              peak_job_rss_mb=peak_job_rss / 1024 / 1024,
+                              temp_files=temp_files,
+                              temp_mb=temp_bytes / 1024 / 1024),
+            "errors": [{"index": r["index"], "error": r["error"]} for r in failed[:10]],
+        }
+        if done:
+            report["latency"]["all"] = latency_stats([r["latency"] for r in done])
+            for size in self.sizes:
+                latencies = [r["latency"] for r in done if r["size"] == size]
+                if latencies:
+                    report["latency"][f"count={size}"] = latency_stats(latencies)
+            # 前一半与后一半的延迟对比：持续变慢说明有资源在累积（缓存增长、临时文件、泄漏）
+            ordered = sorted(done, key=lambda r: r["start"])
+            half = len(ordered) // 2
+            if half:
+                report["latency"]["first_half"] = latency_stats([r["latency"] for r in ordered[:half]])
+                report["latency"]["second_half"] = latency_stats([r["latency"] for r in ordered[half:]])
+        if memory and peak_job_rss:
+            # 按单个任务（含其ffmpeg子进程）的峰值内存估算，预留20%给系统
+            report["capacity"] = {"max_jobs_by_memory": int(memory * 0.8 // peak_job_rss)}
+        return report
+
+
+def print_soak_report(report: dict):
+    """打印浸泡测试报告"""
+    host, throughput, resources = report["host"], report["throughput"], report["resources"]
+    print("=== 浸泡测试 ===")
+    print(f"主机: {host['cpus']} 个CPU，内存 {host['memory_mb'] or 0:.0f} MB")
+    print(f"并发任务: {report['settings']['jobs']}，任务规模: {report['settings']['sizes']}，"
+          f"持续 {throughput['wall_seconds']:.1f} 秒")
+    print(f"完成 {throughput['completed']} 个，失败 {throughput['failed']} 个，"
+          f"吞吐量 {throughput['jobs_per_minute']:.1f} 个/分钟，"
+          f"音频 {throughput['audio_seconds']:.0f} 秒（实时倍率 {throughput['realtime_factor']:.1f}x）")
+    for name, stats in report["latency"].items():
+        print(f"延迟 {name}: p50 {stats['p50']:.2f} 秒，p99 {stats['p99']:.2f} 秒，"
+              f"最大 {stats['max']:.2f} 秒（{stats['jobs']} 个）")
+    if "peak_rss_mb" in resources:
+        print(f"内存: 峰值 {resources['peak_rss_mb']:.0f} MB，平均 {resources['mean_rss_mb']:.0f} MB，"
+              f"单任务峰值 {resources['peak_job_rss_mb']:.0f} MB")
+        print(f"文件描述符: 峰值 {resources['peak_fds']}（单任务 {resources['peak_worker_fds']}），"
+              f"子进程: 峰值 {resources['peak_subprocesses']}（ffmpeg {resources['peak_ffmpeg']}）")
+    else:
+        print(f"单任务峰值内存 {resources['peak_job_rss_mb']:.0f} MB（本平台不支持进程采样，请安装psutil）")
+    print(f"临时目录: {resources['temp_files']} 个文件，{resources['temp_mb']:.1f} MB")
+    if "capacity" in report:
+        print(f"按内存估算的最大并发任务数: {report['capacity']['max_jobs_by_memory']}")
+    for error in report["errors"]:
+        print(f"错误 (任务 {error['index']}): {' / '.join(error['error'])}")
+
+
+def main():
+    """解析参数并运行浸泡测试"""
+    if sys.argv[1:2] == ["--worker"]:
+        run_worker(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="渲染负载/浸泡测试（离线桩语音后端）")
+    parser.add_argument("--jobs", type=int, default=4, help="同时运行的任务数")
+    parser.add_argument("--duration", type=float, default=60.0, help="持续发起新任务的时长(秒)")
+    parser.add_argument("--sizes", type=str, default="5,20", help="任务规模（每个组合的攻击次数），逗号分隔，轮流使用")
+    parser.add_argument("--voice", type=str, default="chinese_male", help="每个任务生成的语音版本，逗号分隔")
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="桩后端每个短语的模拟合成延迟(秒)")
+    parser.add_argument("--trainer-args", type=str, default="", help="追加到每个任务的CLI参数，如 \"--pipeline\"")
+    parser.add_argument("--work-dir", type=Path, default=None, help="工作目录（保留缓存和临时文件），默认使用后删除的临时目录")
+    parser.add_argument("--sample-interval", type=float, default=0.2, help="资源采样间隔(秒)")
+    parser.add_argument("--report", type=Path, default=None, help="把JSON报告写到该文件")
+    parser.add_argument("--verbose", action="store_true", help="每个任务完成时打印一行")
+    args = parser.parse_args()
+
+    soak = SoakTest(
+        jobs=args.jobs,
+        duration=args.duration,
+        sizes=[int(size) for size in args.sizes.split(",")],
+        voices=args.voice,
+        tts_latency=args.tts_latency,
+        trainer_args=shlex.split(args.trainer_args),
+        work_dir=args.work_dir,
+        sample_interval=args.sample_interval,
+        verbose=args.verbose,
+    )
+    report = soak.run()
+    print_soak_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"报告已写入: {args.report}")
+    if report["throughput"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+缓存配置
+
+定义各级缓存的存放位置和容量预算。
+"""
+
+import os
+import socket
+import tempfile
+from pathlib import Path
+
+# 缓存根目录
+CACHE_ROOT = Path(tempfile.gettempdir()) / "fencing_trainer" / "cache"
+
+# 缓存设置
+CACHE_CONFIG = {
+    "clip_dir": CACHE_ROOT / "clips",  # TTS语音片段缓存目录
+    "job_dir": CACHE_ROOT / "jobs",  # 任务检查点目录
+    "pcm_dir": CACHE_ROOT / "pcm",  # 解码后PCM缓存目录
+    "pcm_max_bytes": 512 * 1024 * 1024,  # PCM缓存容量上限(字节)
+    "mp3_fragment_dir": CACHE_ROOT / "mp3_fragments",  # 预编码MP3帧片段目录
+    "mp3_fragment_max_bytes": 256 * 1024 * 1024,  # MP3帧片段缓存容量上限(字节)
+    "render_dir": CACHE_ROOT / "renders",  # 渲染结果缓存目录
+    "render_max_bytes": 1024 * 1024 * 1024,  # 渲染结果缓存容量上限(字节)
+    "render_max_age": 7 * 24 * 3600,  # 渲染结果保留时长(秒)
+    "program_dir": CACHE_ROOT / "programs",  # 编译后的节目定义缓存目录（按文件内容摘要）
+    "shared_clip_dir": os.environ.get("FENCING_SHARED_CACHE"),  # 渲染集群共享的片段缓存目录，None表示不共享
+    "shared_claim_lease": 120.0,  # 合成认领的租约时长(秒)，超时未发布时其它节点接手
+    "shared_poll_interval": 0.5,  # 等待其它节点发布时的轮询间隔(秒)
+    "node_name": os.environ.get("FENCING_NODE_NAME") or socket.gethostname(),  # 本节点名称，用于统计
+}
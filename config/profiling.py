@@ -0,0 +1,15 @@
+"""
+性能分析配置
+
+定义 --profile-run 的采样和报告参数，以及事件循环延迟监测的采样间隔。
+"""
+
+# 性能分析设置
+PROFILE_CONFIG = {
+    "sample_interval": 0.005,  # 调用栈采样间隔(秒)，用于生成火焰图
+    "slow_callback": 0.05,  # 事件循环中单次回调超过该时长(秒)视为阻塞
+    "top_n": 15,  # 每个阶段报告的内存分配位置数
+    "traceback_frames": 1,  # tracemalloc记录的调用栈深度
+    "summary_functions": 30,  # 摘要中列出的函数数（按累计耗时）
+    "loop_lag_interval": 0.01  # 事件循环延迟采样间隔(秒)
+}
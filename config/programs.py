@@ -0,0 +1,14 @@
+"""
+训练节目配置文件设置
+
+定义 --program 读取的节目定义文件格式、取值范围和 --watch 的轮询间隔。
+"""
+
+# 节目定义文件设置
+PROGRAM_CONFIG = {
+    "formats": {".toml": "toml", ".json": "json", ".yaml": "yaml", ".yml": "yaml"},  # 扩展名 -> 格式
+    "max_count": 50,  # 每段最多攻击次数（与 --count 一致）
+    "max_gap": 10.0,  # 命令间静音上限(秒)
+    "default_reminder_every": 20,  # 默认每多少次攻击提醒一次，0表示不提醒
+    "watch_interval": 1.0  # --watch 检查文件变化的间隔(秒)
+}
@@ -4,6 +4,8 @@
 定义EdgeTTS语音参数和音频设置。
 """
 
+import os
+
 # 语音配置
 VOICE_CONFIG = {
     "chinese": {
@@ -29,5 +31,63 @@ AUDIO_CONFIG = {
     "format": "mp3"  # 输出格式
 }
 
+# 语音合成调度设置
+SYNTHESIS_CONFIG = {
+    "max_concurrency": 4,  # 同时进行的合成请求数
+    "rate_limit": 8,  # 每个周期内允许发起的请求数
+    "rate_period": 1.0,  # 限速周期(秒)
+    "max_attempts": 3,  # 单个短语的最大合成尝试次数
+    "retry_backoff": 1.0  # 首次重试前的等待时间(秒)，之后每次翻倍
+}
+
+# 流式渲染流水线设置（--pipeline）
+PIPELINE_CONFIG = {
+    "synthesis_lookahead": 16,  # 合成阶段最多领先编码的短语数
+    "decode_queue_size": 8  # 已解码等待写入编码器的短语数上限
+}
+
+# 语音片段校验设置（时长按文本中需朗读的字符数估算）
+CLIP_VALIDATION_CONFIG = {
+    "min_duration": 0.2,  # 最短时长(秒)
+    "min_seconds_per_char": 0.05,  # 每字最短时长(秒)
+    "max_seconds_per_char": 1.0,  # 每字最长时长(秒)
+    "max_overhead": 1.5  # 首尾静音等额外时长上限(秒)
+}
+
+# 节奏设置（攻击周期：一个计数口令到下一个计数口令）
+CADENCE_CONFIG = {
+    "min_gap": 0.3  # --fixed-cadence 压缩周期末尾静音时的最短静音(秒)
+}
+
+# 变速设置（--tempo）
+TEMPO_CONFIG = {
+    "kinds": ("count", "hold", "return_position"),  # 变速作用的口令类型（攻击周期内的口令）
+    "min_factor": 0.5,  # 最小倍率
+    "max_factor": 2.0,  # 最大倍率，更快时口令难以听清
+    "auto_step": 0.05  # --tempo auto 计算的倍率向上取整到该步长，减少变速版本数
+}
+
+# macOS本地语音合成设置（MacTTSGenerator）
+MAC_TTS_CONFIG = {
+    "voice": "Ting-Ting",  # 中文女声
+    # 合成命令模板，{voice} {text} {output} {sample_rate} 在运行时替换，命令须把WAV写到{output}；
+    # 可用环境变量 FENCING_SAY_COMMAND 换成其它命令，例如在Linux上用 "espeak-ng -v cmn -w {output} {text}"
+    "command": os.environ.get("FENCING_SAY_COMMAND")
+               or "say -v {voice} --file-format=WAVE --data-format=LEI16@{sample_rate} -o {output} {text}",
+    "workers": None  # 同时运行的合成进程数，None表示CPU核数
+}
+
+# Google TTS备用语音合成设置（GTTSGenerator）
+GTTS_CONFIG = {
+    "base_url": "https://translate.google.com",  # 服务地址
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0 Safari/537.36",
+    "max_connections": 4,  # 连接池大小，所有请求复用
+    "batch_chars": 100,  # 合并请求的最大字符数（与gTTS单次请求的文本上限一致），0表示不合并
+    "separator": "\n……\n",  # 合并请求时短语间的分隔符，合成结果在此处留出停顿
+    "silence_threshold_db": -45.0,  # 低于该能量(dBFS)的帧视为静音
+    "min_silence": 0.25  # 作为切分点的静音最短时长(秒)
+}
+
 # 默认使用的语音
 DEFAULT_VOICE = "chinese_male"
\ No newline at end of file
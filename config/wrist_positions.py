@@ -46,6 +46,13 @@ STRAIGHT_CUT_TEMPLATES = {
     "all_complete": "全部直劈训练结束，恭喜完成训练。"
 }
 
+# 随机训练序列设置
+DRILL_SEQUENCE_CONFIG = {
+    "gap_range": (1.5, 3.0),  # 命令间静音时长的随机范围(秒)
+    "reminder_every": 20,  # 平均每多少次攻击提醒一次
+    "reminder_jitter": 5  # 提醒位置的随机偏移范围(次)
+}
+
 from typing import List, Dict
 
 def get_straight_cut_combination_summary(attack_types: List[str], target_areas: List[str], attack_count: int) -> Dict:
@@ -6,15 +6,19 @@
 """
 
 import asyncio
+import importlib.util
+import os
 import sys
 import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
+from src import profiling
 from src.cli_handler import CLIHandler
 from src.training_commands import create_command_generator
-from src.tts_generator import TTSGenerator
-from src.audio_processor import AudioProcessor
+
+# 音频相关的重量级依赖，仅在需要合成或渲染时导入
+HEAVY_DEPENDENCIES = ["edge_tts", "ffmpeg", "numpy", "asyncio_throttle"]
 
 class FencingTrainer:
     """击剑训练器主类"""
@@ -29,103 +33,918 @@ class FencingTrainer:
         self.config = config
         self.cli_handler = CLIHandler()
         self.command_generator = create_command_generator(config)
-        self.tts_generator = TTSGenerator(config["voice"])
-        self.audio_processor = AudioProcessor()
+        self.tts_generators = {}
+        self.clip_cache = None
+        self.scheduler = None
+        self.pcm_cache = None
+        self.fragment_cache = None
+        self.render_cache = None
+        self.audio_processor = None
+
+    def _load_synthesis_stack(self):
+        """按需加载语音合成模块（延迟导入重量级依赖）"""
+        if self.tts_generators:
+            return
+
+        from src.tts_generator import TTSGenerator
+        from src.clip_cache import ClipCache
+        from src.synthesis_scheduler import SynthesisScheduler
+
+        # 所有语音共用一个片段缓存和一个调度器；配置共享目录时整个渲染集群共用片段
+        backend = None
+        if self.config["shared_cache"]:
+            from src.cache_backend import SharedDirectoryStore
+            backend = SharedDirectoryStore(self.config["shared_cache"])
+        self.clip_cache = ClipCache(backend=backend)
+        self.scheduler = SynthesisScheduler()
+        self.tts_generators = {
+            voice: TTSGenerator(voice, clip_cache=self.clip_cache, scheduler=self.scheduler)
+            for voice in self.config["voices"]
+        }
+
+    def _load_audio_stack(self):
+        """按需加载语音合成和音频处理模块（延迟导入重量级依赖）"""
+        self._load_synthesis_stack()
+        if self.audio_processor is not None:
+            return
+
+        from src.audio_processor import AudioProcessor
+        from src.pcm_cache import PCMCache
+        from src.fragment_cache import MP3FragmentCache
+
+        self.pcm_cache = PCMCache()
+        self.fragment_cache = MP3FragmentCache(self.pcm_cache)
+        if self.config["render_cache"]:
+            from src.render_cache import RenderCache
+            self.render_cache = RenderCache()
+        self.audio_processor = AudioProcessor(
+            pcm_cache=self.pcm_cache,
+            fragment_cache=self.fragment_cache
+        )
 
-    async def generate_training_audio(self) -> Path:
+    async def generate_training_audio(self) -> List[Path]:
         """
-        生成训练音频文件
+        生成训练音频文件（每个语音一个文件，共用命令计划和时间线）
 
         Returns:
-            生成的音频文件路径
+            生成的音频文件路径列表，顺序与语音列表一致
         """
         start_time = time.time()
+        self._load_audio_stack()
+        from src.job_journal import JobJournal
+
+        voices = self.config["voices"]
+        journal = JobJournal(JobJournal.job_id_for(self.config))
+        if not journal.acquire():
+            print("注意: 相同的任务正在另一个进程中运行，本次使用独立的检查点目录")
+        if self.config["resume"]:
+            journal.load()
+            if self.config["verbose"]:
+                print(f"从检查点继续: 已完成 {len(journal.clips)} 个片段、{len(journal.segments)} 个段落")
+        else:
+            journal.reset()
 
         try:
             # 1. 生成训练命令
             if self.config["verbose"]:
                 print("正在生成训练命令...")
 
-            # 根据训练模式生成命令
-            if self.config["mode"] == "straight-cut":
-                commands = self.command_generator.generate_all_commands(
-                    count=self.config["attack_count"]
-                )
-            else:
-                commands = self.command_generator.generate_full_training_commands(
-                    self.config["attack_count"]
-                )
-
+            phrase_table = self.command_generator.phrase_table
+            with profiling.stage("commands"):
+                segments = list(self.command_generator.iter_segment_phrase_ids(self.config["attack_count"]))
+                commands = [phrase_table.text(phrase_id) for segment in segments for phrase_id in segment]
             total_commands = len(commands)
 
             if self.config["verbose"]:
                 print(f"共生成 {total_commands} 个命令")
 
-            # 2. 生成TTS音频文件
+            if self.config["pipeline"]:
+                # 2-3. 合成、解码和编码流水线并行进行
+                if self.config["verbose"]:
+                    print("正在流式合成并编码...")
+                with profiling.stage("pipeline"):
+                    output_paths = await self._stream_render(segments, journal)
+            else:
+                output_paths = await self._render_phased(segments, commands, journal)
+
+            journal.finish()
+
+            # 4. 清理临时文件
             if self.config["verbose"]:
-                print("正在生成语音音频...")
+                print("正在清理临时文件...")
 
-            audio_files = []
-            for i, command in enumerate(commands):
-                if self.config["verbose"]:
-                    self.cli_handler.print_progress(i, total_commands, "生成语音")
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
 
-                # 生成单个命令的音频
-                audio_path = await self.tts_generator.generate_audio(command)
-                audio_files.append(audio_path)
+            # 5. 计算总耗时
+            elapsed_time = time.time() - start_time
 
             if self.config["verbose"]:
-                self.cli_handler.print_progress(total_commands, total_commands, "生成语音")
+                stats = self.pcm_cache.get_stats()
+                print(f"PCM缓存: 命中 {stats['hits']} 次，解码 {stats['misses']} 次，变速处理 {stats['stretched']} 次")
+                print(f"生成完成，耗时: {elapsed_time:.1f} 秒")
+
+            return output_paths
+
+        except Exception as e:
+            # 清理临时文件（检查点保留）
+            journal.release()
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
+            raise RuntimeError(f"音频生成失败: {str(e)}。可使用 --resume 从检查点继续")
+
+    async def _render_phased(self, segments: List[tuple], commands: List[str], journal) -> List[Path]:
+        """先合成全部片段，再由各语音并行拼接编码"""
+        # 2. 生成TTS音频文件
+        if self.config["verbose"]:
+            print("正在生成语音音频...")
+
+        unique_commands = list(dict.fromkeys(commands))
+        phrase_ids = [phrase_id for segment in segments for phrase_id in segment]
+        with profiling.stage("synthesis"):
+            clips = await self._synthesize_clips(unique_commands, journal)
+        with profiling.stage("tempo"):
+            clips = await self._apply_tempo(clips, phrase_ids)
+            slot_by_text = await self._shared_slots(clips, unique_commands)
+            gaps = await self._cadence_gaps(phrase_ids, clips[self.config["voices"][0]], slot_by_text)
+
+        # 3. 拼接音频文件（各语音并行编码）
+        if self.config["verbose"]:
+            print("正在拼接音频文件...")
+
+        loop = asyncio.get_running_loop()
+        with profiling.stage("render"):
+            rendered = await asyncio.gather(*(
+                loop.run_in_executor(None, self._render_voice, voice, segments,
+                                     clips[voice], slot_by_text, gaps, journal)
+                for voice in self.config["voices"]
+            ))
+        return [path for paths in rendered for path in paths]
+
+    async def _stream_render(self, segments: List[tuple], journal) -> List[Path]:
+        """
+        流式渲染：按时间线顺序合成，随到随解码并写入各语音的编码器
+
+        Args:
+            segments: 按段落划分的短语ID序列
+            journal: 任务检查点日志
+
+        Returns:
+            输出文件路径列表
+        """
+        from src.pcm_cache import StretchedClip
+        from src.render_pipeline import StreamingRenderer
+
+        phrase_table = self.command_generator.phrase_table
+        phrase_ids = [phrase_id for segment in segments for phrase_id in segment]
+        commands = [phrase_table.text(phrase_id) for phrase_id in phrase_ids]
+        output_paths = self.config["output_paths"]
+
+        cadence = None
+        if self.config["fixed_cadence"] is not None:
+            from src.cadence import CadencePlanner
+            cadence = CadencePlanner([phrase_table.kind(phrase_id) for phrase_id in phrase_ids],
+                                     self.config["fixed_cadence"], self.audio_processor.sample_rate)
+
+        # 流水线中无法预先知道全部片段长度，只支持指定倍率的变速
+        factor = self.config["tempo"]
+        stretched = self._tempo_texts(phrase_ids) if factor is not None else set()
+
+        async def fetch_clip(voice: str, text: str):
+            path = await self._fetch_clip(voice, text, journal)
+            return StretchedClip(path, factor) if text in stretched else path
+
+        renderer = StreamingRenderer(
+            self.audio_processor,
+            fetch_clip,
+            self.config["voices"]
+        )
+        results = await renderer.run(commands, output_paths, self.config["include_silence"], cadence)
+
+        for voice, (offsets, total_samples) in results.items():
+            output_path = output_paths[voice]
+            self._write_cues(output_path, phrase_ids, offsets)
+            self._report_cadence(output_path, phrase_ids, offsets)
+            if self.config["chapters"]:
+                from src.chapters import build_chapters, segment_starts, write_chapters
+
+                chapters = build_chapters(commands, segment_starts([len(segment) for segment in segments]),
+                                          offsets, total_samples)
+                # 写入章节需要重写整个文件，放到线程池中进行
+                await asyncio.get_running_loop().run_in_executor(
+                    None, write_chapters, output_path, chapters, self.audio_processor.sample_rate
+                )
+
+        if self.config["verbose"]:
+            stats = renderer.stats
+            print(f"流水线: 首次写入编码器 {stats['first_write']:.1f} 秒，合成完成 {stats['synthesis_done']:.1f} 秒，"
+                  f"编码完成 {stats['encode_done']:.1f} 秒")
+        return list(output_paths.values())
+
+    async def generate_drill_programs(self) -> List[Path]:
+        """
+        生成一批随机训练节目
+
+        所有节目共用同一短语集，只合成一次，之后每个节目只需拼接和编码。
+
+        Returns:
+            生成的音频文件路径列表
+        """
+        start_time = time.time()
+        self._load_audio_stack()
+        from src.drill_sequence import DrillSequenceGenerator
+
+        try:
+            engine = DrillSequenceGenerator(
+                self.config["attack_types"],
+                self.config["target_areas"],
+                self.config["attack_count"],
+                phrase_table=self.command_generator.phrase_table,
+                gap_range=self.config["gap_range"],
+                include_silence=self.config["include_silence"]
+            )
+            with profiling.stage("plans"):
+                plans = engine.generate_batch(self.config["batch_count"], self.config["seed"])
+
+            if self.config["verbose"]:
+                print(f"共生成 {len(plans)} 个不同的随机节目计划")
+
+            phrase_table = engine.phrase_table
+            phrase_ids = plans.used_ids()
+            texts = [phrase_table.text(phrase_id) for phrase_id in phrase_ids]
+            with profiling.stage("synthesis"):
+                clips = await self._synthesize_clips(texts)
+            with profiling.stage("tempo"):
+                clips = await self._apply_tempo(clips, phrase_ids)
+                slot_by_text = await self._shared_slots(clips, texts)
 
-            # 3. 拼接音频文件
             if self.config["verbose"]:
                 print("正在拼接音频文件...")
 
-            output_path = self.config["output_path"]
-            self.audio_processor.create_training_audio(
-                audio_files,
-                output_path,
-                self.config["include_silence"]
-            )
+            # 固定数量的渲染协程依次领取(节目, 语音)任务，上万个节目也不会同时持有上万个协程和整段PCM
+            loop = asyncio.get_running_loop()
+            voices = self.config["voices"]
+            jobs = iter(range(len(plans) * len(voices)))
+            output_paths: List[Optional[Path]] = [None] * (len(plans) * len(voices))
+
+            async def worker():
+                for job in jobs:
+                    index, voice_index = divmod(job, len(voices))
+                    voice = voices[voice_index]
+                    output_path = self._program_output_paths(index)[voice]
+                    output_paths[job] = await loop.run_in_executor(
+                        None, self._render_plan, plans[index], phrase_table, clips[voice], slot_by_text, output_path
+                    )
+
+            with profiling.stage("render"):
+                await asyncio.gather(*(worker() for _ in range(min(os.cpu_count() or 4, len(output_paths)))))
 
-            # 4. 获取音频时长
-            duration = self.audio_processor.get_audio_duration(output_path)
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
 
-            # 5. 清理临时文件
             if self.config["verbose"]:
-                print("正在清理临时文件...")
+                print(f"生成完成，耗时: {time.time() - start_time:.1f} 秒")
 
-            self.tts_generator.cleanup_temp_files()
+            return output_paths
 
-            # 6. 计算总耗时
-            elapsed_time = time.time() - start_time
+        except Exception as e:
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
+            raise RuntimeError(f"随机节目生成失败: {str(e)}")
+
+    def _program_output_paths(self, index: int) -> dict:
+        """第index个随机节目各语音版本的输出路径"""
+        output_path = self.config["output_path"]
+        if self.config["batch_count"] > 1:
+            output_path = output_path.with_name(f"{output_path.stem}_{index + 1:04d}{output_path.suffix}")
+        return self.cli_handler.voice_output_paths(output_path, self.config["voices"])
+
+    def _render_plan(self, plan, phrase_table, clip_by_text: dict,
+                     slot_by_text: Optional[dict], output_path: Path) -> Path:
+        """渲染单个随机节目的单个语音版本"""
+        texts = [phrase_table.text(phrase_id) for phrase_id in plan.phrase_ids]
+        audio_files = [clip_by_text[text] for text in texts]
+        slots = [slot_by_text[text] for text in texts] if slot_by_text is not None else None
+        # 计划以float32保存毫秒精度的静音时长，取回原值，渲染结果和缓存键与之前一致
+        gaps = [round(gap, 3) for gap in plan.gaps]
+
+        offsets = self._render_cached(output_path, texts, audio_files, slots, gaps,
+                                      lambda: self._assemble(audio_files, output_path, slots, gaps))
+        self._write_cues(output_path, list(plan.phrase_ids), offsets)
+        if self.config["batch_count"] == 1:
+            self._report_cadence(output_path, list(plan.phrase_ids), offsets)
+        return output_path
+
+    def _assemble(self, audio_files: list, output_path: Path,
+                  slots: Optional[List[int]], gaps: Optional[List[float]]) -> List[tuple]:
+        """把片段拼接为单个输出文件（按帧拼接或渲染PCM后编码），返回每个命令的样本偏移"""
+        include_silence = self.config["include_silence"]
+        if self.config["fast_assemble"]:
+            offsets = []
+            self.audio_processor.fast_assemble(
+                audio_files, output_path, include_silence, slots, gaps, cue_offsets=offsets
+            )
+            return offsets
+        samples = self.audio_processor.render_pcm(audio_files, include_silence, slots, gaps)
+        self.audio_processor.encode_pcm(samples, output_path)
+        offsets, _ = self.audio_processor.layout_timeline(
+            self.audio_processor.clip_lengths(audio_files),
+            include_silence, slots, gaps
+        )
+        return offsets
+
+    async def generate_definition_programs(self, programs: list) -> List[Path]:
+        """
+        生成节目定义文件（--program）描述的节目
+
+        各节目用到的(语音, 短语)只合成一次，之后每个节目按自己的语音和静音拼接编码。
+
+        Args:
+            programs: 编译后的节目列表(CompiledProgram)
+
+        Returns:
+            生成的音频文件路径列表
+        """
+        start_time = time.time()
+        phrase_table = self.command_generator.phrase_table
+        try:
+            pairs = list(dict.fromkeys(
+                (voice, phrase_table.text(phrase_id))
+                for program in programs
+                for voice, phrase_id in zip(program.voices(), program.phrase_ids)
+            ))
+            self._add_voices(voice for voice, _ in pairs)
+            with profiling.stage("synthesis"):
+                paths = await asyncio.gather(*(self._fetch_clip(voice, text) for voice, text in pairs))
+            clips = dict(zip(pairs, paths))
 
             if self.config["verbose"]:
-                print(f"生成完成，耗时: {elapsed_time:.1f} 秒")
+                print(f"语音片段: {len(pairs)} 个（缓存命中 {self.clip_cache.hits} 个），正在拼接音频文件...")
 
-            return output_path
+            loop = asyncio.get_running_loop()
+            with profiling.stage("render"):
+                output_paths = await asyncio.gather(*(
+                    loop.run_in_executor(None, self._render_definition, program, clips) for program in programs
+                ))
+
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
+
+            if self.config["verbose"]:
+                print(f"生成完成，耗时: {time.time() - start_time:.1f} 秒")
+            return list(output_paths)
 
         except Exception as e:
-            # 清理临时文件
-            self.tts_generator.cleanup_temp_files()
-            raise RuntimeError(f"音频生成失败: {str(e)}")
+            for tts_generator in self.tts_generators.values():
+                tts_generator.cleanup_temp_files()
+            raise RuntimeError(f"节目生成失败: {str(e)}")
+
+    def _add_voices(self, voices):
+        """为节目定义中用到、命令行未指定的语音补充生成器（共用片段缓存和调度器）"""
+        from src.tts_generator import TTSGenerator
+
+        for voice in voices:
+            if voice not in self.tts_generators:
+                self.tts_generators[voice] = TTSGenerator(voice, clip_cache=self.clip_cache, scheduler=self.scheduler)
+
+    def _definition_output_path(self, program) -> Path:
+        """节目定义的输出路径：输出目录下与定义文件同名"""
+        output_path = self.config["output_path"]
+        return output_path.with_name(f"{program.source.stem}{output_path.suffix}")
+
+    def _render_definition(self, program, clips: dict) -> Path:
+        """渲染单个节目定义（每个命令使用所在段落的语音）"""
+        phrase_table = self.command_generator.phrase_table
+        phrase_ids = list(program.phrase_ids)
+        commands = [phrase_table.text(phrase_id) for phrase_id in phrase_ids]
+        audio_files = [clips[voice, command] for voice, command in zip(program.voices(), commands)]
+        gaps = [round(gap, 3) for gap in program.gaps]
+        output_path = self._definition_output_path(program)
+
+        offsets = self._render_cached(output_path, commands, audio_files, None, gaps,
+                                      lambda: self._assemble(audio_files, output_path, None, gaps))
+        self._write_cues(output_path, phrase_ids, offsets)
+        self._report_cadence(output_path, phrase_ids, offsets)
+        return output_path
+
+    async def _synthesize_clips(self, texts: List[str], journal=None) -> dict:
+        """
+        合成所有语音的片段
+
+        只合成检查点中没有的短语，各语音交错提交给同一个调度器。
+
+        Args:
+            texts: 不重复的命令文本
+            journal: 任务检查点日志，为None时不记录检查点
+
+        Returns:
+            语音类型 -> {命令文本 -> 片段路径}
+        """
+        voices = self.config["voices"]
+        clips = {voice: {} for voice in voices}
+        pending = []
+        for text in texts:
+            for voice in voices:
+                recorded = journal.clip_path(voice, text) if journal is not None else None
+                if recorded is not None:
+                    clips[voice][text] = recorded
+                else:
+                    pending.append((voice, text))
+
+        async def synthesize(voice: str, text: str):
+            clips[voice][text] = await self._fetch_clip(voice, text, journal)
+
+        results = await asyncio.gather(*(synthesize(voice, text) for voice, text in pending),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+        if self.config["verbose"]:
+            print(f"语音片段: {len(texts)} 个不重复短语 × {len(voices)} 种语音，"
+                  f"需获取 {len(pending)} 个（缓存命中 {self.clip_cache.hits} 个）")
+            invalid = sum(self.tts_generators[voice].invalid_clips for voice in voices)
+            if invalid:
+                print(f"无效片段: {invalid} 个（已丢弃并重新合成）")
+        return clips
+
+    async def _fetch_clip(self, voice: str, text: str, journal=None) -> Path:
+        """获取单个片段：优先使用检查点中的记录，否则合成并记录检查点"""
+        if journal is not None:
+            recorded = journal.clip_path(voice, text)
+            if recorded is not None:
+                return recorded
+        path = await self.tts_generators[voice].generate_clip(text)
+        if journal is not None:
+            # 记录检查点要fsync，放到线程池中进行
+            await asyncio.get_running_loop().run_in_executor(None, journal.record_clip, voice, text, path)
+        return path
+
+    async def _shared_slots(self, clips: dict, texts: List[str]) -> Optional[dict]:
+        """多语音时每个命令占用各语音中最长片段的时长，保证各文件时间线一致（解码在线程池中进行）"""
+        voices = self.config["voices"]
+        if len(voices) == 1:
+            return None
+        pcms = await asyncio.gather(*(
+            self.audio_processor.load_pcm_async(clips[voice][text]) for text in texts for voice in voices
+        ))
+        return {
+            text: max(len(pcm) for pcm in pcms[i * len(voices):(i + 1) * len(voices)])
+            for i, text in enumerate(texts)
+        }
+
+    async def _occupied(self, phrase_ids: List[int], clip_by_text: dict,
+                        slot_by_text: Optional[dict]) -> List[int]:
+        """每个命令在共享时间线上占用的样本数（解码在线程池中进行）"""
+        phrase_table = self.command_generator.phrase_table
+        commands = [phrase_table.text(phrase_id) for phrase_id in phrase_ids]
+        if slot_by_text is not None:
+            return [slot_by_text[command] for command in commands]
+        lengths = await asyncio.get_running_loop().run_in_executor(
+            None, self.audio_processor.clip_lengths, [clip_by_text[command] for command in commands]
+        )
+        return lengths.tolist()
+
+    async def _cadence_gaps(self, phrase_ids: List[int], clip_by_text: dict,
+                            slot_by_text: Optional[dict]) -> Optional[List[float]]:
+        """固定节奏时每个命令之后的静音时长(秒)，未启用时返回None（使用固定静音）"""
+        if self.config["fixed_cadence"] is None:
+            return None
+        from src.cadence import CadencePlanner
+
+        phrase_table = self.command_generator.phrase_table
+        planner = CadencePlanner([phrase_table.kind(phrase_id) for phrase_id in phrase_ids],
+                                 self.config["fixed_cadence"], self.audio_processor.sample_rate)
+        return planner.gaps(await self._occupied(phrase_ids, clip_by_text, slot_by_text))
+
+    def _tempo_texts(self, phrase_ids: List[int]) -> set:
+        """参与变速的命令文本（攻击周期内的计数、保持和归位口令）"""
+        from config.voices import TEMPO_CONFIG
+
+        phrase_table = self.command_generator.phrase_table
+        return {phrase_table.text(phrase_id) for phrase_id in phrase_ids
+                if phrase_table.kind(phrase_id) in TEMPO_CONFIG["kinds"]}
+
+    async def _apply_tempo(self, clips: dict, phrase_ids: List[int]) -> dict:
+        """
+        按 --tempo 把攻击周期内的口令替换为变速片段（变速结果按(片段, 倍率)缓存）
+
+        Args:
+            clips: 语音类型 -> {命令文本 -> 片段路径}
+            phrase_ids: 节目的短语ID序列
+
+        Returns:
+            替换后的片段字典，未启用变速时原样返回
+        """
+        factor = self.config["tempo"]
+        if factor is None:
+            return clips
+        if factor == "auto":
+            factor = await self._auto_tempo(clips, phrase_ids)
+
+        if self.config["verbose"]:
+            print(f"变速: 计数、保持和归位口令 {factor:g} 倍")
+        return self._stretch_clips(clips, phrase_ids, factor)
+
+    def _stretch_clips(self, clips: dict, phrase_ids: List[int], factor: float) -> dict:
+        """把参与变速的口令替换为指定倍率的变速片段"""
+        if factor == 1.0:
+            return clips
+        from src.pcm_cache import StretchedClip
+
+        stretched = self._tempo_texts(phrase_ids)
+        return {
+            voice: {text: StretchedClip(path, factor) if text in stretched else path
+                    for text, path in clip_by_text.items()}
+            for voice, clip_by_text in clips.items()
+        }
+
+    async def _auto_tempo(self, clips: dict, phrase_ids: List[int]) -> float:
+        """计算让每个攻击周期放进 --fixed-cadence 目标周期的最小变速倍率（按步长取整）"""
+        import math
+        from config.voices import TEMPO_CONFIG
+        from src.cadence import CadencePlanner, required_tempo
+
+        phrase_table = self.command_generator.phrase_table
+        kinds = [phrase_table.kind(phrase_id) for phrase_id in phrase_ids]
+        texts = list(dict.fromkeys(phrase_table.text(phrase_id) for phrase_id in phrase_ids))
+        period = self.config["fixed_cadence"]
+        first_voice = self.config["voices"][0]
+
+        occupied = await self._occupied(phrase_ids, clips[first_voice], await self._shared_slots(clips, texts))
+        required = required_tempo(kinds, occupied, period, TEMPO_CONFIG["kinds"], self.audio_processor.sample_rate)
+        if required <= 1.0:
+            return 1.0
+
+        # 向上取整到步长，相近的目标周期共用同一组变速片段；
+        # 变速后的长度与按倍率估算的略有出入，放不下时再加一个步长
+        step = TEMPO_CONFIG["auto_step"]
+        factor = round(math.ceil(round(required / step, 6)) * step, 6)
+        while factor <= TEMPO_CONFIG["max_factor"]:
+            stretched = self._stretch_clips(clips, phrase_ids, factor)
+            occupied = await self._occupied(phrase_ids, stretched[first_voice],
+                                            await self._shared_slots(stretched, texts))
+            try:
+                CadencePlanner(kinds, period, self.audio_processor.sample_rate).gaps(occupied)
+                return factor
+            except ValueError:
+                factor = round(factor + step, 6)
+        raise ValueError(f"攻击周期 {period:g} 秒需要超过 {TEMPO_CONFIG['max_factor']:g} 倍的变速"
+                         f"（估算 {required:.2f} 倍）")
+
+    def _report_cadence(self, output_path: Path, phrase_ids: List[int], offsets: List[tuple]):
+        """详细模式下打印攻击周期的节奏统计"""
+        if not self.config["verbose"]:
+            return
+        from src.cadence import cadence_stats
+
+        phrase_table = self.command_generator.phrase_table
+        stats = cadence_stats(offsets, [phrase_table.kind(phrase_id) for phrase_id in phrase_ids],
+                              self.audio_processor.sample_rate, self.config["fixed_cadence"])
+        if stats is not None:
+            self.cli_handler.print_cadence(output_path, stats)
+
+    def _render_voice(self,
+                      voice: str,
+                      segments: List[tuple],
+                      clip_by_text: dict,
+                      slot_by_text: Optional[dict],
+                      gaps: Optional[List[float]],
+                      journal) -> List[Path]:
+        """
+        渲染单个语音的训练音频
+
+        Args:
+            voice: 语音配置名称
+            segments: 按段落划分的短语ID序列
+            clip_by_text: 命令文本 -> 该语音的片段路径
+            slot_by_text: 命令文本 -> 共享时间线上的最小时长(样本数)，单语音时为None
+            gaps: 每个命令之后的静音时长(秒)，为None时使用固定的静音时长
+            journal: 任务检查点日志
+
+        Returns:
+            输出文件路径列表（分段输出时为各分段文件）
+        """
+        output_path = self.config["output_paths"][voice]
+        include_silence = self.config["include_silence"]
+        phrase_table = self.command_generator.phrase_table
+
+        def texts(phrase_ids) -> List[str]:
+            return [phrase_table.text(phrase_id) for phrase_id in phrase_ids]
+
+        def slots(commands: List[str]) -> Optional[List[int]]:
+            if slot_by_text is None:
+                return None
+            return [slot_by_text[command] for command in commands]
+
+        phrase_ids = [phrase_id for segment in segments for phrase_id in segment]
+        commands = texts(phrase_ids)
+
+        audio_files = [clip_by_text[command] for command in commands]
+
+        if self.config["split"] is not None:
+            return self._render_chunks(output_path, phrase_ids, [len(segment) for segment in segments],
+                                       audio_files, slots(commands), gaps)
+
+        def render() -> List[tuple]:
+            if self.config["fast_assemble"]:
+                offsets = []
+                self.audio_processor.fast_assemble(
+                    audio_files,
+                    output_path,
+                    include_silence,
+                    slots(commands),
+                    gaps,
+                    cue_offsets=offsets
+                )
+                total_samples = offsets[-1][1] if offsets else 0
+            else:
+                # 逐段渲染PCM并记录检查点，已渲染的段落直接复用
+                segment_files = []
+                first = 0
+                for index, segment in enumerate(segments):
+                    segment_file = journal.segment_file(voice, index)
+                    if segment_file is None:
+                        segment_commands = texts(segment)
+                        samples = self.audio_processor.render_pcm(
+                            [clip_by_text[command] for command in segment_commands],
+                            include_silence,
+                            slots(segment_commands),
+                            gaps[first:first + len(segment)] if gaps is not None else None
+                        )
+                        segment_file = journal.save_segment(voice, index, samples)
+                    segment_files.append(segment_file)
+                    first += len(segment)
+
+                self.audio_processor.encode_segments(segment_files, output_path, include_silence)
+
+                # 段落之间的静音与命令之间相同，整段节目的偏移可直接由片段长度算出
+                offsets, total_samples = self.audio_processor.layout_timeline(
+                    self.audio_processor.clip_lengths(audio_files),
+                    include_silence,
+                    slots(commands),
+                    gaps
+                )
+
+            if self.config["chapters"]:
+                from src.chapters import build_chapters, segment_starts, write_chapters
+
+                chapters = build_chapters(commands, segment_starts([len(segment) for segment in segments]),
+                                          offsets, total_samples)
+                write_chapters(output_path, chapters, self.audio_processor.sample_rate)
+            return offsets
+
+        offsets = self._render_cached(output_path, commands, audio_files, slots(commands), gaps, render)
+        self._write_cues(output_path, phrase_ids, offsets)
+        self._report_cadence(output_path, phrase_ids, offsets)
+        return [output_path]
+
+    def _render_cached(self,
+                       output_path: Path,
+                       commands: List[str],
+                       audio_files: List[Path],
+                       slot_samples: Optional[List[int]],
+                       gaps: Optional[List[float]],
+                       render) -> List[tuple]:
+        """
+        通过渲染结果缓存输出节目，完全相同的请求直接交付已有文件
+
+        Args:
+            output_path: 输出文件路径
+            commands: 命令文本序列
+            audio_files: 每个命令的片段路径
+            slot_samples: 每个命令的最小时长(样本数)
+            gaps: 每个命令之后的静音时长(秒)
+            render: 未命中时调用的渲染函数，返回每个命令的样本偏移
+
+        Returns:
+            每个命令的(起始, 结束)样本偏移
+        """
+        # 先断开旧输出：旧版本可能以硬链接交付了渲染结果缓存条目，不能原地覆盖
+        output_path.unlink(missing_ok=True)
+        if self.render_cache is None:
+            return render()
+
+        from config.voices import AUDIO_CONFIG
+        from src.render_cache import render_key
+
+        key = render_key({
+            "audio": AUDIO_CONFIG,
+            "format": output_path.suffix,
+            "include_silence": self.config["include_silence"],
+            "interval": self.config["interval"],
+            "fast_assemble": self.config["fast_assemble"],
+            "chapters": self.config["chapters"],
+            "commands": commands,
+            "clips": [self.pcm_cache.digest(audio_file) for audio_file in audio_files],
+            "slots": slot_samples,
+            "gaps": gaps,
+        })
+        meta = self.render_cache.fetch(key, output_path)
+        if meta is not None:
+            if self.config["verbose"]:
+                print(f"渲染结果缓存命中: {output_path}（{meta['delivered_by']}）")
+            return [tuple(offset) for offset in meta["offsets"]]
+
+        offsets = render()
+        self.render_cache.store(key, output_path, offsets)
+        return offsets
+
+    def _render_chunks(self,
+                       output_path: Path,
+                       phrase_ids: List[int],
+                       segment_lengths: List[int],
+                       audio_files: List[Path],
+                       slot_samples: Optional[List[int]],
+                       gaps: Optional[List[float]]) -> List[Path]:
+        """
+        按段落或时长把节目切分为多个文件并行渲染，写出分段清单
+
+        每个分段包含到下一分段之前的静音，依次播放各分段与完整节目的时间线一致。
+
+        Args:
+            output_path: 节目输出路径
+            phrase_ids: 全部命令的短语ID
+            segment_lengths: 每个段落的命令数
+            audio_files: 每个命令的片段路径
+            slot_samples: 每个命令的最小时长(样本数)
+            gaps: 每个命令之后的静音时长(秒)，为None时使用固定的静音时长
+
+        Returns:
+            各分段文件路径
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        import numpy as np
+        from src.chapters import (build_chapters, chunk_path, duration_starts,
+                                  segment_starts, write_manifest)
+
+        include_silence = self.config["include_silence"]
+        sample_rate = self.audio_processor.sample_rate
+        phrase_table = self.command_generator.phrase_table
+
+        offsets, total_samples = self.audio_processor.layout_timeline(
+            self.audio_processor.clip_lengths(audio_files),
+            include_silence,
+            slot_samples,
+            gaps
+        )
+        self._report_cadence(output_path, phrase_ids, offsets)
+
+        split = self.config["split"]
+        if split == "segment":
+            starts = segment_starts(segment_lengths)
+        else:
+            starts = duration_starts(offsets, int(split * 60 * sample_rate))
+        chunks = build_chapters([phrase_table.text(phrase_id) for phrase_id in phrase_ids],
+                                starts, offsets, total_samples)
+
+        def render(index: int) -> Path:
+            chunk = chunks[index]
+            commands = slice(chunk.first_command, chunk.last_command)
+            samples = self.audio_processor.render_pcm(
+                audio_files[commands],
+                include_silence,
+                slot_samples[commands] if slot_samples is not None else None,
+                gaps[commands] if gaps is not None else None
+            )
+            # 补上到下一分段之前的静音
+            samples = np.pad(samples, (0, chunk.end_sample - chunk.start_sample - len(samples)))
+            path = self.audio_processor.encode_pcm(samples, chunk_path(output_path, index))
+            self._write_cues(path, phrase_ids[commands],
+                             [(start - chunk.start_sample, end - chunk.start_sample)
+                              for start, end in offsets[commands]])
+            return path
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 4)) as executor:
+            chunk_files = list(executor.map(render, range(len(chunks))))
+
+        manifest = write_manifest(output_path, chunks, chunk_files, sample_rate,
+                                  "segment" if split == "segment" else f"{split:g}min")
+        if self.config["verbose"]:
+            print(f"已切分为 {len(chunk_files)} 个文件，清单: {manifest}")
+        return chunk_files
+
+    def _write_cues(self, output_path: Path, phrase_ids: List[int], offsets: List[tuple]):
+        """按配置的格式在输出文件旁写入字幕文件"""
+        if not self.config["cue_formats"]:
+            return
+        from src.cue_track import build_cues, write_cue_files
+
+        phrase_table = self.command_generator.phrase_table
+        cues = build_cues(
+            [phrase_table.text(phrase_id) for phrase_id in phrase_ids],
+            [phrase_table.kind(phrase_id) for phrase_id in phrase_ids],
+            offsets
+        )
+        write_cue_files(cues, output_path, self.config["cue_formats"], self.audio_processor.sample_rate)
+
+    def _warm_cache_phrase_ids(self) -> List[int]:
+        """获取预热缓存需要覆盖的短语ID"""
+        return self.command_generator.phrase_table.reachable_ids(
+            self.config["attack_types"],
+            self.config["target_areas"],
+            self.config["attack_count"]
+        )
+
+    async def warm_cache(self) -> dict:
+        """
+        预热语音片段缓存
+
+        Returns:
+            预热报告字典
+        """
+        self._load_synthesis_stack()
+        from src.cache_warmer import CacheWarmer
+
+        phrase_table = self.command_generator.phrase_table
+        phrase_ids = self._warm_cache_phrase_ids()
+        warmer = CacheWarmer(
+            [phrase_table.text(phrase_id) for phrase_id in phrase_ids],
+            self.config["voices"],
+            self.clip_cache,
+            self.scheduler
+        )
+
+        def progress(current: int, total: int):
+            self.cli_handler.print_progress(current, total, "预热缓存")
+
+        with profiling.stage("warm_cache"):
+            return await warmer.warm(progress if self.config["verbose"] else None)
+
+    def _report_clip_cache(self):
+        """上报本节点的片段缓存统计，详细模式下打印命中率"""
+        self.clip_cache.flush_stats()
+        if self.config["verbose"]:
+            node_stats = self.clip_cache.backend.node_stats() if self.clip_cache.backend is not None else None
+            self.cli_handler.print_clip_cache_stats(self.clip_cache.get_stats(), node_stats)
+
+    async def _with_loop_monitor(self, coro):
+        """运行协程，详细模式下报告期间的事件循环延迟"""
+        from src.loop_monitor import LoopLagMonitor
+
+        async with LoopLagMonitor() as monitor:
+            result = await coro
+        if self.config["verbose"]:
+            self.cli_handler.print_loop_lag(monitor.get_stats())
+        return result
 
     def run(self):
         """运行训练器"""
+        if self.config["warm_cache"]:
+            if self.config["plan_only"]:
+                phrase_ids = self._warm_cache_phrase_ids()
+                self.cli_handler.print_plan(phrase_ids, self.command_generator.phrase_table)
+                return
+            try:
+                print("开始预热语音缓存...")
+                report = profiling.run_async(self._with_loop_monitor(self.warm_cache()))
+                self.cli_handler.print_warm_cache_report(report)
+                if report["failed"]:
+                    sys.exit(1)
+            except KeyboardInterrupt:
+                print("\n\n用户中断操作。已完成的片段已保存，再次运行 --warm-cache 将从中断处继续。")
+                sys.exit(1)
+            return
+
+        if self.config["program_sources"]:
+            self._run_definitions()
+            return
+
         try:
             # 获取训练摘要
             summary = self.command_generator.get_training_summary(self.config["attack_count"])
             self.cli_handler.print_training_summary(self.config, summary)
 
+            # 只打印计划，不加载音频相关模块
+            if self.config["plan_only"]:
+                if self.config["randomize"]:
+                    from src.drill_sequence import DrillSequenceGenerator
+                    plan = DrillSequenceGenerator(
+                        self.config["attack_types"],
+                        self.config["target_areas"],
+                        self.config["attack_count"],
+                        phrase_table=self.command_generator.phrase_table,
+                        gap_range=self.config["gap_range"],
+                        include_silence=self.config["include_silence"]
+                    ).generate(self.config["seed"])
+                    phrase_ids = list(plan.phrase_ids)
+                else:
+                    phrase_ids = self.command_generator.generate_all_phrase_ids(self.config["attack_count"])
+                self.cli_handler.print_plan(phrase_ids, self.command_generator.phrase_table)
+                return
+
             # 直接开始生成音频（无需确认）
             print("\n开始生成训练音频...")
 
-            # 生成音频
-            output_path = asyncio.run(self.generate_training_audio())
-            duration = self.audio_processor.get_audio_duration(output_path)
+            # 生成音频（先在事件循环外导入音频模块，导入耗时不计入事件循环延迟）
+            self._load_audio_stack()
+            if self.config["randomize"]:
+                output_paths = profiling.run_async(self._with_loop_monitor(self.generate_drill_programs()))
+            else:
+                output_paths = profiling.run_async(self._with_loop_monitor(self.generate_training_audio()))
 
-            # 打印成功信息
-            self.cli_handler.print_success(output_path, duration)
+            self._report_clip_cache()
+            self._print_outputs(output_paths)
 
         except KeyboardInterrupt:
             print("\n\n用户中断操作。")
@@ -134,27 +953,85 @@ class FencingTrainer:
             print(f"\n错误: {e}")
             sys.exit(1)
 
+    def _print_outputs(self, output_paths: List[Path]):
+        """校验输出文件并打印成功信息"""
+        with profiling.stage("finalize"):
+            for output_path in output_paths:
+                if not self.audio_processor.validate_audio_file(output_path):
+                    raise RuntimeError(f"输出文件无效: {output_path}")
+                duration = self.audio_processor.get_audio_duration(output_path)
+                self.cli_handler.print_success(output_path, duration)
+
+    def _run_definitions(self):
+        """按节目定义文件生成音频；--watch 时持续监视，只重新生成内容发生变化的定义"""
+        from config.programs import PROGRAM_CONFIG
+        from src.program_config import ProgramLoader
+
+        sources = self.config["program_sources"]
+        loader = ProgramLoader(self.command_generator.phrase_table)
+        try:
+            programs, _ = loader.refresh(sources)
+            if not programs:
+                raise ValueError(f"没有找到节目定义文件（支持: {', '.join(PROGRAM_CONFIG['formats'])}）")
+            if self.config["verbose"]:
+                print(f"节目定义: {len(programs)} 个，编译 {loader.compiled} 个，磁盘缓存命中 {loader.disk_hits} 个")
+
+            if self.config["plan_only"]:
+                for program in programs:
+                    print(f"\n=== {program.name}（{program.source.name}，语音 {'、'.join(program.voice_names)}）===")
+                    self.cli_handler.print_plan(list(program.phrase_ids), self.command_generator.phrase_table)
+                return
+
+            print("\n开始生成训练音频...")
+            self._load_audio_stack()
+            output_paths = profiling.run_async(self._with_loop_monitor(self.generate_definition_programs(programs)))
+            self._report_clip_cache()
+            self._print_outputs(output_paths)
+            if not self.config["watch"]:
+                return
+
+            interval = PROGRAM_CONFIG["watch_interval"]
+            print(f"\n正在监视节目定义的变化（每 {interval:g} 秒检查一次），按 Ctrl+C 退出...")
+            while True:
+                time.sleep(interval)
+                # 监视期间任何一次重新加载或生成失败都只报告，不退出
+                try:
+                    errors = []
+                    changed, removed = loader.refresh(sources, errors)
+                    for error in errors:
+                        print(f"\n错误: {error}")
+                    for path in removed:
+                        print(f"\n节目定义已删除: {path}")
+                    if changed:
+                        print(f"\n节目定义已变化: {', '.join(program.source.name for program in changed)}，重新生成...")
+                        output_paths = profiling.run_async(self.generate_definition_programs(changed))
+                        self._print_outputs(output_paths)
+                except Exception as e:
+                    print(f"\n错误: {e}")
+
+        except KeyboardInterrupt:
+            print("\n\n用户中断操作。")
+            if not self.config["watch"]:
+                sys.exit(1)
+        except Exception as e:
+            print(f"\n错误: {e}")
+            sys.exit(1)
+
 def check_dependencies():
-    """检查依赖项是否安装"""
-    try:
-        import edge_tts
-        import ffmpeg
-        print("依赖项检查通过。")
-        return True
-    except ImportError as e:
-        print(f"依赖项缺失: {e}")
+    """检查依赖项是否安装（只查找模块，不导入）"""
+    missing = [name for name in HEAVY_DEPENDENCIES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"依赖项缺失: {', '.join(missing)}")
         print("请运行: pip install -r requirements.txt")
         return False
+    print("依赖项检查通过。")
+    return True
 
 def main():
     """主函数"""
     print("击剑居家训练语音口令生成器 v1.0")
     print("=" * 40)
 
-    # 检查依赖
-    if not check_dependencies():
-        sys.exit(1)
-
     # 解析命令行参数
     cli_handler = CLIHandler()
     try:
@@ -163,9 +1040,21 @@ def main():
         # argparse会调用sys.exit，我们直接返回
         return
 
+    # 检查依赖（仅打印计划时不需要音频依赖）
+    if not config["plan_only"] and not check_dependencies():
+        sys.exit(1)
+
     # 运行训练器
-    trainer = FencingTrainer(config)
-    trainer.run()
+    if config["profile_dir"] is None:
+        FencingTrainer(config).run()
+        return
+
+    # 性能分析：sys.exit也要写出报告
+    try:
+        with profiling.RunProfiler(config["profile_dir"]):
+            FencingTrainer(config).run()
+    finally:
+        print(f"性能分析报告已写入: {config['profile_dir']}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+音频探测模块
+
+在进程内解析MP3和WAV文件头获取时长，无需启动ffprobe。
+MP3优先读取Xing/Info/VBRI头帧中的帧数，没有头帧时逐帧统计；无法识别的格式返回None，
+由调用方回退到ffprobe。
+"""
+
+import struct
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from src.mp3_frames import find_info_tag, iter_frames, parse_frame_header, skip_id3v2
+
+# 读取文件头时一次读取的字节数（足以覆盖ID3标签头和第一帧）
+_HEAD_BYTES = 8192
+
+
+class AudioInfo(NamedTuple):
+    """音频文件信息"""
+    format: str  # "mp3" 或 "wav"
+    duration: float  # 时长(秒)
+    sample_rate: int  # 采样率
+    channels: int  # 声道数
+    method: str  # 时长来源："xing"、"vbri"、"frames" 或 "header"
+
+
+def _read_xing_samples(frame: bytes, header, tag: bytes) -> Optional[int]:
+    """从Xing/Info头帧读取样本数（扣除LAME标签中的编码延迟和填充）"""
+    pos = 4 + (2 if header.protected else 0) + header.side_info_size
+    flags = struct.unpack(">I", frame[pos + 4:pos + 8])[0]
+    if not flags & 0x01:
+        return None
+    frames = struct.unpack(">I", frame[pos + 8:pos + 12])[0]
+    samples = frames * header.samples_per_frame
+
+    lame = pos + 8 + 4 + (4 if flags & 0x02 else 0) + (100 if flags & 0x04 else 0) + (4 if flags & 0x08 else 0)
+    if frame[lame:lame + 4] in (b"LAME", b"Lavc", b"Lavf") and len(frame) >= lame + 24:
+        packed = frame[lame + 21:lame + 24]
+        delay = (packed[0] << 4) | (packed[1] >> 4)
+        padding = ((packed[1] & 0x0F) << 8) | packed[2]
+        samples = max(0, samples - delay - padding)
+    return samples
+
+
+def probe_mp3(path: Path) -> Optional[AudioInfo]:
+    """
+    探测MP3文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        音频信息，不是有效的MP3时返回None
+    """
+    with open(path, "rb") as f:
+        head = f.read(_HEAD_BYTES)
+        offset = skip_id3v2(head)
+        if offset + 4 > len(head):
+            # ID3标签较大（例如带封面），跳到标签之后再读第一帧
+            f.seek(offset)
+            head = f.read(_HEAD_BYTES)
+            offset = 0
+        header = parse_frame_header(head, offset)
+        if header is None:
+            return None
+
+        channels = 1 if header.channel_mode == 3 else 2
+        frame = head[offset:offset + header.frame_length]
+        tag = find_info_tag(head, offset, header)
+        if tag in (b"Xing", b"Info"):
+            samples = _read_xing_samples(frame, header, tag)
+            if samples is not None:
+                return AudioInfo("mp3", samples / header.sample_rate, header.sample_rate, channels, "xing")
+        elif tag == b"VBRI":
+            frames = struct.unpack(">I", frame[50:54])[0]
+            return AudioInfo("mp3", frames * header.samples_per_frame / header.sample_rate,
+                             header.sample_rate, channels, "vbri")
+
+        # 没有可用的头帧，逐帧统计
+        f.seek(0)
+        data = f.read()
+
+    frames = 0
+    first = True
+    try:
+        for frame_offset, frame_header in iter_frames(data, strict=False):
+            if first and find_info_tag(data, frame_offset, frame_header):
+                first = False
+                continue
+            first = False
+            frames += 1
+    except ValueError:
+        return None
+    return AudioInfo("mp3", frames * header.samples_per_frame / header.sample_rate,
+                     header.sample_rate, channels, "frames")
+
+
+def probe_wav(path: Path) -> Optional[AudioInfo]:
+    """
+    探测WAV文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        音频信息，不是有效的WAV时返回None
+    """
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                channels, sample_rate, byte_rate = struct.unpack("<HII", fmt[2:12])
+            elif chunk_id == b"data":
+                if fmt is None or byte_rate == 0:
+                    return None
+                # 流式写入的WAV可能把data长度写成0xFFFFFFFF，按实际文件大小计算
+                remaining = path.stat().st_size - f.tell()
+                size = min(size, remaining)
+                return AudioInfo("wav", size / byte_rate, sample_rate, channels, "header")
+            else:
+                f.seek(size + (size & 1), 1)
+
+
+def probe_audio(path: Path) -> Optional[AudioInfo]:
+    """
+    在进程内探测音频文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        音频信息，无法识别的格式返回None
+    """
+    path = Path(path)
+    try:
+        if path.suffix.lower() == ".wav":
+            return probe_wav(path)
+        return probe_mp3(path)
+    except (OSError, struct.error):
+        return None
+
+
+def test_audio_probe():
+    """测试音频探测"""
+    import tempfile
+    import time
+    import wave
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+
+        wav_path = temp_path / "test.wav"
+        with wave.open(str(wav_path), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(bytes(2 * 44100 * 3))
+        print(f"WAV: {probe_audio(wav_path)}")
+
+        # 100个MPEG-1 Layer III 128kbps 44.1kHz的空帧，无Xing头
+        mp3_path = temp_path / "test.mp3"
+        mp3_path.write_bytes((b"\xff\xfb\x90\x00" + bytes(413)) * 100)
+        print(f"MP3: {probe_audio(mp3_path)}")
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            probe_audio(wav_path)
+        print(f"1000次WAV探测耗时: {(time.perf_counter() - start) * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    test_audio_probe()
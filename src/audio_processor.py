@@ -2,20 +2,38 @@
 音频处理模块
 
 使用FFmpeg进行音频处理，包括音频拼接、静音插入和MP3编码。
+带 _async 后缀的方法是对应同步方法的异步版本：编码时ffmpeg作为asyncio子进程运行，
+解码、拼接和探测在线程池中进行，不会占住事件循环。
 """
 
+import asyncio
+import functools
 import ffmpeg
 import tempfile
 import numpy as np
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from config.voices import AUDIO_CONFIG
+from src.audio_probe import probe_audio
+from src.clip_validator import validate_clip
+from src.mp3_frames import LAME_ENCODER_DELAY, build_info_frame
+
+# 异步编码时每次写入编码器的字节数
+_PIPE_CHUNK = 1 << 20
 
 class AudioProcessor:
     """音频处理器"""
 
-    def __init__(self):
-        """初始化音频处理器"""
+    def __init__(self, pcm_cache=None, fragment_cache=None):
+        """
+        初始化音频处理器
+
+        Args:
+            pcm_cache: PCM缓存(PCMCache)，提供时渲染直接读取解码后的PCM
+            fragment_cache: MP3帧片段缓存(MP3FragmentCache)，快速拼装路径使用
+        """
+        self.pcm_cache = pcm_cache
+        self.fragment_cache = fragment_cache
         self.sample_rate = AUDIO_CONFIG["sample_rate"]
         self.bitrate = AUDIO_CONFIG["bitrate"]
         self.silence_duration = AUDIO_CONFIG["silence_duration"]
@@ -100,6 +118,9 @@ class AudioProcessor:
         if not command_audios:
             raise ValueError("没有命令音频文件")
 
+        if self.pcm_cache is not None:
+            return self.render_from_pcm(command_audios, output_path, include_silence)
+
         try:
             audio_segments = []
             temp_silence_files = []
@@ -124,6 +145,391 @@ class AudioProcessor:
         except Exception as e:
             raise RuntimeError(f"训练音频创建失败: {str(e)}")
 
+    def render_from_pcm(self,
+                        command_audios: List[Path],
+                        output_path: Path,
+                        include_silence: bool = True) -> Path:
+        """
+        从PCM缓存渲染训练音频，只进行最终的一次编码
+
+        Args:
+            command_audios: 命令音频文件列表
+            output_path: 输出文件路径
+            include_silence: 是否在命令间插入静音
+
+        Returns:
+            训练音频文件路径
+        """
+        try:
+            return self.encode_pcm(self.render_pcm(command_audios, include_silence), output_path)
+        except Exception as e:
+            raise RuntimeError(f"训练音频创建失败: {str(e)}")
+
+    def render_pcm(self,
+                   command_audios: List[Path],
+                   include_silence: bool = True,
+                   slot_samples: Optional[List[int]] = None,
+                   gaps: Optional[List[float]] = None) -> np.ndarray:
+        """
+        从PCM缓存拼接命令音频（命令之间插入静音）
+
+        Args:
+            command_audios: 命令音频文件列表
+            include_silence: 是否在命令间插入静音
+            slot_samples: 每个命令的最小时长(样本数)，片段较短时在其后补静音，
+                用于让多个语音版本共用同一时间线
+            gaps: 每个命令之后的静音时长(秒)，为None时使用固定的静音时长
+
+        Returns:
+            float32单声道PCM数组
+        """
+        # 每个不重复的片段只读取一次，按片段分组记录它出现的命令位置
+        groups: Dict[Path, List[int]] = {}
+        for index, audio_file in enumerate(command_audios):
+            groups.setdefault(audio_file, []).append(index)
+        clips = {audio_file: self.pcm_cache.get(audio_file) for audio_file in groups}
+
+        lengths = np.empty(len(command_audios), dtype=np.int64)
+        for audio_file, indices in groups.items():
+            lengths[indices] = len(clips[audio_file])
+        starts, total_samples = self.layout_starts(lengths, include_silence, slot_samples, gaps)
+
+        # 一次分配输出，再把每个片段放到它的全部偏移处
+        output = np.zeros(total_samples, dtype=np.float32)
+        for audio_file, indices in groups.items():
+            clip = clips[audio_file]
+            for start in starts[indices].tolist():
+                output[start:start + len(clip)] = clip
+        return output
+
+    def clip_lengths(self, command_audios: List[Path]) -> np.ndarray:
+        """
+        获取每个命令片段的样本数（重复的片段只读取一次）
+
+        Args:
+            command_audios: 命令音频文件列表
+
+        Returns:
+            int64样本数数组
+        """
+        lengths = {audio_file: len(self.pcm_cache.get(audio_file)) for audio_file in dict.fromkeys(command_audios)}
+        return np.fromiter((lengths[audio_file] for audio_file in command_audios),
+                           dtype=np.int64, count=len(command_audios))
+
+    def layout_starts(self,
+                      clip_lengths,
+                      include_silence: bool = True,
+                      slot_samples: Optional[List[int]] = None,
+                      gaps: Optional[List[float]] = None) -> Tuple[np.ndarray, int]:
+        """
+        用累加和一次算出每个命令的起始样本（参数含义同layout_timeline）
+
+        Returns:
+            (int64起始样本数组, 节目总样本数)
+        """
+        lengths = np.asarray(clip_lengths, dtype=np.int64)
+        count = len(lengths)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64), 0
+
+        # 每个命令占用的时长：片段长度与共享时间线时长中的较大者，再加其后的静音
+        if slot_samples is None:
+            advance = lengths.copy()
+        else:
+            advance = np.maximum(lengths, np.asarray(slot_samples, dtype=np.int64))
+        if include_silence:
+            if gaps is None:
+                advance[:-1] += int(self.silence_duration * self.sample_rate)
+            else:
+                advance[:-1] += (np.asarray(gaps[:count - 1], dtype=np.float64) * self.sample_rate).astype(np.int64)
+
+        ends = np.cumsum(advance)
+        starts = np.empty(count, dtype=np.int64)
+        starts[0] = 0
+        starts[1:] = ends[:-1]
+        return starts, int(ends[-1])
+
+    def layout_timeline(self,
+                        clip_lengths: List[int],
+                        include_silence: bool = True,
+                        slot_samples: Optional[List[int]] = None,
+                        gaps: Optional[List[float]] = None) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        计算每个命令在节目中的样本偏移
+
+        Args:
+            clip_lengths: 每个片段的样本数
+            include_silence: 是否在命令间插入静音
+            slot_samples: 每个命令的最小时长(样本数)，含义同render_pcm
+            gaps: 每个命令之后的静音时长(秒)，含义同render_pcm
+
+        Returns:
+            (每个命令的(起始, 结束)样本偏移, 节目总样本数)
+        """
+        starts, total_samples = self.layout_starts(clip_lengths, include_silence, slot_samples, gaps)
+        ends = starts + np.asarray(clip_lengths, dtype=np.int64)
+        return list(zip(starts.tolist(), ends.tolist())), total_samples
+
+    def gap_samples(self, gaps: Optional[List[float]], index: int) -> int:
+        """
+        计算第index个命令之后的静音样本数
+
+        Args:
+            gaps: 每个命令之后的静音时长(秒)，为None时使用默认静音时长
+            index: 命令序号
+
+        Returns:
+            静音样本数
+        """
+        duration = self.silence_duration if gaps is None else gaps[index]
+        return int(duration * self.sample_rate)
+
+    def encode_segments(self,
+                        segment_files: List[Path],
+                        output_path: Path,
+                        include_silence: bool = True) -> Path:
+        """
+        将已渲染的段落PCM文件（.npy）拼接并编码，段落之间插入静音
+
+        Args:
+            segment_files: 段落PCM文件列表
+            output_path: 输出文件路径
+            include_silence: 是否在段落间插入静音
+
+        Returns:
+            训练音频文件路径
+        """
+        if not segment_files:
+            raise ValueError("没有段落需要编码")
+
+        silence = np.zeros(int(self.silence_duration * self.sample_rate), dtype=np.float32)
+        pieces = []
+        for i, segment_file in enumerate(segment_files):
+            pieces.append(np.load(segment_file, mmap_mode="r"))
+            if i < len(segment_files) - 1 and include_silence:
+                pieces.append(silence)
+        return self.encode_pcm(np.concatenate(pieces), output_path)
+
+    def encode_pcm(self, samples: np.ndarray, output_path: Path) -> Path:
+        """
+        将PCM数据编码为MP3文件
+
+        Args:
+            samples: float32单声道PCM数组
+            output_path: 输出文件路径
+
+        Returns:
+            输出文件路径
+        """
+        try:
+            # 直接把数组缓冲区交给子进程，不再复制一份整段节目的字节串
+            self._encoder(output_path).run(
+                input=memoryview(np.ascontiguousarray(samples, dtype=np.float32)).cast("B"),
+                capture_stdout=True, capture_stderr=True
+            )
+            return output_path
+        except ffmpeg.Error as e:
+            stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+            raise RuntimeError(f"FFmpeg错误: {stderr_output}")
+
+    def _encoder(self, output_path: Path):
+        """从标准输入读取PCM并编码为MP3的ffmpeg流程"""
+        return (
+            ffmpeg
+            .input('pipe:', format='f32le', ac=1, ar=self.sample_rate)
+            .output(str(output_path), acodec='mp3', audio_bitrate=self.bitrate)
+            .overwrite_output()
+        )
+
+    def encoder_args(self, output_path: Path) -> List[str]:
+        """
+        获取流式编码器的命令行参数（编码设置与encode_pcm相同）
+
+        Args:
+            output_path: 输出文件路径
+
+        Returns:
+            ffmpeg命令行参数，PCM从标准输入逐块写入
+        """
+        return self._encoder(output_path).global_args('-loglevel', 'error', '-nostats').compile()
+
+    def fast_assemble(self,
+                      command_audios: List[Path],
+                      output_path: Path,
+                      include_silence: bool = True,
+                      slot_samples: Optional[List[int]] = None,
+                      gaps: Optional[List[float]] = None,
+                      cue_offsets: Optional[list] = None) -> Path:
+        """
+        快速拼装训练音频：按字节拼接预编码的MP3帧，不重新编码
+
+        片段和静音都是帧对齐的，静音帧数按累计误差取整，
+        使每个命令的起始时间与重新编码路径的偏差不超过半帧。
+        最后回写正确的Info/LAME头帧：每个片段开头都带有编码延迟，
+        头帧写入第一个片段的编码延迟和最后一个片段的末尾填充，解码器跳过后各片段恰好从其帧位置开始。
+
+        Args:
+            command_audios: 命令音频文件列表
+            output_path: 输出文件路径
+            include_silence: 是否在命令间插入静音
+            slot_samples: 每个命令的最小时长(样本数)，含义同render_pcm
+            gaps: 每个命令之后的静音时长(秒)，含义同render_pcm
+            cue_offsets: 提供列表时写入每个命令在输出中的实际(起始, 结束)样本偏移
+
+        Returns:
+            训练音频文件路径
+        """
+        if not command_audios:
+            raise ValueError("没有命令音频文件")
+        if self.fragment_cache is None:
+            raise ValueError("快速拼装需要MP3帧片段缓存")
+
+        try:
+            silence_frame = self.fragment_cache.get_silence_frame()
+            samples_per_frame = self.fragment_cache.samples_per_frame
+
+            intended_samples = 0  # 按原始PCM长度计算的目标位置
+            assembled_samples = 0  # 已写入帧对应的实际位置
+            frame_count = 0
+
+            with open(output_path, "wb") as out:
+                # 先写入占位头帧，拼装完成后回写
+                out.write(build_info_frame(silence_frame, 0, 0))
+
+                for i, audio_file in enumerate(command_audios):
+                    fragment = self.fragment_cache.get_clip_fragment(audio_file)
+                    if cue_offsets is not None:
+                        cue_offsets.append((assembled_samples, assembled_samples + fragment.pcm_samples))
+                    out.write(fragment.data)
+                    frame_count += fragment.frame_count
+                    assembled_samples += fragment.frame_count * samples_per_frame
+                    intended_samples += fragment.pcm_samples
+                    if slot_samples is not None:
+                        intended_samples += max(0, slot_samples[i] - fragment.pcm_samples)
+
+                    if i < len(command_audios) - 1 and (include_silence or slot_samples is not None):
+                        if include_silence:
+                            intended_samples += self.gap_samples(gaps, i)
+                        silence_frames = max(0, round((intended_samples - assembled_samples) / samples_per_frame))
+                        out.write(silence_frame * silence_frames)
+                        frame_count += silence_frames
+                        assembled_samples += silence_frames * samples_per_frame
+
+                # 最后一个片段的有效样本之后到流末尾都是填充
+                last_start = assembled_samples - fragment.frame_count * samples_per_frame
+                padding = assembled_samples - LAME_ENCODER_DELAY - last_start - fragment.pcm_samples
+
+                # 音乐CRC需要逐字节计算整段音频，置0（解码器不校验该字段）
+                stream_bytes = out.tell()
+                out.seek(0)
+                out.write(build_info_frame(silence_frame, frame_count, stream_bytes,
+                                           encoder_delay=LAME_ENCODER_DELAY, padding=padding))
+
+            return output_path
+        except Exception as e:
+            raise RuntimeError(f"快速拼装失败: {str(e)}")
+
+    def verify_fast_assemble(self,
+                             command_audios: List[Path],
+                             include_silence: bool = True,
+                             max_duration_diff: float = 0.1,
+                             min_correlation: float = 0.9) -> dict:
+        """
+        比较快速拼装与重新编码两条路径的输出是否等效
+
+        分别渲染两条路径并解码，比较总时长和50ms窗口的响度包络相关性。
+
+        Args:
+            command_audios: 命令音频文件列表
+            include_silence: 是否在命令间插入静音
+            max_duration_diff: 允许的最大时长差(秒)
+            min_correlation: 要求的最小包络相关系数
+
+        Returns:
+            比较结果字典
+        """
+        if self.pcm_cache is None:
+            raise ValueError("等效性检查需要PCM缓存")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            reencoded = self.render_from_pcm(command_audios, temp_path / "reencode.mp3", include_silence)
+            assembled = self.fast_assemble(command_audios, temp_path / "fast.mp3", include_silence)
+            reference = self.pcm_cache.decode(reencoded)
+            candidate = self.pcm_cache.decode(assembled)
+
+        window = int(0.05 * self.sample_rate)
+        length = min(len(reference), len(candidate)) // window * window
+        reference_envelope = np.sqrt(np.mean(reference[:length].reshape(-1, window) ** 2, axis=1))
+        candidate_envelope = np.sqrt(np.mean(candidate[:length].reshape(-1, window) ** 2, axis=1))
+        if np.std(reference_envelope) > 0 and np.std(candidate_envelope) > 0:
+            correlation = float(np.corrcoef(reference_envelope, candidate_envelope)[0, 1])
+        else:
+            correlation = 1.0 if np.allclose(reference_envelope, candidate_envelope, atol=1e-4) else 0.0
+
+        duration_diff = abs(len(reference) - len(candidate)) / self.sample_rate
+        return {
+            "reencode_duration": len(reference) / self.sample_rate,
+            "fast_duration": len(candidate) / self.sample_rate,
+            "duration_diff": duration_diff,
+            "envelope_correlation": correlation,
+            "equivalent": duration_diff <= max_duration_diff and correlation >= min_correlation,
+        }
+
+    async def _offload(self, func, *args, **kwargs):
+        """在线程池中运行阻塞的音频操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def encode_pcm_async(self, samples: np.ndarray, output_path: Path) -> Path:
+        """
+        异步将PCM数据编码为MP3文件（编码设置与encode_pcm相同）
+
+        Args:
+            samples: float32单声道PCM数组
+            output_path: 输出文件路径
+
+        Returns:
+            输出文件路径
+        """
+        data = memoryview(np.ascontiguousarray(samples, dtype=np.float32)).cast("B")
+        process = await asyncio.create_subprocess_exec(
+            *self.encoder_args(output_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            for start in range(0, len(data), _PIPE_CHUNK):
+                process.stdin.write(data[start:start + _PIPE_CHUNK])
+                await process.stdin.drain()
+            process.stdin.close()
+            await process.stdin.wait_closed()
+        except (BrokenPipeError, ConnectionResetError):
+            # 编码器提前退出，错误信息在下面从stderr读取
+            pass
+        except BaseException:
+            process.kill()
+            await process.wait()
+            raise
+
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            raise RuntimeError(f"FFmpeg错误: {stderr.decode('utf-8', errors='replace')}")
+        return output_path
+
+    async def load_pcm_async(self, audio_file: Path) -> np.ndarray:
+        """
+        异步从PCM缓存读取片段（未缓存时在线程池中解码）
+
+        Args:
+            audio_file: 片段文件路径
+
+        Returns:
+            float32单声道PCM数组
+        """
+        return await self._offload(self.pcm_cache.get, audio_file)
+
     def get_audio_duration(self, audio_path: Path) -> float:
         """
         获取音频文件时长
@@ -134,6 +540,11 @@ class AudioProcessor:
         Returns:
             音频时长(秒)
         """
+        # 优先在进程内解析文件头，无法识别的格式再启动ffprobe
+        info = probe_audio(audio_path)
+        if info is not None:
+            return info.duration
+
         try:
             probe = ffmpeg.probe(str(audio_path))
             duration = float(probe['streams'][0]['duration'])
@@ -141,12 +552,15 @@ class AudioProcessor:
         except Exception as e:
             raise RuntimeError(f"获取音频时长失败: {str(e)}")
 
-    def validate_audio_file(self, audio_path: Path) -> bool:
+    def validate_audio_file(self, audio_path: Path, text: Optional[str] = None) -> bool:
         """
         验证音频文件是否有效
 
+        MP3文件在进程内逐帧检查，WAV文件解析文件头，无需启动ffprobe；其它格式仍使用ffprobe。
+
         Args:
             audio_path: 音频文件路径
+            text: 文件对应的命令文本，提供时同时检查时长是否与文本长度相符
 
         Returns:
             是否为有效音频文件
@@ -155,6 +569,11 @@ class AudioProcessor:
             if not audio_path.exists():
                 return False
 
+            if audio_path.suffix.lower() == ".mp3":
+                return validate_clip(audio_path, text) is None
+            if probe_audio(audio_path) is not None:
+                return True
+
             probe = ffmpeg.probe(str(audio_path))
             return 'streams' in probe and len(probe['streams']) > 0
         except Exception:
@@ -179,6 +598,11 @@ def test_audio_processor():
             else:
                 print("静音文件验证失败")
 
+            # 异步接口测试
+            async_file = temp_path / "test_silence_async.mp3"
+            asyncio.run(processor.encode_pcm_async(np.zeros(2 * processor.sample_rate, dtype=np.float32), async_file))
+            print(f"异步生成静音文件，时长: {processor.get_audio_duration(async_file):.2f}秒")
+
     except Exception as e:
         print(f"测试失败: {e}")
 
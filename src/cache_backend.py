@@ -0,0 +1,372 @@
+"""
+共享缓存后端模块
+
+多台渲染主机共用一份语音片段缓存，让每个短语在整个集群中只合成一次：
+- SharedDirectoryStore：共享挂载目录 + SQLite索引，片段以"写临时文件再重命名"的方式无锁发布
+- KeyValueClipStore：基于可插拔键值接口的实现，InMemoryKeyValueStore是用于测试的本地替身
+
+合成前先在后端登记认领（带租约），其它主机看到有效认领时等待发布，不再重复合成。
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+class ClipStore(ABC):
+    """片段共享存储接口"""
+
+    @abstractmethod
+    def fetch(self, key: str, target: Path) -> bool:
+        """
+        把片段复制到本地路径
+
+        Args:
+            key: 缓存键
+            target: 本地目标路径
+
+        Returns:
+            是否找到片段
+        """
+
+    @abstractmethod
+    def publish(self, key: str, source: Path, node: str):
+        """
+        发布片段（已存在时保留先发布的版本）
+
+        Args:
+            key: 缓存键
+            source: 本地片段文件
+            node: 发布片段的节点名称
+        """
+
+    @abstractmethod
+    def contains(self, key: str) -> bool:
+        """检查片段是否已发布"""
+
+    @abstractmethod
+    def discard(self, key: str):
+        """删除无效片段"""
+
+    @abstractmethod
+    def claim(self, key: str, node: str, lease: float) -> bool:
+        """
+        认领片段的合成任务
+
+        Args:
+            key: 缓存键
+            node: 节点名称
+            lease: 租约时长(秒)，超时未发布时其它节点可以接手
+
+        Returns:
+            是否认领成功（已被其它节点有效认领时返回False）
+        """
+
+    @abstractmethod
+    def release(self, key: str, node: str):
+        """释放认领"""
+
+    @abstractmethod
+    def record_stats(self, node: str, counts: Dict[str, int]):
+        """累加节点的统计计数"""
+
+    @abstractmethod
+    def node_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取所有节点的统计计数"""
+
+
+class SharedDirectoryStore(ClipStore):
+    """共享目录存储：片段文件放在共享挂载上，SQLite索引记录发布、认领和统计"""
+
+    def __init__(self, root: Path):
+        """
+        初始化共享目录存储
+
+        Args:
+            root: 共享目录（所有节点挂载到同一位置）
+        """
+        self.root = Path(root)
+        self.clip_dir = self.root / "clips"
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.sqlite"
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS clips (key TEXT PRIMARY KEY, size INTEGER, node TEXT, created REAL);
+                CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, node TEXT, expires REAL);
+                CREATE TABLE IF NOT EXISTS node_stats (node TEXT, name TEXT, value INTEGER,
+                                                       PRIMARY KEY (node, name));
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开索引连接（每次操作单独连接并在结束时关闭，可在多线程和多进程中使用）"""
+        with closing(sqlite3.connect(self.index_path, timeout=30, isolation_level=None)) as conn:
+            yield conn
+
+    def _path(self, key: str) -> Path:
+        """片段在共享目录中的路径"""
+        return self.clip_dir / f"{key}.mp3"
+
+    def fetch(self, key: str, target: Path) -> bool:
+        try:
+            shutil.copyfile(self._path(key), target)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def publish(self, key: str, source: Path, node: str):
+        path = self._path(key)
+        if not path.exists():
+            # 先写到共享目录内的临时文件，再重命名发布，读者不会看到写了一半的文件
+            temp_path = self.clip_dir / f".{key}.{uuid.uuid4().hex}.part"
+            try:
+                shutil.copyfile(source, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO clips VALUES (?, ?, ?, ?)",
+                         (key, path.stat().st_size, node, time.time()))
+
+    def contains(self, key: str) -> bool:
+        # 以文件为准，索引只用于统计和审计
+        return self._path(key).exists()
+
+    def discard(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+
+    def claim(self, key: str, node: str, lease: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT node, expires FROM claims WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] != node and row[1] > now:
+                    return False
+                conn.execute("INSERT OR REPLACE INTO claims VALUES (?, ?, ?)", (key, node, now + lease))
+                return True
+            finally:
+                conn.execute("COMMIT")
+
+    def release(self, key: str, node: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM claims WHERE key = ? AND node = ?", (key, node))
+
+    def record_stats(self, node: str, counts: Dict[str, int]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO node_stats VALUES (?, ?, ?) "
+                "ON CONFLICT(node, name) DO UPDATE SET value = value + excluded.value",
+                [(node, name, value) for name, value in counts.items() if value]
+            )
+
+    def node_stats(self) -> Dict[str, Dict[str, int]]:
+        stats: Dict[str, Dict[str, int]] = {}
+        with self._connect() as conn:
+            for node, name, value in conn.execute("SELECT node, name, value FROM node_stats"):
+                stats.setdefault(node, {})[name] = value
+        return stats
+
+
+class KeyValueStore(ABC):
+    """可插拔键值存储接口（语义与Redis等常见键值服务一致）"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """读取值，不存在或已过期时返回None"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """写入值"""
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """键不存在（或已过期）时写入，返回是否写入成功"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """删除键"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1) -> int:
+        """原子累加计数"""
+
+    @abstractmethod
+    def scan(self, prefix: str) -> Dict[str, bytes]:
+        """列出指定前缀的全部键值"""
+
+
+class InMemoryKeyValueStore(KeyValueStore):
+    """进程内键值存储，作为共享键值服务的本地替身"""
+
+    def __init__(self):
+        """初始化进程内键值存储"""
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[tuple]:
+        """读取未过期的条目（调用方持有锁）"""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + amount if entry is not None else amount
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+    def scan(self, prefix: str) -> Dict[str, bytes]:
+        with self._lock:
+            return {key: self._data[key][0] for key in list(self._data)
+                    if key.startswith(prefix) and self._live(key) is not None}
+
+
+class KeyValueClipStore(ClipStore):
+    """基于键值接口的片段存储"""
+
+    def __init__(self, kv: KeyValueStore, namespace: str = "fencing"):
+        """
+        初始化键值片段存储
+
+        Args:
+            kv: 键值存储
+            namespace: 键名前缀
+        """
+        self.kv = kv
+        self.namespace = namespace
+
+    def _key(self, kind: str, key: str) -> str:
+        """带命名空间的完整键名"""
+        return f"{self.namespace}:{kind}:{key}"
+
+    def fetch(self, key: str, target: Path) -> bool:
+        data = self.kv.get(self._key("clip", key))
+        if data is None:
+            return False
+        target.write_bytes(data)
+        return True
+
+    def publish(self, key: str, source: Path, node: str):
+        self.kv.add(self._key("clip", key), source.read_bytes())
+
+    def contains(self, key: str) -> bool:
+        return self.kv.get(self._key("clip", key)) is not None
+
+    def discard(self, key: str):
+        self.kv.delete(self._key("clip", key))
+
+    def claim(self, key: str, node: str, lease: float) -> bool:
+        claim_key = self._key("claim", key)
+        if self.kv.add(claim_key, node.encode(), ttl=lease):
+            return True
+        return self.kv.get(claim_key) == node.encode()
+
+    def release(self, key: str, node: str):
+        claim_key = self._key("claim", key)
+        if self.kv.get(claim_key) == node.encode():
+            self.kv.delete(claim_key)
+
+    def record_stats(self, node: str, counts: Dict[str, int]):
+        for name, value in counts.items():
+            if value:
+                self.kv.incr(self._key("stats", f"{node}:{name}"), value)
+
+    def node_stats(self) -> Dict[str, Dict[str, int]]:
+        prefix = self._key("stats", "")
+        stats: Dict[str, Dict[str, int]] = {}
+        for full_key, value in self.kv.scan(prefix).items():
+            node, name = full_key[len(prefix):].rsplit(":", 1)
+            stats.setdefault(node, {})[name] = int(value)
+        return stats
+
+
+def test_cache_backend():
+    """测试共享缓存后端：两个节点共用一个后端，短语只合成一次"""
+    import asyncio
+    import tempfile
+    from src.clip_cache import ClipCache
+
+    async def render_node(cache: ClipCache, texts, synthesized: list):
+        async def get(text: str):
+            key = cache.key(text, {"voice": "test"})
+            while not cache.claim(key):
+                await asyncio.sleep(0.01)
+                if cache.contains(key):
+                    break
+            path = cache.lookup(key)
+            if path is None:
+                await asyncio.sleep(0.05)  # 模拟合成耗时
+                temp_path = cache.temp_path(key)
+                temp_path.write_bytes(text.encode("utf-8"))
+                path = cache.publish(key, temp_path)
+                synthesized.append((cache.node, text))
+            return path
+
+        await asyncio.gather(*(get(text) for text in texts))
+        cache.flush_stats()
+
+    texts = [f"短语{i}" for i in range(20)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        for name, store in [("共享目录", SharedDirectoryStore(temp_path / "shared")),
+                            ("键值替身", InMemoryKeyValueStore())]:
+            if isinstance(store, KeyValueStore):
+                store = KeyValueClipStore(store)
+            synthesized = []
+            nodes = [ClipCache(cache_dir=temp_path / name / f"node{i}", backend=store, node=f"node{i}")
+                     for i in range(2)]
+
+            async def run():
+                await asyncio.gather(*(render_node(cache, texts, synthesized) for cache in nodes))
+
+            asyncio.run(run())
+            print(f"{name}: {len(texts)} 个短语，合成 {len(synthesized)} 次")
+            for node, stats in sorted(store.node_stats().items()):
+                print(f"  {node}: {stats}")
+
+    class IncompleteStore(ClipStore):
+        def fetch(self, key: str, target: Path) -> bool:
+            return False
+
+    try:
+        IncompleteStore()
+        print("未实现全部接口的后端未被拒绝")
+    except TypeError as e:
+        print(f"未实现全部接口的后端构造失败: {e}")
+
+
+if __name__ == "__main__":
+    test_cache_backend()
@@ -0,0 +1,87 @@
+"""
+缓存预热模块
+
+枚举模板、部位、攻击类型和次数1..N可能用到的全部短语，
+在合成调度器的速率限制下并发填充语音片段缓存。
+"""
+
+import asyncio
+from typing import Callable, List, Optional
+
+from src.clip_cache import ClipCache
+from src.synthesis_scheduler import SynthesisScheduler
+from src.tts_generator import TTSGenerator
+
+
+class CacheWarmer:
+    """语音片段缓存预热器"""
+
+    def __init__(self,
+                 texts: List[str],
+                 voices: List[str],
+                 clip_cache: ClipCache,
+                 scheduler: SynthesisScheduler):
+        """
+        初始化缓存预热器
+
+        Args:
+            texts: 需要预热的短语文本
+            voices: 语音配置名称列表
+            clip_cache: 语音片段缓存
+            scheduler: 合成调度器
+        """
+        self.texts = texts
+        self.generators = [
+            TTSGenerator(voice, clip_cache=clip_cache, scheduler=scheduler)
+            for voice in voices
+        ]
+        self.clip_cache = clip_cache
+
+    async def warm(self, progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        预热缓存，已缓存的片段直接跳过，因此中断后重新运行即可继续
+
+        Args:
+            progress: 进度回调，参数为(已完成数, 需合成总数)
+
+        Returns:
+            预热报告字典
+        """
+        self.clip_cache.cleanup_partial()
+
+        pending = []
+        cached = 0
+        for generator in self.generators:
+            for text in self.texts:
+                if generator.is_cached(text):
+                    cached += 1
+                else:
+                    pending.append((generator, text))
+
+        report = {
+            "total": cached + len(pending),
+            "cached": cached,
+            "fetched": 0,
+            "failed": 0,
+            "errors": [],
+        }
+
+        async def fetch(generator: TTSGenerator, text: str):
+            try:
+                await generator.generate_clip(text)
+                report["fetched"] += 1
+            except Exception as e:
+                report["failed"] += 1
+                report["errors"].append(f"[{generator.voice_name}] {e}")
+            if progress is not None:
+                progress(report["fetched"] + report["failed"], len(pending))
+
+        await asyncio.gather(*(fetch(generator, text) for generator, text in pending))
+        report["repaired"] = sum(generator.invalid_clips for generator in self.generators)
+
+        # 上报本节点统计，共享缓存时附带集群中各节点的统计
+        self.clip_cache.flush_stats()
+        report["cache"] = self.clip_cache.get_stats()
+        if self.clip_cache.backend is not None:
+            report["nodes"] = self.clip_cache.backend.node_stats()
+        return report
@@ -0,0 +1,230 @@
+"""
+节奏模块
+
+攻击周期定义为一个计数口令（"N！"）开始到同一段落中下一个计数口令开始的时长，
+周期内只包含保持和归位口令；提醒口令与段落切换一样打断节奏，所在周期不计入。根据渲染得到的样本偏移统计周期时长的抖动，
+固定节奏模式下调整每个周期末尾的静音，使每个周期恰好等于目标时长，无需重新合成。
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config.voices import AUDIO_CONFIG, CADENCE_CONFIG
+
+# 周期内可以出现的口令类型
+_CYCLE_KINDS = {"hold", "return_position"}
+
+
+def attack_cycles(kinds: Sequence[str]) -> List[Tuple[int, int]]:
+    """
+    找出所有攻击周期
+
+    Args:
+        kinds: 每个命令的类型
+
+    Returns:
+        (周期起始命令序号, 下一个计数口令序号) 列表
+    """
+    cycles = []
+    start = None
+    for index, kind in enumerate(kinds):
+        if kind == "count":
+            if start is not None:
+                cycles.append((start, index))
+            start = index
+        elif kind not in _CYCLE_KINDS:
+            start = None
+    return cycles
+
+
+class CadencePlanner:
+    """固定节奏静音规划：周期内的静音不变，由周期最后一个静音补齐或压缩到目标时长"""
+
+    def __init__(self,
+                 kinds: Sequence[str],
+                 period: float,
+                 sample_rate: Optional[int] = None,
+                 silence_duration: Optional[float] = None,
+                 min_gap: Optional[float] = None):
+        """
+        初始化节奏规划器
+
+        Args:
+            kinds: 每个命令的类型
+            period: 目标攻击周期(秒)
+            sample_rate: 采样率
+            silence_duration: 周期内其它位置的静音时长(秒)
+            min_gap: 周期末尾静音的下限(秒)
+        """
+        self.sample_rate = sample_rate or AUDIO_CONFIG["sample_rate"]
+        silence_duration = AUDIO_CONFIG["silence_duration"] if silence_duration is None else silence_duration
+        min_gap = CADENCE_CONFIG["min_gap"] if min_gap is None else min_gap
+
+        self.period = period
+        self.period_samples = round(period * self.sample_rate)
+        self.gap_samples = int(silence_duration * self.sample_rate)
+        self.min_gap_samples = int(min_gap * self.sample_rate)
+
+        cycles = attack_cycles(kinds)
+        self._cycle_starts = {start for start, _ in cycles}
+        # 命令序号 -> 它之后的静音结束的周期（即下一个计数口令的周期起点）
+        self._closing = {next_start - 1: start for start, next_start in cycles}
+        self._starts: Dict[int, int] = {}
+        self._position = 0
+
+    def gap_after(self, index: int, occupied: int) -> int:
+        """
+        计算第index个命令之后的静音样本数（需按顺序对每个命令调用）
+
+        Args:
+            index: 命令序号
+            occupied: 该命令占用的样本数（片段长度或共享时间线时长）
+
+        Returns:
+            静音样本数
+        """
+        if index in self._cycle_starts:
+            self._starts[index] = self._position
+        end = self._position + occupied
+
+        cycle_start = self._closing.get(index)
+        if cycle_start is None:
+            gap = self.gap_samples
+        else:
+            start = self._starts.pop(cycle_start)
+            gap = start + self.period_samples - end
+            if gap < self.min_gap_samples:
+                needed = (end - start + self.min_gap_samples) / self.sample_rate
+                raise ValueError(f"攻击周期 {self.period:g} 秒过短：第 {cycle_start + 1} 个命令开始的周期"
+                                 f"至少需要 {needed:.2f} 秒")
+        self._position = end + gap
+        return gap
+
+    def gaps(self, occupied: Sequence[int]) -> List[float]:
+        """
+        一次算出整个节目每个命令之后的静音时长
+
+        Args:
+            occupied: 每个命令占用的样本数
+
+        Returns:
+            静音时长(秒)列表，可直接作为render_pcm等方法的gaps参数
+        """
+        # 加半个样本再换算成秒，渲染时按秒取整回样本数不会少一个样本
+        return [(self.gap_after(index, length) + 0.5) / self.sample_rate
+                for index, length in enumerate(occupied[:-1])]
+
+
+def required_tempo(kinds: Sequence[str],
+                   occupied: Sequence[int],
+                   period: float,
+                   stretch_kinds: Sequence[str],
+                   sample_rate: Optional[int] = None,
+                   silence_duration: Optional[float] = None,
+                   min_gap: Optional[float] = None) -> float:
+    """
+    计算让每个攻击周期都能放进目标周期所需的最小变速倍率
+
+    Args:
+        kinds: 每个命令的类型
+        occupied: 每个命令占用的样本数
+        period: 目标攻击周期(秒)
+        stretch_kinds: 参与变速的口令类型
+        sample_rate: 采样率
+        silence_duration: 周期内其它位置的静音时长(秒)
+        min_gap: 周期末尾静音的下限(秒)
+
+    Returns:
+        变速倍率，不需要变速时为1.0
+    """
+    sample_rate = sample_rate or AUDIO_CONFIG["sample_rate"]
+    silence_duration = AUDIO_CONFIG["silence_duration"] if silence_duration is None else silence_duration
+    min_gap = CADENCE_CONFIG["min_gap"] if min_gap is None else min_gap
+    gap_samples = int(silence_duration * sample_rate)
+
+    factor = 1.0
+    for start, next_start in attack_cycles(kinds):
+        stretchable = sum(occupied[i] for i in range(start, next_start) if kinds[i] in stretch_kinds)
+        fixed = sum(occupied[i] for i in range(start, next_start) if kinds[i] not in stretch_kinds)
+        budget = round(period * sample_rate) - fixed - (next_start - start - 1) * gap_samples \
+            - int(min_gap * sample_rate)
+        if budget <= 0:
+            raise ValueError(f"攻击周期 {period:g} 秒过短：周期内的静音已超过目标周期，变速也无法满足")
+        factor = max(factor, stretchable / budget)
+    return factor
+
+
+def cadence_stats(offsets: Sequence[Tuple[int, int]],
+                  kinds: Sequence[str],
+                  sample_rate: Optional[int] = None,
+                  target: Optional[float] = None) -> Optional[dict]:
+    """
+    根据样本偏移统计攻击周期的节奏
+
+    Args:
+        offsets: 每个命令的(起始, 结束)样本偏移
+        kinds: 每个命令的类型
+        sample_rate: 采样率
+        target: 目标周期(秒)，为None时以平均周期为基准计算偏差
+
+    Returns:
+        统计字典（周期时长单位为秒，偏差单位为毫秒），没有攻击周期时返回None
+    """
+    sample_rate = sample_rate or AUDIO_CONFIG["sample_rate"]
+    periods = [(offsets[next_start][0] - offsets[start][0]) / sample_rate
+               for start, next_start in attack_cycles(kinds)]
+    if not periods:
+        return None
+
+    mean = sum(periods) / len(periods)
+    reference = mean if target is None else target
+    deviations = sorted(abs(period - reference) * 1000 for period in periods)
+    return {
+        "cycles": len(periods),
+        "target": target,
+        "mean_period": mean,
+        "min_period": min(periods),
+        "max_period": max(periods),
+        "mean_deviation_ms": sum(deviations) / len(deviations),
+        "p95_deviation_ms": deviations[min(len(deviations) - 1, int(len(deviations) * 0.95))],
+        "max_deviation_ms": deviations[-1],
+    }
+
+
+def test_cadence():
+    """测试节奏统计和固定节奏规划"""
+    import random
+
+    sample_rate = 1000
+    kinds = ["segment_start", "action_guidance"]
+    for i in range(1, 31):
+        kinds += ["count", "hold", "return_position"]
+        if i % 20 == 0:
+            kinds.append("reminder")
+    kinds.append("segment_complete")
+
+    rng = random.Random(0)
+    lengths = [rng.randint(300, 1500) for _ in kinds]
+
+    def layout(gaps):
+        offsets, position = [], 0
+        for index, length in enumerate(lengths):
+            offsets.append((position, position + length))
+            position += length + (int(gaps[index] * sample_rate) if index < len(lengths) - 1 else 0)
+        return offsets
+
+    natural = cadence_stats(layout([2.0] * len(lengths)), kinds, sample_rate)
+    print(f"自然节奏: {natural['cycles']} 个周期，平均 {natural['mean_period']:.3f} 秒，"
+          f"p95偏差 {natural['p95_deviation_ms']:.0f} 毫秒")
+
+    planner = CadencePlanner(kinds, 10.0, sample_rate, silence_duration=2.0)
+    fixed = cadence_stats(layout(planner.gaps(lengths)), kinds, sample_rate, target=10.0)
+    print(f"固定节奏: 平均 {fixed['mean_period']:.3f} 秒，最大偏差 {fixed['max_deviation_ms']:.1f} 毫秒")
+
+    try:
+        CadencePlanner(kinds, 5.0, sample_rate, silence_duration=2.0).gaps(lengths)
+    except ValueError as e:
+        print(f"目标过短: {e}")
+
+
+if __name__ == "__main__":
+    test_cadence()
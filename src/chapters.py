@@ -0,0 +1,249 @@
+"""
+分段输出与章节模块
+
+长节目可以按段落或按时长切分为多个文件并写出清单，供客户端按需下载；
+输出单个文件时则写入ID3章节帧（CHAP/CTOC），播放器可直接跳转到各段落。
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from src.mp3_frames import skip_id3v2
+
+
+class Chapter(NamedTuple):
+    """节目中的一个章节或分段"""
+    title: str  # 标题
+    first_command: int  # 第一个命令的序号（从0开始）
+    last_command: int  # 最后一个命令之后的序号
+    start_sample: int  # 起始样本偏移
+    end_sample: int  # 结束样本偏移（含到下一章节之前的静音）
+
+
+def build_chapters(titles: Sequence[str],
+                   starts: Sequence[int],
+                   offsets: Sequence[Tuple[int, int]],
+                   total_samples: int) -> List[Chapter]:
+    """
+    按章节起始命令划分节目
+
+    Args:
+        titles: 每个命令的文本，章节以其第一个命令为标题
+        starts: 每个章节第一个命令的序号，升序且以0开头
+        offsets: 每个命令的(起始, 结束)样本偏移
+        total_samples: 节目总样本数
+
+    Returns:
+        章节列表
+    """
+    chapters = []
+    bounds = list(starts) + [len(offsets)]
+    for first, last in zip(bounds, bounds[1:]):
+        end_sample = offsets[last][0] if last < len(offsets) else total_samples
+        chapters.append(Chapter(
+            title=titles[first],
+            first_command=first,
+            last_command=last,
+            start_sample=offsets[first][0],
+            end_sample=end_sample
+        ))
+    return chapters
+
+
+def segment_starts(segment_lengths: Sequence[int]) -> List[int]:
+    """
+    计算每个段落第一个命令的序号
+
+    Args:
+        segment_lengths: 每个段落的命令数
+
+    Returns:
+        段落起始命令序号列表
+    """
+    starts = []
+    position = 0
+    for length in segment_lengths:
+        starts.append(position)
+        position += length
+    return starts
+
+
+def duration_starts(offsets: Sequence[Tuple[int, int]], max_samples: int) -> List[int]:
+    """
+    按时长在命令边界切分，每段在超过时长后的第一个命令处结束
+
+    Args:
+        offsets: 每个命令的(起始, 结束)样本偏移
+        max_samples: 每段的目标时长(样本数)
+
+    Returns:
+        每段起始命令序号列表
+    """
+    starts = [0]
+    for i, (start, _) in enumerate(offsets[1:], 1):
+        if start - offsets[starts[-1]][0] >= max_samples:
+            starts.append(i)
+    return starts
+
+
+def _syncsafe(value: int) -> bytes:
+    """编码为ID3同步安全整数"""
+    return bytes([(value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F])
+
+
+def _id3_frame(frame_id: str, payload: bytes) -> bytes:
+    """编码ID3v2.3帧"""
+    return frame_id.encode("ascii") + struct.pack(">I", len(payload)) + b"\x00\x00" + payload
+
+
+def _title_frame(title: str) -> bytes:
+    """编码TIT2标题帧（UTF-16带BOM，ID3v2.3不支持UTF-8）"""
+    return _id3_frame("TIT2", b"\x01" + title.encode("utf-16") + b"\x00\x00")
+
+
+def build_chapter_tag(chapters: Sequence[Chapter], sample_rate: int) -> bytes:
+    """
+    生成包含CTOC目录和CHAP章节帧的ID3v2.3标签
+
+    Args:
+        chapters: 章节列表
+        sample_rate: 采样率
+
+    Returns:
+        ID3标签数据
+    """
+    if len(chapters) > 255:
+        raise ValueError(f"章节数量过多: {len(chapters)}，ID3目录最多支持255个章节")
+
+    element_ids = [f"chp{i}".encode("ascii") for i in range(len(chapters))]
+
+    # 顶层、有序目录
+    frames = _id3_frame(
+        "CTOC",
+        b"toc\x00" + bytes([0x03, len(chapters)]) + b"".join(element_id + b"\x00" for element_id in element_ids)
+    )
+    for element_id, chapter in zip(element_ids, chapters):
+        start_ms = int(round(chapter.start_sample * 1000 / sample_rate))
+        end_ms = int(round(chapter.end_sample * 1000 / sample_rate))
+        # 字节偏移填0xFFFFFFFF，表示只按时间定位
+        frames += _id3_frame(
+            "CHAP",
+            element_id + b"\x00" + struct.pack(">IIII", start_ms, end_ms, 0xFFFFFFFF, 0xFFFFFFFF)
+            + _title_frame(chapter.title)
+        )
+    return b"ID3\x03\x00\x00" + _syncsafe(len(frames)) + frames
+
+
+def write_chapters(audio_path: Path, chapters: Sequence[Chapter], sample_rate: int) -> Path:
+    """
+    在MP3文件开头写入章节标签（替换已有的ID3v2标签）
+
+    Args:
+        audio_path: MP3文件路径
+        chapters: 章节列表
+        sample_rate: 采样率
+
+    Returns:
+        MP3文件路径
+    """
+    data = audio_path.read_bytes()
+    tag = build_chapter_tag(chapters, sample_rate)
+
+    fd, tmp_name = tempfile.mkstemp(dir=audio_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(tag)
+            f.write(data[skip_id3v2(data):])
+        # mkstemp创建的文件权限为0600，沿用原文件的权限
+        shutil.copymode(audio_path, tmp_name)
+        os.replace(tmp_name, audio_path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return audio_path
+
+
+def chunk_path(output_path: Path, index: int) -> Path:
+    """第index个分段文件的路径"""
+    return output_path.with_name(f"{output_path.stem}_part{index + 1:03d}{output_path.suffix}")
+
+
+def manifest_path(output_path: Path) -> Path:
+    """分段清单文件的路径"""
+    return output_path.with_suffix(".manifest.json")
+
+
+def write_manifest(output_path: Path,
+                   chunks: Sequence[Chapter],
+                   chunk_files: Sequence[Path],
+                   sample_rate: int,
+                   split: Optional[str] = None) -> Path:
+    """
+    写入分段清单
+
+    Args:
+        output_path: 节目输出路径（清单写在其旁边）
+        chunks: 分段列表
+        chunk_files: 各分段的音频文件
+        sample_rate: 采样率
+        split: 切分方式描述
+
+    Returns:
+        清单文件路径
+    """
+    payload = {
+        "program": output_path.name,
+        "sample_rate": sample_rate,
+        "split": split,
+        "duration": round(chunks[-1].end_sample / sample_rate, 3) if chunks else 0.0,
+        "chunks": [
+            {
+                "index": i,
+                "file": chunk_file.name,
+                "title": chunk.title,
+                "start": round(chunk.start_sample / sample_rate, 3),
+                "duration": round((chunk.end_sample - chunk.start_sample) / sample_rate, 3),
+                "commands": [chunk.first_command, chunk.last_command],
+                "size_bytes": chunk_file.stat().st_size,
+            }
+            for i, (chunk, chunk_file) in enumerate(zip(chunks, chunk_files))
+        ],
+    }
+    path = manifest_path(output_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def test_chapters():
+    """测试章节标签"""
+    from src.mp3_frames import parse_frame_header
+
+    sample_rate = 44100
+    offsets = [(0, 44100), (132300, 176400), (264600, 308700), (396900, 441000)]
+    titles = ["开始", "一", "开始", "二"]
+
+    chapters = build_chapters(titles, segment_starts([2, 2]), offsets, 441000)
+    for chapter in chapters:
+        print(f"  {chapter.title}: {chapter.start_sample / sample_rate:.1f}s - "
+              f"{chapter.end_sample / sample_rate:.1f}s")
+    print(f"按3秒切分: {duration_starts(offsets, 3 * sample_rate)}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 一个MPEG-1 Layer III 128kbps 44.1kHz的空帧
+        frame = b"\xff\xfb\x90\x00" + bytes(413)
+        audio_path = Path(temp_dir) / "test.mp3"
+        audio_path.write_bytes(frame * 4)
+        write_chapters(audio_path, chapters, sample_rate)
+        data = audio_path.read_bytes()
+        offset = skip_id3v2(data)
+        print(f"标签长度: {offset} 字节，音频帧完整: {parse_frame_header(data[offset:]) is not None}")
+
+
+if __name__ == "__main__":
+    test_chapters()
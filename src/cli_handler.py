@@ -5,10 +5,13 @@ CLI处理器模块
 """
 
 import argparse
+import random
 import sys
 from pathlib import Path
 from typing import Optional
-from config.wrist_positions import ATTACK_TYPES
+from config.wrist_positions import ATTACK_TYPES, DRILL_SEQUENCE_CONFIG
+from config.cache import CACHE_CONFIG
+from config.voices import VOICE_CONFIG, DEFAULT_VOICE, TEMPO_CONFIG
 
 class CLIHandler:
     """CLI处理器"""
@@ -27,6 +30,9 @@ class CLIHandler:
   # 直劈训练
   python fencing_trainer.py --mode stationary,lunge --position 3,4,5 --count 10 --output straight_cut.mp3
   python fencing_trainer.py --mode stationary --position 3 --count 5 -o basic_straight.mp3
+
+  # 预热语音缓存（全部攻击类型和部位，次数1..50）
+  python fencing_trainer.py --warm-cache --count 50 --voice chinese
             """
         )
 
@@ -44,6 +50,52 @@ class CLIHandler:
             help="目标位置：3,4,5，逗号分隔"
         )
 
+        # 随机训练序列参数组
+        drill_group = parser.add_argument_group('随机训练序列')
+        drill_group.add_argument(
+            "--randomize",
+            action="store_true",
+            help="随机打乱部位顺序、交错攻击类型，并随机化提醒位置和命令间隔"
+        )
+
+        drill_group.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="随机种子，相同种子生成相同节目 (默认: 随机)"
+        )
+
+        drill_group.add_argument(
+            "--batch",
+            type=int,
+            default=1,
+            help="生成互不相同的随机节目数量，大于1时自动启用 --randomize (默认: 1)"
+        )
+
+        drill_group.add_argument(
+            "--gap-range",
+            type=str,
+            default=None,
+            help="命令间静音时长的随机范围(秒)，如 1.5,3.0 (默认: {},{})".format(*DRILL_SEQUENCE_CONFIG["gap_range"])
+        )
+
+        # 节目定义文件参数组
+        program_group = parser.add_argument_group('节目定义文件')
+        program_group.add_argument(
+            "--program",
+            type=str,
+            default=None,
+            metavar="PATH",
+            help="按TOML/JSON/YAML节目定义文件生成（逗号分隔，可以是目录），"
+                 "每个定义输出到 -o 所在目录下的同名文件"
+        )
+
+        program_group.add_argument(
+            "--watch",
+            action="store_true",
+            help="生成后持续监视节目定义，文件变化时只重新生成变化的节目"
+        )
+
         # 可选参数
         parser.add_argument(
             "-c", "--count",
@@ -59,6 +111,23 @@ class CLIHandler:
             help="攻击口令之间的间隔时间(秒) (默认: 2.0)"
         )
 
+        parser.add_argument(
+            "--fixed-cadence",
+            type=float,
+            default=None,
+            metavar="SECONDS",
+            help="固定节奏：调整静音使每个攻击周期（计数口令到下一个计数口令）恰好为指定秒数"
+        )
+
+        parser.add_argument(
+            "--tempo",
+            type=str,
+            default=None,
+            metavar="FACTOR",
+            help="计数、保持和归位口令保持音调变速的倍率（如 1.25），"
+                 "auto 表示按 --fixed-cadence 自动计算所需的最小倍率"
+        )
+
         parser.add_argument(
             "-o", "--output",
             type=str,
@@ -68,9 +137,9 @@ class CLIHandler:
 
         parser.add_argument(
             "--voice",
-            choices=["chinese", "chinese_male"],
-            default="chinese_male",
-            help="语音类型 (默认: chinese_male)"
+            type=str,
+            default=DEFAULT_VOICE,
+            help=f"语音类型，逗号分隔可同时生成多个语音版本：{','.join(VOICE_CONFIG)} (默认: {DEFAULT_VOICE})"
         )
 
         parser.add_argument(
@@ -79,6 +148,79 @@ class CLIHandler:
             help="不在命令间插入静音"
         )
 
+        parser.add_argument(
+            "--fast-assemble",
+            action="store_true",
+            help="按帧拼接预编码的MP3片段，不重新编码整段音频"
+        )
+
+        parser.add_argument(
+            "--cues",
+            type=str,
+            default=None,
+            help="同时输出带时间点的字幕文件，逗号分隔：json,vtt"
+        )
+
+        parser.add_argument(
+            "--split",
+            type=str,
+            default=None,
+            help="把节目切分为多个文件并写出清单：segment 按段落切分，数字表示每个文件的分钟数"
+        )
+
+        parser.add_argument(
+            "--chapters",
+            action="store_true",
+            help="在单个输出文件中写入ID3章节（每个段落一章）"
+        )
+
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="流式渲染：合成、解码和编码同时进行，不等全部片段合成完成"
+        )
+
+        parser.add_argument(
+            "--no-render-cache",
+            action="store_true",
+            help="不使用渲染结果缓存，总是重新渲染"
+        )
+
+        parser.add_argument(
+            "--shared-cache",
+            type=str,
+            default=CACHE_CONFIG["shared_clip_dir"],
+            help="渲染集群共享的片段缓存目录（默认读取环境变量 FENCING_SHARED_CACHE）"
+        )
+
+        parser.add_argument(
+            "--profile-run",
+            nargs="?",
+            const="fencing_profile",
+            default=None,
+            metavar="DIR",
+            help="性能分析：把函数耗时、火焰图采样、内存分配和事件循环阻塞报告写入目录（默认 fencing_profile）"
+        )
+
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="从上次中断的检查点继续生成"
+        )
+
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="预热语音缓存：合成次数1..N内可能用到的全部短语，可中断后继续"
+        )
+
+        parser.add_argument(
+            "--plan", "--dry-run",
+            dest="plan",
+            action="store_true",
+            help="只打印训练摘要和完整命令计划，不生成音频"
+        )
+
         parser.add_argument(
             "--verbose",
             action="store_true",
@@ -127,9 +269,28 @@ class CLIHandler:
         config.update({
             "attack_count": parsed_args.count,
             "interval": parsed_args.interval,
+            "fixed_cadence": parsed_args.fixed_cadence,
+            "tempo": self._parse_tempo(parsed_args.tempo),
             "output_path": Path(parsed_args.output),
-            "voice": parsed_args.voice,
+            "voices": self._parse_voices(parsed_args.voice),
             "include_silence": not parsed_args.no_silence,
+            "fast_assemble": parsed_args.fast_assemble,
+            "plan_only": parsed_args.plan,
+            "warm_cache": parsed_args.warm_cache,
+            "resume": parsed_args.resume,
+            "cue_formats": self._parse_cue_formats(parsed_args.cues),
+            "split": self._parse_split(parsed_args.split),
+            "chapters": parsed_args.chapters,
+            "render_cache": not parsed_args.no_render_cache,
+            "pipeline": parsed_args.pipeline,
+            "shared_cache": Path(parsed_args.shared_cache) if parsed_args.shared_cache else None,
+            "profile_dir": Path(parsed_args.profile_run) if parsed_args.profile_run else None,
+            "randomize": parsed_args.randomize or parsed_args.batch > 1,
+            "seed": parsed_args.seed if parsed_args.seed is not None else random.randrange(2 ** 31),
+            "batch_count": parsed_args.batch,
+            "gap_range": self._parse_gap_range(parsed_args.gap_range),
+            "program_sources": self._parse_program_sources(parsed_args.program),
+            "watch": parsed_args.watch,
             "verbose": parsed_args.verbose
         })
 
@@ -140,6 +301,12 @@ class CLIHandler:
                 "target_areas": self._parse_target_areas(parsed_args.position)
             })
 
+        config["output_paths"] = self.voice_output_paths(config["output_path"], config["voices"])
+
+        # 预热缓存时未指定的攻击类型默认覆盖全部
+        if parsed_args.warm_cache and not parsed_args.mode:
+            config["attack_types"] = list(ATTACK_TYPES.keys())
+
         return config
 
     def _parse_attack_types(self, attack_type_str: str) -> list:
@@ -187,6 +354,113 @@ class CLIHandler:
 
         return target_areas
 
+    def _parse_cue_formats(self, cues_str: Optional[str]) -> list:
+        """
+        解析字幕格式参数
+
+        Args:
+            cues_str: 字幕格式字符串，如 "json,vtt"
+
+        Returns:
+            字幕格式列表
+        """
+        if not cues_str:
+            return []
+        return list(dict.fromkeys(cue.strip().lower() for cue in cues_str.split(",") if cue.strip()))
+
+    def _parse_split(self, split_str: Optional[str]):
+        """
+        解析节目切分参数
+
+        Args:
+            split_str: "segment" 或每个文件的分钟数
+
+        Returns:
+            None、"segment" 或分钟数
+        """
+        if not split_str:
+            return None
+        if split_str.strip().lower() == "segment":
+            return "segment"
+        return float(split_str)
+
+    def _parse_tempo(self, tempo_str: Optional[str]):
+        """
+        解析变速倍率
+
+        Args:
+            tempo_str: 倍率字符串或 auto
+
+        Returns:
+            倍率、"auto"，未指定时为None
+        """
+        if tempo_str is None:
+            return None
+        if tempo_str.strip().lower() == "auto":
+            return "auto"
+        return float(tempo_str)
+
+    def _parse_gap_range(self, gap_range_str: Optional[str]) -> tuple:
+        """
+        解析命令间静音时长范围参数
+
+        Args:
+            gap_range_str: 范围字符串，如 "1.5,3.0"
+
+        Returns:
+            (最小值, 最大值)
+        """
+        if not gap_range_str:
+            return tuple(DRILL_SEQUENCE_CONFIG["gap_range"])
+        low, high = (float(value) for value in gap_range_str.split(","))
+        return (low, high)
+
+    def _parse_voices(self, voice_str: str) -> list:
+        """
+        解析语音类型参数
+
+        Args:
+            voice_str: 语音类型字符串，如 "chinese" 或 "chinese,chinese_male"
+
+        Returns:
+            去重后的语音类型列表
+        """
+        return list(dict.fromkeys(voice.strip() for voice in voice_str.split(",") if voice.strip()))
+
+    def _parse_program_sources(self, program_str: Optional[str]) -> list:
+        """
+        解析节目定义参数
+
+        Args:
+            program_str: 节目定义字符串，如 "a.toml,programs/"
+
+        Returns:
+            文件或目录路径列表，未指定时为空列表
+        """
+        if not program_str:
+            return []
+        return [Path(source.strip()) for source in program_str.split(",") if source.strip()]
+
+    def voice_output_paths(self, output_path: Path, voices: list) -> dict:
+        """
+        计算每个语音版本的输出路径
+
+        单个语音直接使用输出路径，多个语音时在文件名后追加语音名称。
+
+        Args:
+            output_path: 输出文件路径
+            voices: 语音类型列表
+
+        Returns:
+            语音类型 -> 输出路径
+        """
+        if len(voices) == 1:
+            return {voices[0]: output_path}
+        return {
+            voice: output_path.with_name(f"{output_path.stem}_{voice}{output_path.suffix}")
+            for voice in voices
+        }
+
     def _infer_training_mode(self, args) -> str:
         """
         智能检测训练模式
@@ -195,12 +469,13 @@ class CLIHandler:
         has_attack_type = bool(args.mode)
         has_target_areas = bool(args.position)
 
-        if has_attack_type or has_target_areas:
+        if has_attack_type or has_target_areas or args.warm_cache or args.program:
             return "straight-cut"
         else:
             raise ValueError(
                 "必须指定训练参数。\n\n"
-                "直劈训练：--mode stationary --position 3,4,5\n\n"
+                "直劈训练：--mode stationary --position 3,4,5\n"
+                "节目定义文件：--program programs/\n\n"
                 "使用 --help 查看详细用法和更多示例。"
             )
 
@@ -233,13 +508,105 @@ class CLIHandler:
         if not (2.0 <= args.interval <= 10.0):
             errors.append("直劈训练间隔时间必须在2.0-10.0秒之间")
 
-        # 验证直劈训练模式的特定参数
-        if not args.mode:
+        # 验证直劈训练模式的特定参数（预热缓存时默认覆盖全部，节目定义文件自带）
+        if not args.mode and not args.warm_cache and not args.program:
             errors.append("直劈训练需要 --mode 参数（如：stationary 或 lunge）")
 
-        if not args.position:
+        if not args.position and not args.warm_cache and not args.program:
             errors.append("直劈训练需要 --position 参数（如：3,4,5）")
 
+        # 验证节目定义文件
+        if args.program:
+            for source in self._parse_program_sources(args.program):
+                if not source.exists():
+                    errors.append(f"节目定义不存在: {source}")
+            unsupported = [flag for flag, used in (
+                ("--randomize/--batch", args.randomize or args.batch > 1),
+                ("--split", args.split), ("--chapters", args.chapters), ("--pipeline", args.pipeline),
+                ("--fixed-cadence", args.fixed_cadence is not None), ("--tempo", args.tempo is not None),
+                ("--resume", args.resume), ("--warm-cache", args.warm_cache),
+            ) if used]
+            if unsupported:
+                errors.append(f"--program 不能与 {', '.join(unsupported)} 同时使用")
+        elif args.watch:
+            errors.append("--watch 需要同时指定 --program")
+
+        # 验证随机训练序列参数
+        if not (1 <= args.batch <= 10000):
+            errors.append("随机节目数量必须在1-10000之间")
+
+        if args.gap_range:
+            try:
+                low, high = self._parse_gap_range(args.gap_range)
+                if not (0 <= low <= high <= 10.0):
+                    errors.append("命令间隔范围必须满足 0 <= 最小值 <= 最大值 <= 10.0")
+            except ValueError:
+                errors.append("命令间隔范围格式应为 最小值,最大值（如：1.5,3.0）")
+
+        # 验证字幕格式
+        for cue_format in self._parse_cue_formats(args.cues):
+            if cue_format not in ("json", "vtt"):
+                errors.append(f"不支持的字幕格式: {cue_format}。支持的格式: json, vtt")
+
+        # 验证节目切分
+        if args.split:
+            try:
+                split = self._parse_split(args.split)
+                if split != "segment" and split <= 0:
+                    errors.append("切分时长必须大于0分钟")
+            except ValueError:
+                errors.append("--split 的取值应为 segment 或分钟数（如：5）")
+            if args.chapters:
+                errors.append("--chapters 只用于单个输出文件，不能与 --split 同时使用")
+            if args.fast_assemble:
+                errors.append("--split 需要按切分点重新编码，不能与 --fast-assemble 同时使用")
+        if (args.split or args.chapters) and (args.randomize or args.batch > 1):
+            errors.append("--split 和 --chapters 暂不支持随机节目")
+
+        # 验证断点续传：随机节目按种子生成，不写检查点
+        if args.resume and (args.randomize or args.batch > 1):
+            errors.append("--resume 不支持随机节目")
+
+        # 验证流式渲染
+        if args.pipeline:
+            if args.fast_assemble or args.split:
+                errors.append("--pipeline 不能与 --fast-assemble 或 --split 同时使用")
+            if args.randomize or args.batch > 1:
+                errors.append("--pipeline 暂不支持随机节目")
+
+        # 验证固定节奏
+        if args.fixed_cadence is not None:
+            if args.fixed_cadence <= 0:
+                errors.append("攻击周期必须大于0秒")
+            if args.no_silence:
+                errors.append("--fixed-cadence 通过调整静音实现，不能与 --no-silence 同时使用")
+            if args.randomize or args.batch > 1:
+                errors.append("--fixed-cadence 不能与随机节目同时使用")
+
+        # 验证变速
+        if args.tempo is not None:
+            try:
+                tempo = self._parse_tempo(args.tempo)
+                if tempo == "auto":
+                    if args.fixed_cadence is None:
+                        errors.append("--tempo auto 需要同时指定 --fixed-cadence")
+                    if args.pipeline:
+                        errors.append("--tempo auto 需要预先知道全部片段长度，不能与 --pipeline 同时使用")
+                elif not (TEMPO_CONFIG["min_factor"] <= tempo <= TEMPO_CONFIG["max_factor"]):
+                    errors.append(f"变速倍率必须在{TEMPO_CONFIG['min_factor']:g}-{TEMPO_CONFIG['max_factor']:g}之间")
+            except ValueError:
+                errors.append("--tempo 的取值应为倍率（如：1.25）或 auto")
+            if args.fast_assemble:
+                errors.append("--tempo 需要重新编码，不能与 --fast-assemble 同时使用")
+
+        # 验证语音类型
+        voices = self._parse_voices(args.voice)
+        if not voices:
+            errors.append("至少需要指定一种语音类型")
+        for voice in voices:
+            if voice not in VOICE_CONFIG:
+                errors.append(f"不支持的语音类型: {voice}。支持的类型: {', '.join(VOICE_CONFIG)}")
+
         # 验证输出路径
         output_path = Path(args.output)
         if output_path.exists() and not output_path.is_file():
@@ -274,15 +641,105 @@ class CLIHandler:
         print(f"攻击次数: {config['attack_count']} 次/组合")
 
         print(f"间隔时间: {config['interval']} 秒")
-        print(f"语音类型: {config['voice']}")
-        print(f"输出文件: {config['output_path']}")
+        if config["fixed_cadence"] is not None:
+            print(f"固定节奏: 每个攻击周期 {config['fixed_cadence']:g} 秒")
+        if config["tempo"] is not None:
+            tempo = "自动" if config["tempo"] == "auto" else f"{config['tempo']:g} 倍"
+            print(f"口令变速: {tempo}")
+        print(f"语音类型: {', '.join(config['voices'])}")
+        print(f"输出文件: {', '.join(str(path) for path in config['output_paths'].values())}")
         print(f"包含静音: {'是' if config['include_silence'] else '否'}")
+        if config["randomize"]:
+            print(f"随机序列: 种子 {config['seed']}，共 {config['batch_count']} 个节目，"
+                  f"间隔 {config['gap_range'][0]}-{config['gap_range'][1]} 秒")
+        print(f"快速拼装: {'是' if config['fast_assemble'] else '否'}")
+        if config["split"] is not None:
+            split = "按段落" if config["split"] == "segment" else f"每 {config['split']:g} 分钟"
+            print(f"切分输出: {split}")
 
         print("\n=== 训练内容 ===")
         print(f"训练组合: {len(config['attack_types'])} × {len(config['target_areas'])} = {len(config['attack_types']) * len(config['target_areas'])} 个组合")
         print(f"总攻击次数: {summary['total_attacks']} 次")
         print(f"预估命令数: {summary['estimated_commands_count']} 个")
 
+    def print_plan(self, phrase_ids: list, phrase_table):
+        """
+        打印完整命令计划
+
+        Args:
+            phrase_ids: 短语ID序列
+            phrase_table: 短语表
+        """
+        print("\n=== 生成计划 ===")
+        print(f"命令总数: {len(phrase_ids)} 个")
+        print(f"唯一短语: {len(set(phrase_ids))} 个")
+        for i, phrase_id in enumerate(phrase_ids, 1):
+            print(f"  {i:4d}. [{phrase_table.kind(phrase_id)}] {phrase_table.text(phrase_id)}")
+
+    def print_warm_cache_report(self, report: dict):
+        """
+        打印缓存预热报告
+
+        Args:
+            report: 预热报告字典
+        """
+        print("\n=== 缓存预热完成 ===")
+        print(f"短语总数: {report['total']} 个")
+        print(f"已有缓存: {report['cached']} 个")
+        print(f"新合成: {report['fetched']} 个")
+        if report.get("repaired"):
+            print(f"无效片段: {report['repaired']} 个（已丢弃并重新合成）")
+        if report.get("nodes"):
+            self.print_clip_cache_stats(report["cache"], report["nodes"])
+        if report["failed"]:
+            print(f"合成失败: {report['failed']} 个（再次运行将只重试失败的短语）")
+            for error in report["errors"][:5]:
+                print(f"  - {error}")
+
+    def print_clip_cache_stats(self, stats: dict, node_stats: Optional[dict] = None):
+        """
+        打印语音片段缓存统计
+
+        Args:
+            stats: 本节点本次运行的统计
+            node_stats: 共享缓存中各节点的累计统计，未使用共享缓存时为None
+        """
+        print(f"片段缓存: 本地命中 {stats['hits']}，共享命中 {stats['shared_hits']}，"
+              f"合成 {stats['published']}，命中率 {stats['hit_rate']:.1%}")
+        if not node_stats:
+            return
+        print("共享缓存各节点累计:")
+        for node, counts in sorted(node_stats.items()):
+            served = counts.get("hits", 0) + counts.get("shared_hits", 0)
+            total = served + counts.get("published", 0)
+            hit_rate = served / total if total else 0.0
+            print(f"  {node}: 本地命中 {counts.get('hits', 0)}，共享命中 {counts.get('shared_hits', 0)}，"
+                  f"合成 {counts.get('published', 0)}，命中率 {hit_rate:.1%}")
+
+    def print_cadence(self, output_path: Path, stats: dict):
+        """
+        打印攻击周期的节奏统计
+
+        Args:
+            output_path: 输出文件路径
+            stats: cadence_stats() 返回的统计
+        """
+        reference = "平均周期" if stats["target"] is None else f"目标 {stats['target']:g} 秒"
+        print(f"节奏 ({output_path.name}): {stats['cycles']} 个攻击周期，平均 {stats['mean_period']:.3f} 秒"
+              f"（{stats['min_period']:.3f}-{stats['max_period']:.3f}），相对{reference}的偏差: "
+              f"平均 {stats['mean_deviation_ms']:.1f} 毫秒，p95 {stats['p95_deviation_ms']:.1f} 毫秒，"
+              f"最大 {stats['max_deviation_ms']:.1f} 毫秒")
+
+    def print_loop_lag(self, stats: dict):
+        """
+        打印事件循环延迟统计
+
+        Args:
+            stats: LoopLagMonitor.get_stats() 返回的统计
+        """
+        print(f"事件循环延迟: 平均 {stats['mean_ms']:.1f} 毫秒，p95 {stats['p95_ms']:.1f} 毫秒，"
+              f"最大 {stats['max_ms']:.1f} 毫秒（{stats['samples']} 次采样）")
+
     def print_progress(self, current: int, total: int, description: str = "处理中"):
         """
         打印进度信息
@@ -0,0 +1,173 @@
+"""
+语音片段缓存模块
+
+按(文本, 语音参数)缓存TTS生成的MP3片段。
+片段先写入临时文件再原子重命名发布，中断不会留下不完整的缓存条目。
+配置共享后端时本地目录作为节点缓存，未命中再从共享后端获取，新片段同时发布到共享后端。
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.cache import CACHE_CONFIG
+from src.cache_backend import ClipStore
+
+
+class ClipCache:
+    """TTS语音片段缓存（第一级缓存）"""
+
+    def __init__(self,
+                 cache_dir: Optional[Path] = None,
+                 backend: Optional[ClipStore] = None,
+                 node: Optional[str] = None):
+        """
+        初始化语音片段缓存
+
+        Args:
+            cache_dir: 缓存目录，默认使用CACHE_CONFIG中的配置
+            backend: 渲染集群共享的片段存储，为None时只使用本地缓存
+            node: 本节点名称，默认使用CACHE_CONFIG中的配置
+        """
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG["clip_dir"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self.node = node or CACHE_CONFIG["node_name"]
+
+        # 统计信息
+        self.hits = 0  # 本地命中
+        self.shared_hits = 0  # 从共享后端获取
+        self.misses = 0
+        self.published = 0  # 本节点合成并发布的片段数
+        self._flushed: Dict[str, int] = {}
+
+    def key(self, text: str, voice_config: dict) -> str:
+        """
+        计算片段缓存键
+
+        Args:
+            text: 命令文本
+            voice_config: 语音参数
+
+        Returns:
+            缓存键（SHA-256十六进制摘要）
+        """
+        payload = json.dumps({"text": text, "voice": voice_config}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Path:
+        """获取缓存条目路径"""
+        return self.cache_dir / f"{key}.mp3"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """
+        查找缓存条目，本地未命中时从共享后端获取
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            片段路径，未命中返回None
+        """
+        path = self.path(key)
+        if path.exists() and path.stat().st_size > 0:
+            self.hits += 1
+            return path
+
+        if self.backend is not None:
+            temp_path = self.temp_path(key)
+            try:
+                if self.backend.fetch(key, temp_path):
+                    os.replace(temp_path, path)
+                    self.shared_hits += 1
+                    return path
+            finally:
+                temp_path.unlink(missing_ok=True)
+
+        self.misses += 1
+        return None
+
+    def contains(self, key: str) -> bool:
+        """检查缓存条目是否存在（不计入统计）"""
+        path = self.path(key)
+        if path.exists() and path.stat().st_size > 0:
+            return True
+        return self.backend is not None and self.backend.contains(key)
+
+    def temp_path(self, key: str) -> Path:
+        """获取写入中的临时文件路径"""
+        return self.cache_dir / f".{key}.{uuid.uuid4().hex}.part.mp3"
+
+    def publish(self, key: str, temp_path: Path) -> Path:
+        """
+        将临时文件原子发布为缓存条目（配置共享后端时同时发布到后端并释放认领）
+
+        Args:
+            key: 缓存键
+            temp_path: 已写完的临时文件
+
+        Returns:
+            缓存条目路径
+        """
+        path = self.path(key)
+        os.replace(temp_path, path)
+        self.published += 1
+        if self.backend is not None:
+            self.backend.publish(key, path, self.node)
+            self.backend.release(key, self.node)
+        return path
+
+    def claim(self, key: str) -> bool:
+        """
+        认领片段的合成任务，避免多个节点重复合成
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            是否应由本节点合成（未配置共享后端时总是True）
+        """
+        if self.backend is None:
+            return True
+        return self.backend.claim(key, self.node, CACHE_CONFIG["shared_claim_lease"])
+
+    def release(self, key: str):
+        """放弃认领（合成失败时调用）"""
+        if self.backend is not None:
+            self.backend.release(key, self.node)
+
+    def discard(self, key: str):
+        """删除无效的缓存条目（包括共享后端中的副本）"""
+        self.path(key).unlink(missing_ok=True)
+        if self.backend is not None:
+            self.backend.discard(key)
+
+    def cleanup_partial(self):
+        """清理中断后残留的临时文件"""
+        for partial in self.cache_dir.glob(".*.part.mp3"):
+            partial.unlink(missing_ok=True)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        # 等待其它节点发布的短语会先记一次未命中再记一次共享命中，命中率按实际合成数计算
+        served = self.hits + self.shared_hits
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "published": self.published,
+            "hit_rate": served / (served + self.published) if served + self.published else 0.0,
+        }
+
+    def flush_stats(self):
+        """把自上次上报以来的计数累加到共享后端的节点统计中"""
+        if self.backend is None:
+            return
+        counts = {name: getattr(self, name) for name in ("hits", "shared_hits", "misses", "published")}
+        self.backend.record_stats(self.node, {
+            name: value - self._flushed.get(name, 0) for name, value in counts.items()
+        })
+        self._flushed = counts
@@ -0,0 +1,133 @@
+"""
+语音片段校验模块
+
+在片段进入缓存前做帧头级别的检查：逐帧解析确认数据完整可解码，
+再用帧数算出的时长与文本长度比对，过滤掉空文件、截断文件和明显异常的合成结果。
+"""
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+from config.voices import CLIP_VALIDATION_CONFIG
+from src.mp3_frames import find_info_tag, iter_frames
+
+
+def count_spoken_chars(text: str) -> int:
+    """
+    统计文本中需要朗读的字符数（不含标点和空白）
+
+    Args:
+        text: 命令文本
+
+    Returns:
+        字符数
+    """
+    return sum(1 for ch in text if ch.isalnum())
+
+
+def duration_bounds(text: str, config: Optional[dict] = None) -> Tuple[float, float]:
+    """
+    计算文本合成结果的合理时长范围
+
+    Args:
+        text: 命令文本
+        config: 校验配置，默认使用CLIP_VALIDATION_CONFIG
+
+    Returns:
+        (最短时长, 最长时长)，单位秒
+    """
+    config = config or CLIP_VALIDATION_CONFIG
+    chars = max(1, count_spoken_chars(text))
+    low = max(config["min_duration"], chars * config["min_seconds_per_char"])
+    high = chars * config["max_seconds_per_char"] + config["max_overhead"]
+    return low, high
+
+
+def mp3_frame_duration(data: bytes) -> float:
+    """
+    逐帧解析MP3数据并由帧数计算时长
+
+    Args:
+        data: MP3数据
+
+    Returns:
+        时长(秒)
+
+    Raises:
+        ValueError: 帧头无效、最后一帧被截断或没有音频帧
+    """
+    samples = 0
+    sample_rate = None
+    first = True
+    for offset, header in iter_frames(data):
+        if first and find_info_tag(data, offset, header):
+            first = False
+            continue
+        first = False
+        if sample_rate is None:
+            sample_rate = header.sample_rate
+        elif header.sample_rate != sample_rate:
+            raise ValueError(f"采样率不一致: 偏移 {offset}")
+        samples += header.samples_per_frame
+    if sample_rate is None:
+        raise ValueError("没有音频帧")
+    return samples / sample_rate
+
+
+def validate_clip(clip_path: Path, text: Optional[str] = None, config: Optional[dict] = None) -> Optional[str]:
+    """
+    校验语音片段
+
+    Args:
+        clip_path: 片段文件路径
+        text: 片段对应的文本，提供时检查时长是否与文本长度相符
+        config: 校验配置，默认使用CLIP_VALIDATION_CONFIG
+
+    Returns:
+        无效原因，片段有效时返回None
+    """
+    try:
+        data = Path(clip_path).read_bytes()
+    except OSError as e:
+        return f"无法读取: {e}"
+    if not data:
+        return "文件为空"
+
+    try:
+        duration = mp3_frame_duration(data)
+    except ValueError as e:
+        return f"无法解码: {e}"
+
+    if text is not None:
+        low, high = duration_bounds(text, config)
+        if duration < low:
+            return f"时长过短: {duration:.2f}秒（至少 {low:.2f}秒）"
+        if duration > high:
+            return f"时长过长: {duration:.2f}秒（至多 {high:.2f}秒）"
+    return None
+
+
+def test_clip_validator():
+    """测试语音片段校验"""
+    import tempfile
+
+    # MPEG-1 Layer III 128kbps 44.1kHz的空帧，每帧约26毫秒
+    frame = b"\xff\xfb\x90\x00" + bytes(413)
+    text = "开始三部位原地直劈训练。"
+    print(f"'{text}' 合理时长: {duration_bounds(text)}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        clip = Path(temp_dir) / "clip.mp3"
+        cases = {
+            "正常": frame * 100,
+            "空文件": b"",
+            "截断": frame * 100 + frame[:200],
+            "过短": frame * 2,
+        }
+        for name, data in cases.items():
+            clip.write_bytes(data)
+            print(f"  {name}: {validate_clip(clip, text) or '有效'}")
+
+
+if __name__ == "__main__":
+    test_clip_validator()
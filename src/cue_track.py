@@ -0,0 +1,134 @@
+"""
+字幕轨模块
+
+根据渲染时已知的样本偏移生成每个命令的时间点，输出JSON或WebVTT字幕文件，
+供应用在播放时同步高亮当前口令。
+"""
+
+import json
+from pathlib import Path
+from typing import List, NamedTuple, Sequence, Tuple
+
+# 支持的字幕文件格式及其扩展名
+CUE_FORMATS = {
+    "json": ".cues.json",
+    "vtt": ".vtt",
+}
+
+
+class Cue(NamedTuple):
+    """单个命令的时间点"""
+    index: int  # 命令序号（从1开始）
+    text: str  # 命令文本
+    kind: str  # 命令类型（模板键名）
+    start_sample: int  # 起始样本偏移
+    end_sample: int  # 结束样本偏移
+
+
+def build_cues(texts: Sequence[str], kinds: Sequence[str],
+               offsets: Sequence[Tuple[int, int]]) -> List[Cue]:
+    """
+    组合命令文本、类型和样本偏移
+
+    Args:
+        texts: 命令文本
+        kinds: 命令类型
+        offsets: 每个命令的(起始, 结束)样本偏移
+
+    Returns:
+        时间点列表
+    """
+    return [
+        Cue(index=i, text=text, kind=kind, start_sample=start, end_sample=end)
+        for i, (text, kind, (start, end)) in enumerate(zip(texts, kinds, offsets), 1)
+    ]
+
+
+def _format_timestamp(seconds: float) -> str:
+    """格式化为WebVTT时间戳 HH:MM:SS.mmm"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def write_json(cues: List[Cue], output_path: Path, audio_path: Path, sample_rate: int) -> Path:
+    """
+    写入JSON字幕文件
+
+    Args:
+        cues: 时间点列表
+        output_path: 字幕文件路径
+        audio_path: 对应的音频文件
+        sample_rate: 采样率
+
+    Returns:
+        字幕文件路径
+    """
+    payload = {
+        "audio": audio_path.name,
+        "sample_rate": sample_rate,
+        "cues": [
+            {
+                "index": cue.index,
+                "text": cue.text,
+                "kind": cue.kind,
+                "start": round(cue.start_sample / sample_rate, 3),
+                "end": round(cue.end_sample / sample_rate, 3),
+                "start_sample": cue.start_sample,
+                "end_sample": cue.end_sample,
+            }
+            for cue in cues
+        ],
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return output_path
+
+
+def write_webvtt(cues: List[Cue], output_path: Path, sample_rate: int) -> Path:
+    """
+    写入WebVTT字幕文件（命令类型写在字幕标识中）
+
+    Args:
+        cues: 时间点列表
+        output_path: 字幕文件路径
+        sample_rate: 采样率
+
+    Returns:
+        字幕文件路径
+    """
+    lines = ["WEBVTT", ""]
+    for cue in cues:
+        lines.append(f"{cue.index} {cue.kind}")
+        lines.append(f"{_format_timestamp(cue.start_sample / sample_rate)} --> "
+                     f"{_format_timestamp(cue.end_sample / sample_rate)}")
+        lines.append(cue.text)
+        lines.append("")
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return output_path
+
+
+def write_cue_files(cues: List[Cue], audio_path: Path, formats: List[str], sample_rate: int) -> List[Path]:
+    """
+    在音频文件旁写入指定格式的字幕文件
+
+    Args:
+        cues: 时间点列表
+        audio_path: 音频文件路径
+        formats: 字幕格式列表（json、vtt）
+        sample_rate: 采样率
+
+    Returns:
+        写入的字幕文件路径列表
+    """
+    written = []
+    for cue_format in formats:
+        output_path = audio_path.with_suffix(CUE_FORMATS[cue_format])
+        if cue_format == "json":
+            written.append(write_json(cues, output_path, audio_path, sample_rate))
+        else:
+            written.append(write_webvtt(cues, output_path, sample_rate))
+    return written
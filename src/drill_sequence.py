@@ -0,0 +1,233 @@
+"""
+随机训练序列模块
+
+按随机种子打乱目标部位、交错攻击类型，并在范围内随机化提醒位置和命令间隔。
+所有序列都只使用短语表中已有的短语，生成大量不同的节目无需新的语音合成。
+
+批量计划用紧凑数组保存：短语ID为uint16、静音时长为float32，一批节目共用一段连续数组，
+上万个节目也只占几十MB，不会为每个命令保留一个Python对象。
+"""
+
+import hashlib
+import random
+from array import array
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config.wrist_positions import DRILL_SEQUENCE_CONFIG
+from src.training_commands import DEFAULT_PHRASE_TABLE, PhraseTable
+
+
+# uint16短语ID能表示的短语数上限
+MAX_PHRASES = 1 << 16
+
+
+class DrillPlan:
+    """随机训练节目计划"""
+
+    __slots__ = ("seed", "phrase_ids", "gaps")
+
+    def __init__(self, seed: int, phrase_ids: array, gaps: array):
+        """
+        初始化节目计划
+
+        Args:
+            seed: 生成该计划的随机种子
+            phrase_ids: 短语ID序列（uint16数组）
+            gaps: 每个命令之后的静音时长(秒，float32数组)，比phrase_ids少一个
+        """
+        self.seed = seed
+        self.phrase_ids = phrase_ids
+        self.gaps = gaps
+
+    def signature(self) -> bytes:
+        """计划内容摘要，用于判断节目是否重复"""
+        return hashlib.sha1(self.phrase_ids.tobytes() + self.gaps.tobytes()).digest()
+
+
+class PlanBatch:
+    """一批节目计划，所有节目的短语ID和静音时长各存放在一段连续数组中"""
+
+    __slots__ = ("seeds", "offsets", "phrase_ids", "gaps")
+
+    def __init__(self):
+        """初始化空的计划批次"""
+        self.seeds = array("q")
+        self.offsets = array("q", [0])  # 第i个节目的短语ID位于 offsets[i]:offsets[i+1]
+        self.phrase_ids = array("H")
+        self.gaps = array("f")
+
+    def append(self, plan: DrillPlan):
+        """追加一个节目计划"""
+        self.seeds.append(plan.seed)
+        self.phrase_ids.extend(plan.phrase_ids)
+        self.gaps.extend(plan.gaps)
+        self.offsets.append(len(self.phrase_ids))
+
+    def __len__(self) -> int:
+        return len(self.seeds)
+
+    def __getitem__(self, index: int) -> DrillPlan:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        # 每个节目的静音比命令少一个，静音数组的起点相应前移index
+        return DrillPlan(self.seeds[index], self.phrase_ids[start:end], self.gaps[start - index:end - index - 1])
+
+    def __iter__(self) -> Iterator[DrillPlan]:
+        return (self[index] for index in range(len(self)))
+
+    def used_ids(self) -> List[int]:
+        """批次中用到的全部短语ID（升序）"""
+        return sorted(set(self.phrase_ids))
+
+    def nbytes(self) -> int:
+        """数组数据占用的字节数"""
+        return sum(len(data) * data.itemsize for data in (self.seeds, self.offsets, self.phrase_ids, self.gaps))
+
+
+class DrillSequenceGenerator:
+    """随机训练序列生成器"""
+
+    def __init__(self,
+                 attack_types: List[str],
+                 target_areas: List[str],
+                 count: int,
+                 phrase_table: PhraseTable = DEFAULT_PHRASE_TABLE,
+                 gap_range: Optional[Tuple[float, float]] = None,
+                 include_silence: bool = True):
+        """
+        初始化随机训练序列生成器
+
+        Args:
+            attack_types: 攻击类型列表
+            target_areas: 目标部位列表
+            count: 每个组合的攻击次数
+            phrase_table: 短语表
+            gap_range: 命令间静音时长范围(秒)，默认使用DRILL_SEQUENCE_CONFIG
+            include_silence: 为False时命令间不插入静音
+        """
+        self.attack_types = attack_types
+        self.target_areas = target_areas
+        self.count = count
+        self.phrase_table = phrase_table
+        self.gap_range = gap_range or DRILL_SEQUENCE_CONFIG["gap_range"]
+        self.include_silence = include_silence
+
+    def reachable_ids(self) -> List[int]:
+        """所有随机序列可能用到的短语（即需要合成的全部短语）"""
+        return self.phrase_table.reachable_ids(self.attack_types, self.target_areas, self.count)
+
+    def _interleaved_combinations(self, rng: random.Random) -> List[Tuple[str, str]]:
+        """每种攻击类型的部位各自打乱，再按攻击类型轮流排列"""
+        attack_types = list(self.attack_types)
+        rng.shuffle(attack_types)
+        areas_by_type: Dict[str, List[str]] = {}
+        for attack_type in attack_types:
+            areas = list(self.target_areas)
+            rng.shuffle(areas)
+            areas_by_type[attack_type] = areas
+
+        combinations = []
+        for round_index in range(len(self.target_areas)):
+            for attack_type in attack_types:
+                combinations.append((attack_type, areas_by_type[attack_type][round_index]))
+        return combinations
+
+    def _reminder_positions(self, rng: random.Random) -> Set[int]:
+        """在标准提醒位置附近随机选取提醒位置"""
+        every = DRILL_SEQUENCE_CONFIG["reminder_every"]
+        jitter = DRILL_SEQUENCE_CONFIG["reminder_jitter"]
+        positions = set()
+        for k in range(1, self.count // every + 1):
+            center = k * every
+            low = max(1, center - jitter)
+            high = min(self.count, center + jitter)
+            candidates = [i for i in range(low, high + 1) if i not in positions]
+            if candidates:
+                positions.add(rng.choice(candidates))
+        return positions
+
+    def generate(self, seed: int) -> DrillPlan:
+        """
+        生成一个随机训练节目
+
+        Args:
+            seed: 随机种子，相同种子得到相同节目
+
+        Returns:
+            训练节目计划
+        """
+        rng = random.Random(seed)
+        table = self.phrase_table
+        hold_id = table.fixed_id("hold")
+        return_id = table.fixed_id("return_position")
+        reminder_id = table.fixed_id("reminder")
+
+        phrase_ids = []
+        for attack_type, target_area in self._interleaved_combinations(rng):
+            start_id, guidance_id, complete_id = table.compile_segment(target_area, attack_type)
+            phrase_ids.extend((start_id, guidance_id))
+            reminders = self._reminder_positions(rng)
+            for i in range(1, self.count + 1):
+                phrase_ids.extend((table.count_id(i), hold_id, return_id))
+                if i in reminders:
+                    phrase_ids.append(reminder_id)
+            phrase_ids.append(complete_id)
+        phrase_ids.append(table.fixed_id("all_complete"))
+        if len(table) > MAX_PHRASES:
+            raise ValueError(f"短语表中有 {len(table)} 个短语，超过紧凑计划支持的 {MAX_PHRASES} 个")
+
+        if self.include_silence:
+            low, high = self.gap_range
+            gaps = array("f", (round(rng.uniform(low, high), 3) for _ in range(len(phrase_ids) - 1)))
+        else:
+            gaps = array("f", [0.0]) * (len(phrase_ids) - 1)
+
+        return DrillPlan(seed, array("H", phrase_ids), gaps)
+
+    def generate_batch(self, n: int, seed: int) -> PlanBatch:
+        """
+        生成一批互不相同的随机训练节目
+
+        Args:
+            n: 节目数量
+            seed: 起始随机种子，第i个节目从seed+i开始尝试
+
+        Returns:
+            训练节目计划批次
+        """
+        plans = PlanBatch()
+        signatures = set()
+        next_seed = seed
+        max_attempts = n * 10
+        while len(plans) < n and next_seed - seed < max_attempts:
+            plan = self.generate(next_seed)
+            next_seed += 1
+            signature = plan.signature()
+            if signature in signatures:
+                continue
+            signatures.add(signature)
+            plans.append(plan)
+        if len(plans) < n:
+            raise ValueError(f"当前参数下只能生成 {len(plans)} 个不同的节目")
+        return plans
+
+
+def test_drill_sequence():
+    """测试随机训练序列生成器"""
+    generator = DrillSequenceGenerator(["stationary", "lunge"], ["3", "4", "5"], count=25)
+    plans = generator.generate_batch(1000, seed=42)
+    print(f"生成节目: {len(plans)} 个，互不相同: {len({plan.signature() for plan in plans}) == len(plans)}")
+
+    reachable = set(generator.reachable_ids())
+    used = set(plans.used_ids())
+    print(f"使用短语: {len(used)} 个，均在可合成短语集中: {used <= reachable}")
+    print(f"计划数据: {plans.nbytes() / 1024 / 1024:.1f} MB，第500个节目种子 {plans[499].seed}，"
+          f"命令 {len(plans[499].phrase_ids)} 个")
+
+    table = generator.phrase_table
+    print("第一个节目前8个命令:")
+    for phrase_id, gap in zip(plans[0].phrase_ids[:8], plans[0].gaps):
+        print(f"  {table.text(phrase_id)}  (+{gap:.2f}秒)")
+
+
+if __name__ == "__main__":
+    test_drill_sequence()
@@ -0,0 +1,197 @@
+"""
+MP3帧片段缓存模块
+
+将每个片段和静音预编码一次为帧对齐的MP3片段（CBR、关闭比特池、无Xing头），
+供快速拼装路径按字节直接拼接，无需重新编码。
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import ffmpeg
+import numpy as np
+
+from config.cache import CACHE_CONFIG
+from config.voices import AUDIO_CONFIG
+from src.mp3_frames import iter_frames, main_data_begin, parse_frame_header, split_frames
+from src.pcm_cache import PCMCache, evict_lru
+
+
+class MP3Fragment(NamedTuple):
+    """预编码MP3片段"""
+    data: bytes  # 帧数据（已去掉ID3和Xing头）
+    frame_count: int  # 帧数量
+    pcm_samples: int  # 原始PCM样本数
+
+
+class MP3FragmentCache:
+    """MP3帧片段缓存"""
+
+    def __init__(self,
+                 pcm_cache: PCMCache,
+                 cache_dir: Optional[Path] = None,
+                 max_bytes: Optional[int] = None,
+                 bitrate: Optional[str] = None):
+        """
+        初始化MP3帧片段缓存
+
+        Args:
+            pcm_cache: PCM缓存，片段从解码后的PCM编码
+            cache_dir: 缓存目录，默认使用CACHE_CONFIG中的配置
+            max_bytes: 缓存容量上限(字节)
+            bitrate: 编码比特率，默认使用节目比特率
+        """
+        self.pcm_cache = pcm_cache
+        self.sample_rate = pcm_cache.sample_rate
+        self.bitrate = bitrate or AUDIO_CONFIG["bitrate"]
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG["mp3_fragment_dir"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else CACHE_CONFIG["mp3_fragment_max_bytes"]
+
+        self._memory: Dict[str, MP3Fragment] = {}
+        self._silence_frame: Optional[bytes] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_clip_fragment(self, clip_path: Path) -> MP3Fragment:
+        """
+        获取片段的预编码帧
+
+        Args:
+            clip_path: 片段文件路径
+
+        Returns:
+            预编码MP3片段
+        """
+        digest = self.pcm_cache.digest(clip_path)
+        fragment = self._memory.get(digest)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+
+        samples = self.pcm_cache.get_by_digest(digest, clip_path)
+        entry = self.cache_dir / f"{digest}_{self.sample_rate}_{self.bitrate}.frames"
+        if entry.exists():
+            self.hits += 1
+            data = entry.read_bytes()
+            os.utime(entry)
+        else:
+            self.misses += 1
+            data = self._encode_frames(samples)
+            self._store(entry, data)
+
+        frame_count = sum(1 for _ in iter_frames(data))
+        fragment = MP3Fragment(data=data, frame_count=frame_count, pcm_samples=len(samples))
+        self._memory[digest] = fragment
+        return fragment
+
+    def get_silence_frame(self) -> bytes:
+        """
+        获取单个静音帧，静音间隔由该帧重复拼接而成
+
+        Returns:
+            静音帧数据
+        """
+        if self._silence_frame is None:
+            entry = self.cache_dir / f"silence_{self.sample_rate}_{self.bitrate}.frames"
+            if entry.exists():
+                self._silence_frame = entry.read_bytes()
+            else:
+                # 取一段静音中间的帧，前后帧的编码器状态不会影响它
+                frames, _ = split_frames(self._encode(np.zeros(self.sample_rate, dtype=np.float32)))
+                self._silence_frame = frames[len(frames) // 2]
+                self._store(entry, self._silence_frame)
+        return self._silence_frame
+
+    @property
+    def samples_per_frame(self) -> int:
+        """每帧样本数"""
+        return parse_frame_header(self.get_silence_frame()).samples_per_frame
+
+    def _encode(self, samples: np.ndarray) -> bytes:
+        """以关闭比特池、不写Xing头的CBR方式编码PCM"""
+        try:
+            out, _ = (
+                ffmpeg
+                .input('pipe:', format='f32le', ac=1, ar=self.sample_rate)
+                .output('pipe:', format='mp3', acodec='libmp3lame', audio_bitrate=self.bitrate,
+                        reservoir=0, write_xing=0, id3v2_version=0)
+                .run(input=np.ascontiguousarray(samples, dtype=np.float32).tobytes(),
+                     capture_stdout=True, capture_stderr=True)
+            )
+            return out
+        except ffmpeg.Error as e:
+            stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+            raise RuntimeError(f"FFmpeg错误: {stderr_output}")
+
+    def _encode_frames(self, samples: np.ndarray) -> bytes:
+        """编码片段并校验每一帧都不依赖其它片段的比特池"""
+        frames, _ = split_frames(self._encode(samples))
+        data = b"".join(frames)
+        for offset, frame_header in iter_frames(data):
+            if main_data_begin(data, offset, frame_header) != 0:
+                raise RuntimeError("片段帧引用了比特池，无法安全拼接")
+        return data
+
+    def _store(self, entry: Path, data: bytes):
+        """原子写入缓存条目，随后按容量预算淘汰"""
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, entry)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        evict_lru(self.cache_dir, "*.frames", self.max_bytes)
+
+    def clear(self):
+        """清空缓存"""
+        for entry in self.cache_dir.glob("*.frames"):
+            entry.unlink(missing_ok=True)
+        self._memory.clear()
+        self._silence_frame = None
+
+
+def test_fast_assemble():
+    """测试快速拼装与重新编码路径的等效性"""
+    from src.audio_processor import AudioProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        pcm_cache = PCMCache(cache_dir=temp_path / "pcm")
+        processor = AudioProcessor(
+            pcm_cache=pcm_cache,
+            fragment_cache=MP3FragmentCache(pcm_cache, cache_dir=temp_path / "frames")
+        )
+
+        # 生成两个不同长度的测试音
+        clips = []
+        for i, seconds in enumerate([0.4, 0.7]):
+            t = np.arange(int(seconds * processor.sample_rate)) / processor.sample_rate
+            tone = (0.3 * np.sin(2 * np.pi * 440 * (i + 1) * t)).astype(np.float32)
+            clips.append(processor.encode_pcm(tone, temp_path / f"clip_{i}.mp3"))
+
+        result = processor.verify_fast_assemble(clips * 5)
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+
+        # 解码拼装结果，检查每个命令的起始偏移与实际发声位置一致（测试音从第一个样本起振）
+        cue_offsets = []
+        assembled = processor.fast_assemble(clips * 5, temp_path / "cues.mp3", cue_offsets=cue_offsets)
+        decoded = pcm_cache.decode(assembled)
+        search = processor.sample_rate // 10
+        errors = []
+        for start, _ in cue_offsets:
+            low = max(0, start - search)
+            onset = low + int(np.argmax(np.abs(decoded[low:start + search]) > 0.05))
+            errors.append(onset - start)
+        print(f"  cue_onset_error_samples: {min(errors)}..{max(errors)}，"
+              f"decoded_samples: {len(decoded)}，last_cue_end: {cue_offsets[-1][1]}")
+
+
+if __name__ == "__main__":
+    test_fast_assemble()
@@ -1,30 +1,203 @@
 """
 Google TTS备用语音生成模块
 
-当EdgeTTS不可用时使用Google Text-to-Speech服务。
+当EdgeTTS不可用时使用Google Text-to-Speech服务（与gTTS相同的batchexecute接口）。
+所有请求共用一个连接池；多个短语用分隔符拼成一次请求合成，
+再按静音检测在MP3帧边界处切开，每个短语直接得到原始MP3数据的一段，无需重新编码。
 """
 
 import asyncio
-from pathlib import Path
-from typing import List, Optional
+import base64
+import json
+import re
 import tempfile
-import time
-from gtts import gTTS
-import io
+import urllib.parse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+import numpy as np
+
+from config.voices import GTTS_CONFIG
+from src.mp3_frames import find_info_tag, iter_frames, main_data_begin
+
+# batchexecute接口中语音合成的RPC标识
+_RPC_ID = "jQ1olc"
+_AUDIO_PATTERN = re.compile(r'jQ1olc","\[\\"(.*?)\\"]')
+_ENDPOINT = "/_/TranslateWebServerUi/data/batchexecute"
+
+
+def package_rpc(text: str, lang: str) -> str:
+    """
+    生成batchexecute请求体
+
+    Args:
+        text: 要合成的文本
+        lang: 语言代码
+
+    Returns:
+        application/x-www-form-urlencoded请求体
+    """
+    parameter = json.dumps([text, lang, None, "null"], separators=(",", ":"))
+    rpc = json.dumps([[[_RPC_ID, parameter, None, "generic"]]], separators=(",", ":"))
+    return f"f.req={urllib.parse.quote(rpc)}&"
+
+
+def split_on_silence(data: bytes, count: int, config: Optional[dict] = None) -> Optional[List[memoryview]]:
+    """
+    在最长的count-1段静音处把MP3数据切成count段（切点在帧边界，不重新编码）
+
+    Args:
+        data: MP3数据
+        count: 期望的段数
+        config: 静音检测参数，默认使用GTTS_CONFIG
+
+    Returns:
+        各段MP3数据（原数据的视图），静音段数不足时返回None
+    """
+    import ffmpeg
+
+    config = config or GTTS_CONFIG
+    view = memoryview(data)
+    frames = [(offset, header) for offset, header in iter_frames(data, strict=False)
+              if not find_info_tag(data, offset, header)]
+    if count == 1:
+        return [view[frames[0][0]:]] if frames else None
+    if len(frames) < count:
+        return None
+
+    sample_rate = frames[0][1].sample_rate
+    samples_per_frame = frames[0][1].samples_per_frame
+    try:
+        out, _ = (
+            ffmpeg
+            .input('pipe:', format='mp3')
+            .output('pipe:', format='f32le', ac=1, ar=sample_rate)
+            .run(input=data, capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+        raise RuntimeError(f"合成结果解码失败: {stderr_output}")
+
+    # 每帧的能量(dBFS)，解码长度与帧数不一致时补零或截断
+    pcm = np.resize(np.frombuffer(out, dtype=np.float32), len(frames) * samples_per_frame)
+    rms = np.sqrt(np.mean(pcm.reshape(len(frames), samples_per_frame) ** 2, axis=1))
+    silent = 20 * np.log10(np.maximum(rms, 1e-10)) < config["silence_threshold_db"]
+
+    # 找出内部的静音段（不含开头和结尾的静音）
+    min_frames = max(1, int(config["min_silence"] * sample_rate / samples_per_frame))
+    runs = []
+    start = None
+    for index, is_silent in enumerate(silent):
+        if is_silent and start is None:
+            start = index
+        elif not is_silent and start is not None:
+            if start > 0 and index - start >= min_frames:
+                runs.append((start, index))
+            start = None
+    if len(runs) < count - 1:
+        return None
+
+    # 取最长的count-1段静音，在中间附近切开；优先选不引用前面帧数据（比特池为0）的帧
+    runs = sorted(sorted(runs, key=lambda run: run[0] - run[1])[:count - 1])
+    cuts = []
+    for start, end in runs:
+        middle = (start + end) // 2
+        candidates = range(start + (end - start) // 4, end - (end - start) // 4 + 1)
+        independent = [i for i in candidates if main_data_begin(data, *frames[i]) == 0]
+        cuts.append(min(independent, key=lambda i: abs(i - middle)) if independent else middle)
+
+    boundaries = [frames[0][0]] + [frames[cut][0] for cut in cuts] + [len(data)]
+    return [view[begin:end] for begin, end in zip(boundaries, boundaries[1:])]
+
 
 class GTTSGenerator:
     """Google TTS语音生成器"""
 
-    def __init__(self, lang: str = 'zh'):
+    def __init__(self,
+                 lang: str = 'zh',
+                 base_url: Optional[str] = None,
+                 max_connections: Optional[int] = None,
+                 batch_chars: Optional[int] = None):
         """
         初始化Google TTS生成器
 
         Args:
             lang: 语言代码，默认为中文
+            base_url: 服务地址，默认使用GTTS_CONFIG中的配置（测试时可指向本地模拟服务）
+            max_connections: 连接池大小
+            batch_chars: 合并请求的最大字符数，为0时每个短语单独请求
         """
         self.lang = lang
+        self.url = (base_url or GTTS_CONFIG["base_url"]).rstrip("/") + _ENDPOINT
+        self.max_connections = max_connections or GTTS_CONFIG["max_connections"]
+        self.batch_chars = GTTS_CONFIG["batch_chars"] if batch_chars is None else batch_chars
         self.temp_dir = Path(tempfile.gettempdir()) / "fencing_trainer_gtts"
         self.temp_dir.mkdir(exist_ok=True)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # 统计信息
+        self.requests = 0  # 发出的HTTP请求数
+        self.connections = 0  # 新建的连接数
+        self.fallbacks = 0  # 静音切分失败、改为逐个请求的批次数
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取共用的HTTP会话（首次使用时创建连接池）"""
+        if self._session is None or self._session.closed:
+            trace = aiohttp.TraceConfig()
+
+            async def on_connection_created(session, context, params):
+                self.connections += 1
+
+            trace.on_connection_create_end.append(on_connection_created)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers={
+                    "Referer": "http://translate.google.com/",
+                    "User-Agent": GTTS_CONFIG["user_agent"],
+                    "Content-Type": "application/x-www-form-urlencoded;charset=utf-8",
+                },
+                trace_configs=[trace],
+            )
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "GTTSGenerator":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def fetch(self, text: str) -> bytes:
+        """
+        请求合成一段文本
+
+        Args:
+            text: 要合成的文本
+
+        Returns:
+            MP3数据
+        """
+        session = await self._get_session()
+        self.requests += 1
+        try:
+            async with session.post(self.url, data=package_rpc(text, self.lang)) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                body = await response.text()
+        except aiohttp.ClientError as e:
+            raise RuntimeError(f"Google TTS生成失败: {text[:20]}... - {e}")
+
+        chunks = [base64.b64decode(match) for match in _AUDIO_PATTERN.findall(body)]
+        if not chunks:
+            raise RuntimeError(f"Google TTS生成失败: {text[:20]}... - 响应中没有音频数据")
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
 
     async def generate_audio(self, text: str, output_path: Optional[Path] = None) -> Path:
         """
@@ -38,37 +211,44 @@ class GTTSGenerator:
             生成的音频文件路径
         """
         if output_path is None:
-            output_path = self.temp_dir / f"gtts_{hash(text) % 1000000}.mp3"
+            output_path = self.get_temp_file_path(str(hash(text) % 1000000))
 
         try:
-            # gTTS是同步的，在线程池中运行以避免阻塞
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._generate_sync, text, output_path)
+            data = await self.fetch(text)
+            output_path.write_bytes(data)
             return output_path
         except Exception as e:
             raise RuntimeError(f"Google TTS生成失败: {text[:20]}... - {str(e)}")
 
-    def _generate_sync(self, text: str, output_path: Path):
-        """同步生成音频文件"""
-        try:
-            # 创建gTTS对象
-            tts = gTTS(text=text, lang=self.lang, slow=False)
-
-            # 生成音频到内存
-            mp3_fp = io.BytesIO()
-            tts.write_to_fp(mp3_fp)
+    def _pack(self, texts: Sequence[str]) -> List[List[str]]:
+        """把短语按顺序合并为批次，每批拼接后的字符数不超过batch_chars"""
+        separator = GTTS_CONFIG["separator"]
+        batches: List[List[str]] = []
+        size = 0
+        for text in texts:
+            if batches and size + len(separator) + len(text) <= self.batch_chars:
+                batches[-1].append(text)
+                size += len(separator) + len(text)
+            else:
+                batches.append([text])
+                size = len(text)
+        return batches
 
-            # 保存到文件
-            with open(output_path, 'wb') as f:
-                mp3_fp.seek(0)
-                f.write(mp3_fp.read())
+    async def _synthesize_batch(self, batch: List[str]) -> List[bytes]:
+        """合成一个批次并切分；静音检测得到的段数不对时改为逐个请求"""
+        if len(batch) == 1:
+            return [await self.fetch(batch[0])]
 
-        except Exception as e:
-            raise RuntimeError(f"gTTS生成失败: {str(e)}")
+        data = await self.fetch(GTTS_CONFIG["separator"].join(batch))
+        pieces = await asyncio.get_running_loop().run_in_executor(None, split_on_silence, data, len(batch))
+        if pieces is None:
+            self.fallbacks += 1
+            return list(await asyncio.gather(*(self.fetch(text) for text in batch)))
+        return pieces
 
     async def generate_multiple_audio(self, texts: List[str]) -> List[Path]:
         """
-        批量生成多个文本的音频文件
+        批量生成多个文本的音频文件（短语合并请求，重复文本只合成一次）
 
         Args:
             texts: 文本列表
@@ -76,12 +256,21 @@ class GTTSGenerator:
         Returns:
             生成的音频文件路径列表
         """
-        tasks = []
-        for text in texts:
-            task = self.generate_audio(text)
-            tasks.append(task)
+        unique = list(dict.fromkeys(texts))
+        batches = self._pack(unique)
+        try:
+            results = await asyncio.gather(*(self._synthesize_batch(batch) for batch in batches))
+        except Exception as e:
+            raise RuntimeError(f"Google TTS批量生成失败: {str(e)}")
 
-        return await asyncio.gather(*tasks)
+        paths: Dict[str, Path] = {}
+        for batch, pieces in zip(batches, results):
+            for text, piece in zip(batch, pieces):
+                path = self.get_temp_file_path(str(hash(text) % 1000000))
+                with open(path, "wb") as f:
+                    f.write(piece)  # 直接写出响应数据的切片，不再复制
+                paths[text] = path
+        return [paths[text] for text in texts]
 
     def cleanup_temp_files(self):
         """清理临时文件"""
@@ -95,19 +284,59 @@ class GTTSGenerator:
         """获取临时文件路径"""
         return self.temp_dir / f"gtts_{identifier}.mp3"
 
+async def _start_mock_server():
+    """启动模拟batchexecute接口的本地服务：每个短语合成为一段音调，短语间插入静音"""
+    import ffmpeg
+    from aiohttp import web
+
+    sample_rate = 24000
+
+    async def handle(request):
+        form = await request.post()
+        text = json.loads(json.loads(form["f.req"])[0][0][1])[0]
+        pieces = []
+        for index, phrase in enumerate(text.split(GTTS_CONFIG["separator"])):
+            t = np.arange(int(sample_rate * (0.2 + 0.08 * len(phrase)))) / sample_rate
+            pieces.append(0.3 * np.sin(2 * np.pi * (300 + 40 * index) * t))
+            pieces.append(np.zeros(int(sample_rate * 0.6)))
+        out, _ = (
+            ffmpeg
+            .input('pipe:', format='f32le', ac=1, ar=sample_rate)
+            .output('pipe:', format='mp3', audio_bitrate='32k')
+            .run(input=np.concatenate(pieces).astype(np.float32).tobytes(), capture_stdout=True, capture_stderr=True)
+        )
+        payload = json.dumps([["wrb.fr", _RPC_ID, json.dumps([base64.b64encode(out).decode("ascii")]),
+                               None, None, None, "generic"]], separators=(",", ":"))
+        return web.Response(text=f")]}}'\n\n{len(payload)}\n{payload}\n")
+
+    app = web.Application()
+    app.router.add_post(_ENDPOINT, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
 async def test_gtts():
-    """测试Google TTS功能"""
-    generator = GTTSGenerator()
-    try:
-        text = "测试Google语音生成功能"
-        audio_path = await generator.generate_audio(text)
-        print(f"音频文件已生成: {audio_path}")
-        print(f"文件大小: {audio_path.stat().st_size} bytes")
+    """测试Google TTS功能（使用本地模拟服务）"""
+    from src.audio_probe import probe_audio
+    from src.training_commands import StraightCutCommandGenerator
 
-        # 清理测试文件
-        audio_path.unlink()
-    except Exception as e:
-        print(f"测试失败: {e}")
+    runner, base_url = await _start_mock_server()
+    try:
+        texts = StraightCutCommandGenerator(["stationary", "lunge"], ["3", "4", "5"]).generate_all_commands(10)
+        print(f"节目命令: {len(texts)} 个，不同短语 {len(set(texts))} 个")
+        for label, batch_chars in (("逐个请求", 0), ("合并请求", None)):
+            async with GTTSGenerator(base_url=base_url, batch_chars=batch_chars) as generator:
+                paths = await generator.generate_multiple_audio(texts)
+                durations = {path: probe_audio(path).duration for path in set(paths)}
+                print(f"{label}: 请求 {generator.requests} 次，新建连接 {generator.connections} 个，"
+                      f"切分失败 {generator.fallbacks} 批，片段时长 {min(durations.values()):.2f}-"
+                      f"{max(durations.values()):.2f} 秒")
+                generator.cleanup_temp_files()
+    finally:
+        await runner.cleanup()
 
 if __name__ == "__main__":
-    asyncio.run(test_gtts())
\ No newline at end of file
+    asyncio.run(test_gtts())
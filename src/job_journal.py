@@ -0,0 +1,216 @@
+"""
+任务检查点日志模块
+
+按任务记录已完成的语音片段和已渲染的段落，生成中断后可以从最后的检查点继续。
+日志是追加写入的JSON Lines文件，每条记录写入后立即落盘。
+运行期间持有任务目录的独占锁，相同任务同时运行时后来者改用本进程独有的目录，不会删除别人正在使用的检查点。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加锁
+    fcntl = None
+
+from config.cache import CACHE_CONFIG
+from config.voices import AUDIO_CONFIG, VOICE_CONFIG
+
+
+class JobJournal:
+    """任务检查点日志"""
+
+    def __init__(self, job_id: str, jobs_dir: Optional[Path] = None):
+        """
+        初始化任务日志
+
+        Args:
+            job_id: 任务ID
+            jobs_dir: 任务目录的父目录，默认使用CACHE_CONFIG中的配置
+        """
+        self.job_id = job_id
+        self.jobs_dir = Path(jobs_dir or CACHE_CONFIG["job_dir"])
+        self.job_dir = self.jobs_dir / job_id
+        self.journal_path = self.job_dir / "journal.jsonl"
+        self._lock_file = None
+        self._private = False
+        # record_clip在线程池中调用，追加写入需要串行
+        self._append_lock = threading.Lock()
+
+        self.clips: Dict[Tuple[str, str], Path] = {}
+        self.segments: Dict[Tuple[str, int], Path] = {}
+
+    @staticmethod
+    def job_id_for(config: dict) -> str:
+        """
+        根据影响输出内容的配置计算任务ID
+
+        Args:
+            config: 配置字典
+
+        Returns:
+            任务ID
+        """
+        normalized = {
+            "attack_types": config["attack_types"],
+            "target_areas": config["target_areas"],
+            "attack_count": config["attack_count"],
+            # 输出到不同文件的相同请求是不同的任务
+            "output_path": str(Path(config["output_path"]).resolve()),
+            "voices": {voice: VOICE_CONFIG.get(voice, voice) for voice in config["voices"]},
+            "include_silence": config["include_silence"],
+            "audio": AUDIO_CONFIG,
+        }
+        # 只在启用时加入，未启用固定节奏和变速的任务ID保持不变
+        if config.get("fixed_cadence") is not None:
+            normalized["fixed_cadence"] = config["fixed_cadence"]
+        if config.get("tempo") is not None:
+            normalized["tempo"] = config["tempo"]
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _try_lock(self, lock_path: Path):
+        """尝试获取独占锁，已被其它进程持有时返回None"""
+        lock_file = open(lock_path, "a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def acquire(self) -> bool:
+        """
+        获取任务目录的独占锁（锁文件在任务目录旁边，删除检查点时不受影响）
+
+        相同任务正由其它进程运行时，改用本进程独有的目录，本次运行无法从之前的检查点继续。
+
+        Returns:
+            是否使用该任务的共享目录
+        """
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = self._try_lock(self.jobs_dir / f"{self.job_id}.lock")
+        if self._lock_file is not None:
+            return True
+
+        private_id = f"{self.job_id}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock_file = self._try_lock(self.jobs_dir / f"{private_id}.lock")
+        self._private = True
+        self.job_dir = self.jobs_dir / private_id
+        self.journal_path = self.job_dir / "journal.jsonl"
+        return False
+
+    def release(self):
+        """释放任务目录的锁（检查点保留，可以之后继续）"""
+        if self._lock_file is None:
+            return
+        if self._private:
+            # 独有的锁文件不会被其它进程打开，可以直接删除
+            Path(self._lock_file.name).unlink(missing_ok=True)
+        self._lock_file.close()
+        self._lock_file = None
+
+    def reset(self):
+        """丢弃已有的检查点，开始新任务（需先调用acquire，只删除本进程持有的目录）"""
+        if self._lock_file is None:
+            raise RuntimeError(f"任务检查点未加锁: {self.job_dir}")
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.clips.clear()
+        self.segments.clear()
+
+    def load(self):
+        """重放日志恢复检查点状态（忽略中断时写了一半的最后一行）"""
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.clips.clear()
+        self.segments.clear()
+        if not self.journal_path.exists():
+            return
+
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if record["event"] == "clip":
+                    self.clips[(record["voice"], record["text"])] = Path(record["path"])
+                elif record["event"] == "segment":
+                    self.segments[(record["voice"], record["index"])] = Path(record["path"])
+
+    def _append(self, record: dict):
+        """追加一条记录并落盘"""
+        with self._append_lock, open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_clip(self, voice: str, text: str, path: Path):
+        """
+        记录已完成的语音片段
+
+        Args:
+            voice: 语音配置名称
+            text: 命令文本
+            path: 片段路径
+        """
+        self.clips[(voice, text)] = path
+        self._append({"event": "clip", "voice": voice, "text": text, "path": str(path)})
+
+    def clip_path(self, voice: str, text: str) -> Optional[Path]:
+        """获取已记录且仍然存在的片段路径"""
+        path = self.clips.get((voice, text))
+        if path is not None and path.exists():
+            return path
+        return None
+
+    def segment_file(self, voice: str, index: int) -> Optional[Path]:
+        """获取已渲染且仍然存在的段落PCM文件"""
+        path = self.segments.get((voice, index))
+        if path is not None and path.exists():
+            return path
+        return None
+
+    def save_segment(self, voice: str, index: int, samples: np.ndarray) -> Path:
+        """
+        保存已渲染段落的PCM并记录检查点
+
+        Args:
+            voice: 语音配置名称
+            index: 段落序号
+            samples: 段落PCM数据
+
+        Returns:
+            段落PCM文件路径
+        """
+        path = self.job_dir / f"segment_{voice}_{index:04d}.npy"
+        fd, tmp_name = tempfile.mkstemp(dir=self.job_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, samples)
+            os.replace(tmp_name, path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        self.segments[(voice, index)] = path
+        self._append({"event": "segment", "voice": voice, "index": index, "path": str(path)})
+        return path
+
+    def finish(self):
+        """任务完成后删除检查点并释放锁"""
+        if self._lock_file is not None:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+        self.release()
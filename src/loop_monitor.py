@@ -0,0 +1,96 @@
+"""
+事件循环延迟监测模块
+
+后台任务按固定间隔休眠，记录每次实际唤醒比预期晚了多少。
+事件循环被同步调用（例如阻塞的ffmpeg编码）占住时，唤醒延迟会明显变大，
+可以用来确认编码和合成确实在同一进程中并行进行。
+"""
+
+import asyncio
+from typing import List, Optional
+
+from config.profiling import PROFILE_CONFIG
+
+
+class LoopLagMonitor:
+    """事件循环延迟监测器"""
+
+    def __init__(self, interval: Optional[float] = None):
+        """
+        初始化延迟监测器
+
+        Args:
+            interval: 采样间隔(秒)，默认使用配置值
+        """
+        self.interval = interval or PROFILE_CONFIG["loop_lag_interval"]
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+        return False
+
+    def start(self):
+        """开始采样（需在事件循环中调用）"""
+        self._task = asyncio.ensure_future(self._sample())
+
+    async def stop(self):
+        """停止采样"""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _sample(self):
+        """按间隔休眠并记录唤醒延迟"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def get_stats(self) -> dict:
+        """
+        获取延迟统计
+
+        Returns:
+            采样次数以及平均、p95和最大延迟(毫秒)
+        """
+        if not self.lags:
+            return {"samples": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.lags)
+        return {
+            "samples": len(ordered),
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+
+def test_loop_monitor():
+    """测试延迟监测：同步阻塞与线程池卸载对比"""
+    import time
+
+    async def workload(blocking: bool) -> dict:
+        async with LoopLagMonitor() as monitor:
+            for _ in range(3):
+                if blocking:
+                    time.sleep(0.1)
+                else:
+                    await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.1)
+                await asyncio.sleep(0.02)
+        return monitor.get_stats()
+
+    for blocking in (True, False):
+        stats = asyncio.run(workload(blocking))
+        print(f"{'同步阻塞' if blocking else '线程池卸载'}: 平均 {stats['mean_ms']:.1f} 毫秒，"
+              f"p95 {stats['p95_ms']:.1f} 毫秒，最大 {stats['max_ms']:.1f} 毫秒（{stats['samples']} 次采样）")
+
+
+if __name__ == "__main__":
+    test_loop_monitor()
@@ -2,31 +2,130 @@
 macOS系统TTS生成模块
 
 使用macOS内置的say命令进行中文语音合成。
+say直接输出节目采样率的WAV，在进程内读取为PCM，不再逐个短语转码为MP3；
+合成进程由固定大小的进程池并行运行。合成命令可以替换（例如espeak-ng），便于在Linux上测试。
 """
 
 import asyncio
+import os
+import shlex
 import subprocess
 import tempfile
+import uuid
+import wave
 from pathlib import Path
 from typing import List, Optional
 
+import numpy as np
+
+from config.voices import AUDIO_CONFIG, MAC_TTS_CONFIG
+
 class MacTTSGenerator:
     """macOS TTS语音生成器"""
 
-    def __init__(self, voice: str = "Ting-Ting"):
+    def __init__(self,
+                 voice: Optional[str] = None,
+                 command: Optional[str] = None,
+                 workers: Optional[int] = None,
+                 sample_rate: Optional[int] = None,
+                 pcm_cache=None):
         """
         初始化macOS TTS生成器
 
         Args:
             voice: 语音名称，默认为Ting-Ting（中文女声）
+            command: 合成命令模板，默认使用MAC_TTS_CONFIG中的配置
+            workers: 同时运行的合成进程数，默认使用CPU核数
+            sample_rate: 输出采样率，默认使用节目采样率
+            pcm_cache: PCM缓存(PCMCache)，提供时合成得到的PCM直接写入缓存，渲染时无需解码
         """
-        self.voice = voice
+        self.voice = voice or MAC_TTS_CONFIG["voice"]
+        self.command = shlex.split(command or MAC_TTS_CONFIG["command"])
+        self.workers = workers or MAC_TTS_CONFIG["workers"] or os.cpu_count() or 4
+        self.sample_rate = sample_rate or AUDIO_CONFIG["sample_rate"]
+        self.pcm_cache = pcm_cache
         self.temp_dir = Path(tempfile.gettempdir()) / "fencing_trainer_mac"
         self.temp_dir.mkdir(exist_ok=True)
+        self._slots = asyncio.Semaphore(self.workers)
+
+        # 统计信息
+        self.processes = 0  # 启动的合成进程数
+        self.resampled = 0  # 输出采样率与节目采样率不同、需要重采样的片段数
+
+    def _build_command(self, text: str, output_path: Path) -> List[str]:
+        """把命令模板中的占位符替换为实际参数（文本作为单个参数传入，不经过shell）"""
+        values = {"voice": self.voice, "text": text, "output": str(output_path), "sample_rate": self.sample_rate}
+        return [arg.format(**values) for arg in self.command]
+
+    async def _synthesize(self, text: str, output_path: Path):
+        """在进程池中运行合成命令，把WAV写到output_path"""
+        cmd = self._build_command(text, output_path)
+        async with self._slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+                )
+            except OSError as e:
+                raise RuntimeError(f"macOS TTS生成失败: 无法运行 {cmd[0]} - {e}")
+            self.processes += 1
+            _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"macOS TTS生成失败: {text[:20]}... - "
+                               f"{stderr.decode('utf-8', errors='replace').strip() or process.returncode}")
+
+    def read_pcm(self, wav_path: Path) -> np.ndarray:
+        """
+        读取WAV为节目采样率的float32单声道PCM
+
+        Args:
+            wav_path: WAV文件路径
+
+        Returns:
+            float32单声道PCM数组
+        """
+        try:
+            with wave.open(str(wav_path), "rb") as wav:
+                width = wav.getsampwidth()
+                channels = wav.getnchannels()
+                rate = wav.getframerate()
+                frames = wav.readframes(wav.getnframes())
+        except (wave.Error, EOFError) as e:
+            raise RuntimeError(f"读取合成结果失败: {wav_path} - {e}")
+
+        if width == 1:
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+        elif width in (2, 4):
+            dtype = np.int16 if width == 2 else np.int32
+            samples = np.frombuffer(frames, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+        else:
+            raise RuntimeError(f"读取合成结果失败: 不支持 {width * 8} 位采样 - {wav_path}")
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+
+        if rate != self.sample_rate:
+            self.resampled += 1
+            samples = self._resample(samples, rate)
+        return samples.astype(np.float32, copy=False)
+
+    def _resample(self, samples: np.ndarray, rate: int) -> np.ndarray:
+        """合成命令不支持指定采样率时（例如espeak-ng）重采样到节目采样率"""
+        import ffmpeg
+
+        try:
+            out, _ = (
+                ffmpeg
+                .input('pipe:', format='f32le', ac=1, ar=rate)
+                .output('pipe:', format='f32le', ac=1, ar=self.sample_rate)
+                .run(input=samples.astype(np.float32).tobytes(), capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+            raise RuntimeError(f"重采样失败: {stderr_output}")
+        return np.frombuffer(out, dtype=np.float32)
 
     async def generate_audio(self, text: str, output_path: Optional[Path] = None) -> Path:
         """
-        生成单个文本的音频文件
+        生成单个文本的音频文件（WAV，不再转码为MP3）
 
         Args:
             text: 要合成的文本
@@ -36,64 +135,38 @@ class MacTTSGenerator:
             生成的音频文件路径
         """
         if output_path is None:
-            output_path = self.temp_dir / f"mac_tts_{hash(text) % 1000000}.aiff"
-
-        try:
-            # 使用say命令生成AIFF文件
-            cmd = [
-                "say",
-                "-v", self.voice,
-                "-o", str(output_path),
-                text
-            ]
-
-            # 在线程池中运行命令以避免阻塞
-            loop = asyncio.get_event_loop()
+            output_path = self.temp_dir / f"mac_tts_{hash(text) % 1000000}.wav"
 
-            def run_command():
-                return subprocess.run(cmd, capture_output=True, text=True, check=True)
+        await self._synthesize(text, output_path)
+        if self.pcm_cache is not None:
+            # 顺便读出PCM写入缓存，渲染时不必再启动解码器；写缓存要计算文件哈希并落盘，同样放到线程池
+            await asyncio.get_running_loop().run_in_executor(None, self._cache_pcm, output_path)
+        return output_path
 
-            result = await loop.run_in_executor(None, run_command)
+    def _cache_pcm(self, wav_path: Path):
+        """读出合成结果的PCM并写入PCM缓存"""
+        self.pcm_cache.put(wav_path, self.read_pcm(wav_path))
 
-            # 转换为MP3格式
-            mp3_path = output_path.with_suffix('.mp3')
-            await self._convert_to_mp3(output_path, mp3_path)
-
-            # 删除临时的AIFF文件
-            output_path.unlink()
-
-            return mp3_path
+    async def generate_pcm(self, text: str) -> np.ndarray:
+        """
+        合成单个文本并直接返回PCM，临时WAV读取后即删除
 
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"macOS TTS生成失败: {text[:20]}... - {e.stderr if e.stderr else str(e)}")
-        except Exception as e:
-            raise RuntimeError(f"macOS TTS生成失败: {text[:20]}... - {str(e)}")
+        Args:
+            text: 要合成的文本
 
-    async def _convert_to_mp3(self, input_path: Path, output_path: Path):
-        """将AIFF文件转换为MP3格式"""
+        Returns:
+            节目采样率的float32单声道PCM数组
+        """
+        temp_path = self.temp_dir / f"mac_tts_{uuid.uuid4().hex}.wav"
         try:
-            cmd = [
-                "ffmpeg",
-                "-i", str(input_path),
-                "-codec:a", "mp3",
-                "-b:a", "192k",
-                "-y",  # 覆盖输出文件
-                str(output_path)
-            ]
-
-            loop = asyncio.get_event_loop()
-
-            def run_command():
-                return subprocess.run(cmd, capture_output=True, text=True, check=True)
-
-            result = await loop.run_in_executor(None, run_command)
-
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"音频转换失败: {e.stderr if e.stderr else str(e)}")
+            await self._synthesize(text, temp_path)
+            return await asyncio.get_running_loop().run_in_executor(None, self.read_pcm, temp_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
 
     async def generate_multiple_audio(self, texts: List[str]) -> List[Path]:
         """
-        批量生成多个文本的音频文件
+        批量生成多个文本的音频文件（同时运行的进程数受进程池大小限制，重复文本只合成一次）
 
         Args:
             texts: 文本列表
@@ -101,26 +174,37 @@ class MacTTSGenerator:
         Returns:
             生成的音频文件路径列表
         """
-        tasks = []
-        for text in texts:
-            task = self.generate_audio(text)
-            tasks.append(task)
+        unique = list(dict.fromkeys(texts))
+        paths = await asyncio.gather(*(self.generate_audio(text) for text in unique))
+        by_text = dict(zip(unique, paths))
+        return [by_text[text] for text in texts]
+
+    async def generate_multiple_pcm(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        批量合成多个文本的PCM（重复文本只合成一次）
 
-        return await asyncio.gather(*tasks)
+        Args:
+            texts: 文本列表
+
+        Returns:
+            PCM数组列表，顺序与texts一致
+        """
+        unique = list(dict.fromkeys(texts))
+        pcms = await asyncio.gather(*(self.generate_pcm(text) for text in unique))
+        by_text = dict(zip(unique, pcms))
+        return [by_text[text] for text in texts]
 
     def cleanup_temp_files(self):
         """清理临时文件"""
         try:
-            for file in self.temp_dir.glob("mac_tts_*.aiff"):
-                file.unlink()
-            for file in self.temp_dir.glob("mac_tts_*.mp3"):
+            for file in self.temp_dir.glob("mac_tts_*.wav"):
                 file.unlink()
         except Exception:
             pass  # 忽略清理错误
 
     def get_temp_file_path(self, identifier: str) -> Path:
         """获取临时文件路径"""
-        return self.temp_dir / f"mac_tts_{identifier}.mp3"
+        return self.temp_dir / f"mac_tts_{identifier}.wav"
 
     def list_available_voices(self):
         """列出可用的语音"""
@@ -133,7 +217,9 @@ class MacTTSGenerator:
             print(f"获取语音列表失败: {e}")
 
 async def test_mac_tts():
-    """测试macOS TTS功能"""
+    """测试macOS TTS功能（非macOS上可用 FENCING_SAY_COMMAND 指定替代命令）"""
+    import time
+
     generator = MacTTSGenerator()
     try:
         text = "测试macOS语音生成功能"
@@ -143,8 +229,15 @@ async def test_mac_tts():
 
         # 清理测试文件
         audio_path.unlink()
+
+        texts = [f"{i}！" for i in range(1, 21)]
+        start = time.perf_counter()
+        pcms = await generator.generate_multiple_pcm(texts)
+        print(f"并行合成 {len(texts)} 个短语（{generator.workers} 个进程）: "
+              f"{time.perf_counter() - start:.2f} 秒，共 {sum(len(pcm) for pcm in pcms) / generator.sample_rate:.1f} 秒音频，"
+              f"重采样 {generator.resampled} 个")
     except Exception as e:
         print(f"测试失败: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(test_mac_tts())
\ No newline at end of file
+    asyncio.run(test_mac_tts())
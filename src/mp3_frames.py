@@ -0,0 +1,296 @@
+"""
+MP3帧处理模块
+
+解析MPEG音频帧头，按帧切分MP3数据，并生成Xing/Info + LAME头帧。
+只处理Layer III（MP3）数据。
+"""
+
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# Layer III 比特率表(kbps)，按MPEG版本区分
+_BITRATES_MPEG1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+_BITRATES_MPEG2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+
+# 采样率表，按版本位索引：0=MPEG2.5, 2=MPEG2, 3=MPEG1
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+# LAME编码器在流开头插入的延迟样本数（libmp3lame固定为576，与采样率和MPEG版本无关）
+LAME_ENCODER_DELAY = 576
+
+# LAME标签使用的CRC-16查找表（多项式0x8005，反射形式）
+_CRC16_TABLE = []
+for _i in range(256):
+    _crc = _i
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ 0xA001 if _crc & 1 else _crc >> 1
+    _CRC16_TABLE.append(_crc)
+
+
+class FrameHeader(NamedTuple):
+    """MPEG音频帧头信息"""
+    version: int  # 版本位：3=MPEG1, 2=MPEG2, 0=MPEG2.5
+    protected: bool  # 是否带CRC校验
+    bitrate: int  # 比特率(kbps)
+    sample_rate: int  # 采样率(Hz)
+    padding: int  # 填充字节数
+    channel_mode: int  # 声道模式：3=单声道
+    frame_length: int  # 帧长度(字节)
+    samples_per_frame: int  # 每帧样本数
+
+    @property
+    def side_info_size(self) -> int:
+        """边信息长度(字节)"""
+        mono = self.channel_mode == 3
+        if self.version == 3:
+            return 17 if mono else 32
+        return 9 if mono else 17
+
+
+def crc16(data: bytes, crc: int = 0) -> int:
+    """
+    计算LAME标签使用的CRC-16
+
+    Args:
+        data: 数据
+        crc: 初始值
+
+    Returns:
+        CRC-16值
+    """
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC16_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def parse_frame_header(data: bytes, offset: int = 0) -> Optional[FrameHeader]:
+    """
+    解析帧头
+
+    Args:
+        data: MP3数据
+        offset: 帧头偏移
+
+    Returns:
+        帧头信息，不是有效的Layer III帧头时返回None
+    """
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3, b4 = data[offset:offset + 4]
+    if b1 != 0xFF or (b2 & 0xE0) != 0xE0:
+        return None
+
+    version = (b2 >> 3) & 0x03
+    layer = (b2 >> 1) & 0x03
+    bitrate_index = b3 >> 4
+    sample_rate_index = (b3 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = (_BITRATES_MPEG1 if version == 3 else _BITRATES_MPEG2)[bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b3 >> 1) & 0x01
+    if version == 3:
+        frame_length = 144000 * bitrate // sample_rate + padding
+        samples_per_frame = 1152
+    else:
+        frame_length = 72000 * bitrate // sample_rate + padding
+        samples_per_frame = 576
+
+    return FrameHeader(
+        version=version,
+        protected=(b2 & 0x01) == 0,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        padding=padding,
+        channel_mode=b4 >> 6,
+        frame_length=frame_length,
+        samples_per_frame=samples_per_frame,
+    )
+
+
+def skip_id3v2(data: bytes) -> int:
+    """
+    跳过开头的ID3v2标签
+
+    Args:
+        data: MP3数据
+
+    Returns:
+        第一个音频字节的偏移
+    """
+    offset = 0
+    while data[offset:offset + 3] == b"ID3" and len(data) >= offset + 10:
+        size = 0
+        for byte in data[offset + 6:offset + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if data[offset + 5] & 0x10 else 0
+        offset += 10 + size + footer
+    return offset
+
+
+def audio_end(data: bytes) -> int:
+    """获取音频数据结束位置（排除结尾的ID3v1标签）"""
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return end
+
+
+def iter_frames(data: bytes, strict: bool = True) -> Iterator[Tuple[int, FrameHeader]]:
+    """
+    遍历MP3数据中的音频帧
+
+    Args:
+        data: MP3数据
+        strict: 为True时遇到无效帧头抛出异常，否则尝试重新同步
+
+    Yields:
+        (帧偏移, 帧头信息)
+    """
+    offset = skip_id3v2(data)
+    end = audio_end(data)
+    while offset + 4 <= end:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header.frame_length > end:
+            if strict:
+                raise ValueError(f"无效的MP3帧: 偏移 {offset}")
+            offset += 1
+            continue
+        yield offset, header
+        offset += header.frame_length
+
+
+def find_info_tag(data: bytes, offset: int, header: FrameHeader) -> Optional[bytes]:
+    """
+    检查帧是否为Xing/Info/VBRI头帧
+
+    Args:
+        data: MP3数据
+        offset: 帧偏移
+        header: 帧头信息
+
+    Returns:
+        标签名(b"Xing"/b"Info"/b"VBRI")，普通音频帧返回None
+    """
+    tag_offset = offset + 4 + (2 if header.protected else 0) + header.side_info_size
+    tag = data[tag_offset:tag_offset + 4]
+    if tag in (b"Xing", b"Info"):
+        return tag
+    if data[offset + 36:offset + 40] == b"VBRI":
+        return b"VBRI"
+    return None
+
+
+def main_data_begin(data: bytes, offset: int, header: FrameHeader) -> int:
+    """
+    读取帧的main_data_begin字段（比特池回溯字节数）
+
+    Args:
+        data: MP3数据
+        offset: 帧偏移
+        header: 帧头信息
+
+    Returns:
+        main_data_begin值，0表示该帧不依赖前面帧的比特池
+    """
+    side = offset + 4 + (2 if header.protected else 0)
+    if header.version == 3:
+        return (data[side] << 1) | (data[side + 1] >> 7)
+    return data[side]
+
+
+def split_frames(data: bytes) -> Tuple[List[bytes], FrameHeader]:
+    """
+    将MP3数据切分为音频帧（去掉ID3标签和Xing/Info头帧）
+
+    Args:
+        data: MP3数据
+
+    Returns:
+        (帧数据列表, 第一个音频帧的帧头)
+    """
+    frames = []
+    first_header = None
+    for offset, header in iter_frames(data):
+        if not frames and find_info_tag(data, offset, header):
+            continue
+        frames.append(data[offset:offset + header.frame_length])
+        if first_header is None:
+            first_header = header
+    if first_header is None:
+        raise ValueError("MP3数据中没有音频帧")
+    return frames, first_header
+
+
+def build_info_frame(template: bytes, frame_count: int, stream_bytes: int,
+                     music_crc: int = 0, encoder_delay: int = 0, padding: int = 0) -> bytes:
+    """
+    生成CBR流的Info + LAME头帧
+
+    Args:
+        template: 任意一个音频帧（用于复制帧头参数）
+        frame_count: 音频帧数量（不含头帧本身）
+        stream_bytes: 流的总字节数（含头帧本身）
+        music_crc: 音频数据的CRC-16
+        encoder_delay: 流开头的编码延迟样本数，支持无缝播放的解码器会跳过
+        padding: 流末尾的填充样本数，支持无缝播放的解码器会丢弃
+
+    Returns:
+        头帧数据
+    """
+    header_bytes = bytearray(template[:4])
+    header_bytes[1] |= 0x01  # 不带CRC
+    header_bytes[2] &= 0xFD  # 无填充
+    header = parse_frame_header(bytes(header_bytes))
+    if header is None:
+        raise ValueError("无效的模板帧")
+
+    frame = bytearray(header.frame_length)
+    frame[0:4] = header_bytes
+    pos = 4 + header.side_info_size
+
+    # Info标签：帧数、字节数、TOC、质量
+    toc = bytes(min(255, i * 256 // 100) for i in range(100))
+    info = b"Info" + struct.pack(">III", 0x0F, frame_count, stream_bytes) + toc + struct.pack(">I", 0)
+    frame[pos:pos + len(info)] = info
+    pos += len(info)
+
+    # LAME扩展：编码延迟和填充各占12位
+    if not (0 <= encoder_delay <= 0xFFF and 0 <= padding <= 0xFFF):
+        raise ValueError(f"编码延迟或填充超出范围: {encoder_delay}, {padding}")
+    lame = bytearray(36)
+    lame[0:9] = b"LAME3.100"
+    lame[9] = 0x01  # 修订版本0，CBR
+    lame[20] = min(255, header.bitrate)
+    lame[21:24] = bytes([encoder_delay >> 4, ((encoder_delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+    struct.pack_into(">I", lame, 28, stream_bytes)
+    struct.pack_into(">H", lame, 32, music_crc)
+    frame[pos:pos + 34] = lame[:34]
+    tag_crc = crc16(bytes(frame[:pos + 34]))
+    struct.pack_into(">H", frame, pos + 34, tag_crc)
+
+    return bytes(frame)
+
+
+def test_mp3_frames():
+    """测试MP3帧处理"""
+    template = bytes([0xFF, 0xFB, 0xB0, 0xC4]) + bytes(622)
+    header = parse_frame_header(template)
+    print(f"帧头: {header}")
+
+    info = build_info_frame(template, frame_count=100, stream_bytes=62700,
+                            encoder_delay=LAME_ENCODER_DELAY, padding=1000)
+    info_header = parse_frame_header(info)
+    packed = info[4 + info_header.side_info_size + 120 + 21:][:3]
+    delay = (packed[0] << 4) | (packed[1] >> 4)
+    padding = ((packed[1] & 0x0F) << 8) | packed[2]
+    print(f"头帧长度: {len(info)}, 标签: {find_info_tag(info, 0, info_header)}, 编码延迟 {delay}, 填充 {padding}")
+
+
+if __name__ == "__main__":
+    test_mp3_frames()
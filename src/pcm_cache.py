@@ -0,0 +1,317 @@
+"""
+PCM缓存模块
+
+缓存已解码、已重采样到节目采样率的片段PCM数据。
+以片段内容摘要为键，渲染时直接读取，无需再次调用解码器。
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import ffmpeg
+import numpy as np
+
+from config.cache import CACHE_CONFIG
+from config.voices import AUDIO_CONFIG
+
+
+def compute_clip_digest(clip_path: Path) -> str:
+    """
+    计算片段文件的内容摘要
+
+    Args:
+        clip_path: 片段文件路径
+
+    Returns:
+        SHA-256十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(clip_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StretchedClip(NamedTuple):
+    """变速后的片段：可以在需要片段路径的地方代替Path使用，读取PCM时返回变速结果"""
+    path: Path  # 原始片段文件
+    factor: float  # 变速倍率
+
+
+def evict_lru(cache_dir: Path, pattern: str, max_bytes: int) -> Tuple[int, List[Path]]:
+    """
+    按修改时间淘汰最旧的缓存文件，直到总大小不超过预算
+
+    Args:
+        cache_dir: 缓存目录
+        pattern: 缓存文件匹配模式
+        max_bytes: 容量上限(字节)
+
+    Returns:
+        (淘汰后的总字节数, 被删除的文件列表)
+    """
+    entries = []
+    for entry in cache_dir.glob(pattern):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        removed.append(entry)
+        total -= size
+    return total, removed
+
+
+class PCMCache:
+    """解码后PCM缓存（第二级缓存）"""
+
+    def __init__(self,
+                 cache_dir: Optional[Path] = None,
+                 max_bytes: Optional[int] = None,
+                 sample_rate: Optional[int] = None):
+        """
+        初始化PCM缓存
+
+        Args:
+            cache_dir: 缓存目录，默认使用CACHE_CONFIG中的配置
+            max_bytes: 缓存容量上限(字节)，超出后按最近最少使用淘汰
+            sample_rate: 目标采样率，默认使用节目采样率
+        """
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG["pcm_dir"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else CACHE_CONFIG["pcm_max_bytes"]
+        self.sample_rate = sample_rate or AUDIO_CONFIG["sample_rate"]
+
+        # 进程内缓存：摘要 -> PCM数组
+        self._memory: Dict[str, np.ndarray] = {}
+        # 文件摘要备忘：(路径, 修改时间, 大小) -> 摘要
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._total_bytes: Optional[int] = None
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.stretched = 0
+        self.evictions = 0
+
+    def digest(self, clip_path: Union[Path, StretchedClip]) -> str:
+        """
+        获取片段摘要，同一文件未变化时只计算一次
+
+        Args:
+            clip_path: 片段文件路径（变速片段的摘要包含变速倍率）
+
+        Returns:
+            片段内容摘要
+        """
+        if isinstance(clip_path, StretchedClip):
+            return f"{self.digest(clip_path.path)}_x{clip_path.factor:g}"
+        stat = os.stat(clip_path)
+        key = (str(clip_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = compute_clip_digest(clip_path)
+            self._digests[key] = digest
+        return digest
+
+    def get(self, clip_path: Union[Path, StretchedClip]) -> np.ndarray:
+        """
+        获取片段的PCM数据，未命中时解码一次并写入缓存
+
+        Args:
+            clip_path: 片段文件路径，或变速片段
+
+        Returns:
+            float32单声道PCM数组
+        """
+        if isinstance(clip_path, StretchedClip):
+            return self.get_stretched(clip_path.path, clip_path.factor)
+        return self.get_by_digest(self.digest(clip_path), clip_path)
+
+    def put(self, clip_path: Path, samples: np.ndarray):
+        """
+        写入已经得到的PCM（例如本地合成直接输出的PCM），之后读取该片段时无需解码
+
+        Args:
+            clip_path: 片段文件路径
+            samples: 节目采样率的float32单声道PCM数组
+        """
+        digest = self.digest(clip_path)
+        entry = self._entry_path(digest)
+        if digest not in self._memory and not entry.exists():
+            self._store(entry, samples)
+        self._memory[digest] = samples
+
+    def get_stretched(self, clip_path: Path, factor: float) -> np.ndarray:
+        """
+        获取变速后的PCM数据，每个(片段, 倍率)只处理一次并写入缓存
+
+        Args:
+            clip_path: 原始片段文件路径
+            factor: 变速倍率
+
+        Returns:
+            float32单声道PCM数组
+        """
+        if factor == 1.0:
+            return self.get(clip_path)
+
+        def stretch() -> np.ndarray:
+            from src.time_stretch import time_stretch
+
+            self.stretched += 1
+            return time_stretch(self.get(clip_path), factor, self.sample_rate)
+
+        return self._lookup(self.digest(StretchedClip(clip_path, factor)), stretch)
+
+    def get_by_digest(self, digest: str, clip_path: Path) -> np.ndarray:
+        """
+        按摘要获取PCM数据
+
+        Args:
+            digest: 片段内容摘要
+            clip_path: 未命中时用于解码的片段文件路径
+
+        Returns:
+            float32单声道PCM数组
+        """
+        def decode() -> np.ndarray:
+            self.misses += 1
+            return self.decode(clip_path)
+
+        return self._lookup(digest, decode)
+
+    def _lookup(self, digest: str, produce: Callable[[], np.ndarray]) -> np.ndarray:
+        """依次查找内存和磁盘缓存，都未命中时调用produce生成PCM并写入缓存"""
+        samples = self._memory.get(digest)
+        if samples is not None:
+            self.hits += 1
+            return samples
+
+        entry = self._entry_path(digest)
+        if entry.exists():
+            try:
+                samples = np.load(entry, mmap_mode="r")
+                os.utime(entry)  # 更新访问时间用于LRU淘汰
+                self.hits += 1
+                self._memory[digest] = samples
+                return samples
+            except (OSError, ValueError):
+                entry.unlink(missing_ok=True)  # 损坏的缓存条目直接丢弃
+
+        samples = produce()
+        self._store(entry, samples)
+        self._memory[digest] = samples
+        return samples
+
+    def decode(self, clip_path: Path) -> np.ndarray:
+        """
+        将片段解码并重采样为节目采样率的PCM
+
+        Args:
+            clip_path: 片段文件路径
+
+        Returns:
+            float32单声道PCM数组
+        """
+        try:
+            out, _ = (
+                ffmpeg
+                .input(str(clip_path))
+                .output('pipe:', format='f32le', ac=1, ar=self.sample_rate)
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+            raise RuntimeError(f"片段解码失败: {clip_path} - {stderr_output}")
+        return np.frombuffer(out, dtype=np.float32)
+
+    def _entry_path(self, digest: str) -> Path:
+        """获取缓存条目路径（采样率作为键的一部分）"""
+        return self.cache_dir / f"{digest}_{self.sample_rate}.npy"
+
+    def _store(self, entry: Path, samples: np.ndarray):
+        """原子写入缓存条目，随后按容量预算淘汰"""
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, samples)
+            os.replace(tmp_name, entry)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        if self._total_bytes is None:
+            self._total_bytes = self.size_bytes()
+        else:
+            self._total_bytes += entry.stat().st_size
+        self._evict()
+
+    def size_bytes(self) -> int:
+        """获取缓存占用的总字节数"""
+        return sum(entry.stat().st_size for entry in self.cache_dir.glob("*.npy"))
+
+    def _evict(self):
+        """超出容量预算时淘汰最近最少使用的条目"""
+        if self._total_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+
+        total, removed = evict_lru(self.cache_dir, "*.npy", self.max_bytes)
+        for entry in removed:
+            self._memory.pop(entry.stem.rsplit("_", 1)[0], None)
+        self.evictions += len(removed)
+        self._total_bytes = total
+
+    def clear(self):
+        """清空缓存"""
+        for entry in self.cache_dir.glob("*.npy"):
+            entry.unlink(missing_ok=True)
+        self._memory.clear()
+        self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stretched": self.stretched,
+            "evictions": self.evictions,
+            "size_bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def test_pcm_cache():
+    """测试PCM缓存"""
+    from src.audio_processor import AudioProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        cache = PCMCache(cache_dir=temp_path / "pcm")
+        processor = AudioProcessor()
+
+        clip = temp_path / "clip.mp3"
+        processor.generate_silence(1.0, clip)
+
+        first = cache.get(clip)
+        second = cache.get(clip)
+        print(f"样本数: {len(first)}, 二次读取一致: {np.array_equal(first, second)}")
+        faster = cache.get(StretchedClip(clip, 1.25))
+        cache.get(StretchedClip(clip, 1.25))
+        print(f"变速1.25倍样本数: {len(faster)}")
+        print(f"缓存统计: {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_pcm_cache()
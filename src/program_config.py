@@ -0,0 +1,519 @@
+"""
+训练节目配置文件模块
+
+从TOML/JSON/YAML文件读取声明式的节目定义（自定义模板、部位、攻击次数、静音和每段语音），
+校验一次后编译为短语ID计划。编译结果按文件内容摘要缓存在内存和磁盘中：
+文件未变化时直接复用，批量和 --watch 模式只重新编译发生变化的定义。
+
+节目定义示例（TOML）:
+
+    name = "弓步强化"
+    voice = "chinese"           # 默认语音
+    gap = 2.0                   # 默认命令间静音(秒)
+    reminder_every = 10         # 每多少次攻击提醒一次，0表示不提醒
+
+    [templates]                 # 覆盖 STRAIGHT_CUT_TEMPLATES 中的模板
+    hold = "稳住..."
+
+    [positions.6]               # 新增或覆盖部位
+    name = "六部位"
+    guidance = "手腕转动使手掌心朝外"
+
+    [[segments]]
+    attack_type = "lunge"
+    position = "3"
+    count = 10
+    gap = 2.5                   # 可选，覆盖默认值
+    voice = "chinese_male"      # 可选，覆盖默认语音
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.cache import CACHE_CONFIG
+from config.programs import PROGRAM_CONFIG
+from config.voices import AUDIO_CONFIG, DEFAULT_VOICE, VOICE_CONFIG
+from config.wrist_positions import ATTACK_TYPES, STRAIGHT_CUT_TEMPLATES, WRIST_POSITIONS
+from src.training_commands import DEFAULT_PHRASE_TABLE, PhraseTable
+
+# 编译结果格式版本，编译规则变化时递增使旧的磁盘缓存失效
+_COMPILER_VERSION = 1
+
+_PROGRAM_KEYS = {"name", "voice", "gap", "reminder_every", "templates", "positions", "attack_types", "segments"}
+_SEGMENT_KEYS = {"attack_type", "position", "count", "gap", "voice", "reminder_every"}
+# 每种模板在编译时可用的占位符（示例参数），用于校验自定义模板；未列出的模板没有占位符
+_TEMPLATE_FIELDS = {
+    "segment_start": {"target_area": "", "attack_type": ""},
+    "segment_complete": {"target_area": "", "attack_type": ""},
+    "action_guidance": {"wrist_guidance": ""},
+    "count": {"count": 1},
+}
+
+
+class CompiledProgram:
+    """编译后的节目：短语ID、命令后静音和每个命令使用的语音"""
+
+    __slots__ = ("name", "source", "digest", "phrase_ids", "gaps", "voice_names", "voice_ids", "segment_lengths")
+
+    def __init__(self,
+                 name: str,
+                 source: Path,
+                 digest: str,
+                 phrase_ids: array,
+                 gaps: array,
+                 voice_names: Tuple[str, ...],
+                 voice_ids: array,
+                 segment_lengths: Tuple[int, ...]):
+        """
+        初始化编译后的节目
+
+        Args:
+            name: 节目名称
+            source: 定义文件路径
+            digest: 定义文件内容摘要
+            phrase_ids: 短语ID序列（uint16数组）
+            gaps: 每个命令之后的静音时长(秒，float32数组)，比phrase_ids少一个
+            voice_names: 节目用到的语音类型
+            voice_ids: 每个命令使用的语音在voice_names中的序号（uint8数组）
+            segment_lengths: 每个段落的命令数（最后一段为全部结束口令）
+        """
+        self.name = name
+        self.source = source
+        self.digest = digest
+        self.phrase_ids = phrase_ids
+        self.gaps = gaps
+        self.voice_names = voice_names
+        self.voice_ids = voice_ids
+        self.segment_lengths = segment_lengths
+
+    def voices(self) -> List[str]:
+        """每个命令使用的语音类型"""
+        return [self.voice_names[voice_id] for voice_id in self.voice_ids]
+
+
+def _parse_file(path: Path, data: bytes) -> dict:
+    """按扩展名解析节目定义文件"""
+    file_format = PROGRAM_CONFIG["formats"].get(path.suffix.lower())
+    if file_format == "toml":
+        import tomllib
+        return tomllib.loads(data.decode("utf-8"))
+    if file_format == "json":
+        return json.loads(data.decode("utf-8"))
+    if file_format == "yaml":
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"读取YAML节目定义需要安装PyYAML: {path}")
+        return yaml.safe_load(data.decode("utf-8"))
+    raise ValueError(f"不支持的节目定义格式: {path}（支持: {', '.join(PROGRAM_CONFIG['formats'])}）")
+
+
+def _check_number(errors: List[str], where: str, value, low: float, high: float, integer: bool = False):
+    """检查数值类型和范围"""
+    types = (int,) if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, types) or not (low <= value <= high):
+        kind = "整数" if integer else "数值"
+        errors.append(f"{where} 必须是 {low:g}-{high:g} 之间的{kind}: {value!r}")
+
+
+def validate_program(definition: dict) -> List[str]:
+    """
+    校验节目定义
+
+    Args:
+        definition: 解析后的节目定义
+
+    Returns:
+        错误信息列表，为空表示有效
+    """
+    if not isinstance(definition, dict):
+        return ["节目定义的顶层必须是键值表"]
+    errors = [f"未知的字段: {key}" for key in definition if key not in _PROGRAM_KEYS]
+
+    templates = definition.get("templates", {})
+    if not isinstance(templates, dict):
+        errors.append("templates 必须是键值表")
+        templates = {}
+    for key, template in templates.items():
+        if key not in STRAIGHT_CUT_TEMPLATES:
+            errors.append(f"未知的模板: {key}（可用: {', '.join(STRAIGHT_CUT_TEMPLATES)}）")
+            continue
+        if not isinstance(template, str):
+            errors.append(f"模板 {key} 必须是字符串: {template!r}")
+            continue
+        fields = _TEMPLATE_FIELDS.get(key, {})
+        try:
+            if not template.format(**fields).strip():
+                errors.append(f"模板 {key} 不能为空")
+        except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+            available = "、".join(f"{{{name}}}" for name in fields) or "无"
+            errors.append(f"模板 {key} 的占位符无效: {e}（可用: {available}）")
+
+    positions = dict(WRIST_POSITIONS)
+    attack_types = dict(ATTACK_TYPES)
+    for field, table, required in (("positions", positions, ("name", "guidance")),
+                                   ("attack_types", attack_types, ("name",))):
+        entries = definition.get(field, {})
+        if not isinstance(entries, dict):
+            errors.append(f"{field} 必须是键值表")
+            continue
+        for key, entry in entries.items():
+            if not isinstance(entry, dict) or any(not isinstance(entry.get(name), str) for name in required):
+                errors.append(f"{field}.{key} 需要字符串字段: {', '.join(required)}")
+                continue
+            table[str(key)] = entry
+
+    voice = definition.get("voice", DEFAULT_VOICE)
+    if not isinstance(voice, str) or voice not in VOICE_CONFIG:
+        errors.append(f"不支持的语音类型: {voice}。支持的类型: {', '.join(VOICE_CONFIG)}")
+    if "gap" in definition:
+        _check_number(errors, "gap", definition["gap"], 0, PROGRAM_CONFIG["max_gap"])
+    if "reminder_every" in definition:
+        _check_number(errors, "reminder_every", definition["reminder_every"], 0, PROGRAM_CONFIG["max_count"], True)
+
+    segments = definition.get("segments")
+    if not isinstance(segments, list) or not segments:
+        errors.append("segments 必须是非空列表")
+        return errors
+    for index, segment in enumerate(segments, 1):
+        where = f"segments[{index}]"
+        if not isinstance(segment, dict):
+            errors.append(f"{where} 必须是键值表")
+            continue
+        errors.extend(f"{where} 未知的字段: {key}" for key in segment if key not in _SEGMENT_KEYS)
+        # 先检查类型：列表等不可哈希的值不能直接做成员判断
+        attack_type = segment.get("attack_type")
+        if not isinstance(attack_type, str) or attack_type not in attack_types:
+            errors.append(f"{where}.attack_type 无效: {attack_type!r}（可用: {', '.join(attack_types)}）")
+        position = segment.get("position")
+        if isinstance(position, bool) or not isinstance(position, (str, int)) or str(position) not in positions:
+            errors.append(f"{where}.position 无效: {segment.get('position')!r}（可用: {', '.join(positions)}）")
+        _check_number(errors, f"{where}.count", segment.get("count"), 1, PROGRAM_CONFIG["max_count"], True)
+        if "gap" in segment:
+            _check_number(errors, f"{where}.gap", segment["gap"], 0, PROGRAM_CONFIG["max_gap"])
+        if "reminder_every" in segment:
+            _check_number(errors, f"{where}.reminder_every", segment["reminder_every"],
+                          0, PROGRAM_CONFIG["max_count"], True)
+        if "voice" in segment and (not isinstance(segment["voice"], str) or segment["voice"] not in VOICE_CONFIG):
+            errors.append(f"{where}.voice 不支持: {segment['voice']}")
+    return errors
+
+
+def compile_program(definition: dict, source: Path, digest: str,
+                    phrase_table: PhraseTable = DEFAULT_PHRASE_TABLE) -> CompiledProgram:
+    """
+    把已校验的节目定义编译为短语ID计划
+
+    Args:
+        definition: 节目定义
+        source: 定义文件路径
+        digest: 定义文件内容摘要
+        phrase_table: 短语表
+
+    Returns:
+        编译后的节目
+    """
+    templates = dict(STRAIGHT_CUT_TEMPLATES, **definition.get("templates", {}))
+    positions = dict(WRIST_POSITIONS, **{str(key): value for key, value in definition.get("positions", {}).items()})
+    attack_types = dict(ATTACK_TYPES, **definition.get("attack_types", {}))
+    default_voice = definition.get("voice", DEFAULT_VOICE)
+    default_gap = definition.get("gap", AUDIO_CONFIG["silence_duration"])
+    default_reminder = definition.get("reminder_every", PROGRAM_CONFIG["default_reminder_every"])
+
+    def intern(kind: str, **fields) -> int:
+        return phrase_table.intern(templates[kind].format(**fields), kind)
+
+    phrase_ids: List[int] = []
+    gaps: List[float] = []
+    voices: List[str] = []
+    segment_lengths = []
+    for segment in definition["segments"]:
+        position = positions[str(segment["position"])]
+        attack_type = attack_types[segment["attack_type"]]
+        reminder_every = segment.get("reminder_every", default_reminder)
+
+        ids = [intern("segment_start", target_area=position["name"], attack_type=attack_type["name"]),
+               intern("action_guidance", wrist_guidance=position["guidance"])]
+        for i in range(1, segment["count"] + 1):
+            ids += [intern("count", count=i), intern("hold"), intern("return_position")]
+            if reminder_every and i % reminder_every == 0:
+                ids.append(intern("reminder"))
+        ids.append(intern("segment_complete", target_area=position["name"], attack_type=attack_type["name"]))
+
+        phrase_ids += ids
+        gaps += [segment.get("gap", default_gap)] * len(ids)
+        voices += [segment.get("voice", default_voice)] * len(ids)
+        segment_lengths.append(len(ids))
+
+    phrase_ids.append(intern("all_complete"))
+    voices.append(default_voice)
+    segment_lengths.append(1)
+
+    voice_names = tuple(dict.fromkeys(voices))
+    return CompiledProgram(
+        name=str(definition.get("name") or source.stem),
+        source=source,
+        digest=digest,
+        phrase_ids=array("H", phrase_ids),
+        gaps=array("f", gaps),
+        voice_names=voice_names,
+        voice_ids=array("B", (voice_names.index(voice) for voice in voices)),
+        segment_lengths=tuple(segment_lengths),
+    )
+
+
+class ProgramLoader:
+    """节目定义加载器：按文件内容摘要缓存编译结果，只重新编译变化的文件"""
+
+    def __init__(self, phrase_table: PhraseTable = DEFAULT_PHRASE_TABLE, cache_dir: Optional[Path] = None):
+        """
+        初始化节目定义加载器
+
+        Args:
+            phrase_table: 编译使用的短语表
+            cache_dir: 编译结果缓存目录，默认使用CACHE_CONFIG中的配置
+        """
+        self.phrase_table = phrase_table
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG["program_dir"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # 路径 -> ((修改时间, 大小), 编译结果)
+        self._loaded: Dict[Path, Tuple[Tuple[int, int], CompiledProgram]] = {}
+        # 加载失败的文件 -> 失败时的(修改时间, 大小)，文件未再修改时不重复报告
+        self._failed: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+        # 统计信息
+        self.compiled = 0  # 解析、校验并编译的文件数
+        self.disk_hits = 0  # 从磁盘缓存读取编译结果的文件数
+        self.reused = 0  # 文件未变化、直接复用内存中结果的次数
+
+    def discover(self, sources: Iterable[Path]) -> List[Path]:
+        """
+        展开节目定义来源：文件原样保留，目录取其中全部支持格式的文件（按名称排序）
+
+        Args:
+            sources: 文件或目录路径
+
+        Returns:
+            节目定义文件列表
+        """
+        paths = []
+        for source in sources:
+            source = Path(source)
+            if source.is_dir():
+                paths.extend(sorted(path for path in source.iterdir()
+                                    if path.suffix.lower() in PROGRAM_CONFIG["formats"] and path.is_file()))
+            else:
+                paths.append(source)
+        return list(dict.fromkeys(path.resolve() for path in paths))
+
+    def load(self, path: Path) -> CompiledProgram:
+        """
+        加载单个节目定义
+
+        Args:
+            path: 定义文件路径
+
+        Returns:
+            编译后的节目
+
+        Raises:
+            ValueError: 文件格式不支持、无法读取或定义无效（其它异常也转换为ValueError，
+                --watch 时一个文件出错不会中断监视）
+        """
+        path = Path(path).resolve()
+        try:
+            return self._load(path)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"节目定义加载失败: {path} - {type(e).__name__}: {e}")
+
+    def _load(self, path: Path) -> CompiledProgram:
+        """加载单个节目定义（load的实现）"""
+        try:
+            stat = path.stat()
+        except OSError as e:
+            raise ValueError(f"无法读取节目定义: {path} - {e}")
+        signature = (stat.st_mtime_ns, stat.st_size)
+        loaded = self._loaded.get(path)
+        if loaded is not None and loaded[0] == signature:
+            self.reused += 1
+            return loaded[1]
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data + path.suffix.lower().encode("utf-8")).hexdigest()
+        if loaded is not None and loaded[1].digest == digest:
+            # 只是修改时间变化（例如重新保存），内容相同
+            program = loaded[1]
+            self.reused += 1
+        else:
+            program = self._read_cache(path, digest)
+            if program is None:
+                try:
+                    definition = _parse_file(path, data)
+                except ValueError:
+                    raise
+                except Exception as e:
+                    raise ValueError(f"节目定义解析失败: {path} - {e}")
+                errors = validate_program(definition)
+                if errors:
+                    raise ValueError(f"节目定义无效: {path}\n" + "\n".join(f"  - {error}" for error in errors))
+                program = compile_program(definition, path, digest, self.phrase_table)
+                self.compiled += 1
+                self._write_cache(program)
+        self._loaded[path] = (signature, program)
+        return program
+
+    def refresh(self, sources: Iterable[Path],
+                errors: Optional[List[str]] = None) -> Tuple[List[CompiledProgram], List[Path]]:
+        """
+        重新检查节目定义，返回内容发生变化或新增的节目，以及已删除的文件
+
+        Args:
+            sources: 文件或目录路径
+            errors: 提供时无效的定义记录到该列表并跳过（同一版本只报告一次），否则抛出异常
+
+        Returns:
+            (变化或新增的节目列表, 已删除的文件列表)
+        """
+        paths = self.discover(sources)
+        removed = [path for path in self._loaded if path not in paths]
+        for path in removed:
+            del self._loaded[path]
+
+        changed = []
+        for path in paths:
+            previous = self._loaded.get(path)
+            try:
+                program = self.load(path)
+            except ValueError as e:
+                if errors is None:
+                    raise
+                signature = self._signature(path)
+                if self._failed.get(path) != signature:
+                    self._failed[path] = signature
+                    errors.append(str(e))
+                continue
+            self._failed.pop(path, None)
+            if previous is None or previous[1].digest != program.digest:
+                changed.append(program)
+        return changed, removed
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        """文件的(修改时间, 大小)，文件不存在时返回None"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _cache_key(self, digest: str) -> str:
+        """磁盘缓存键：文件内容摘要加上编译所依赖的内置配置"""
+        payload = json.dumps([_COMPILER_VERSION, digest, STRAIGHT_CUT_TEMPLATES, WRIST_POSITIONS, ATTACK_TYPES,
+                              AUDIO_CONFIG["silence_duration"], PROGRAM_CONFIG["default_reminder_every"]],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read_cache(self, path: Path, digest: str) -> Optional[CompiledProgram]:
+        """读取磁盘缓存的编译结果，把其中的局部短语表驻留到当前短语表"""
+        entry = self.cache_dir / f"{self._cache_key(digest)}.json"
+        try:
+            cached = json.loads(entry.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)
+        remap = [self.phrase_table.intern(text, kind) for text, kind in zip(cached["texts"], cached["kinds"])]
+        self.disk_hits += 1
+        return CompiledProgram(
+            name=cached["name"],
+            source=path,
+            digest=digest,
+            phrase_ids=array("H", (remap[local_id] for local_id in cached["phrase_ids"])),
+            gaps=array("f", cached["gaps"]),
+            voice_names=tuple(cached["voice_names"]),
+            voice_ids=array("B", cached["voice_ids"]),
+            segment_lengths=tuple(cached["segment_lengths"]),
+        )
+
+    def _write_cache(self, program: CompiledProgram):
+        """原子写入编译结果（短语ID换成节目内的局部序号，不依赖进程内的短语表）"""
+        local_ids = list(dict.fromkeys(program.phrase_ids))
+        index = {phrase_id: i for i, phrase_id in enumerate(local_ids)}
+        payload = {
+            "name": program.name,
+            "texts": [self.phrase_table.text(phrase_id) for phrase_id in local_ids],
+            "kinds": [self.phrase_table.kind(phrase_id) for phrase_id in local_ids],
+            "phrase_ids": [index[phrase_id] for phrase_id in program.phrase_ids],
+            "gaps": [round(gap, 3) for gap in program.gaps],
+            "voice_names": list(program.voice_names),
+            "voice_ids": list(program.voice_ids),
+            "segment_lengths": list(program.segment_lengths),
+        }
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_name, self.cache_dir / f"{self._cache_key(program.digest)}.json")
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+
+def test_program_config():
+    """测试节目定义的加载、校验和增量重新加载"""
+    import time
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        (temp_path / "lunge.toml").write_text(
+            'name = "弓步强化"\nvoice = "chinese"\nreminder_every = 5\n'
+            '[templates]\nhold = "稳住..."\n'
+            '[positions.6]\nname = "六部位"\nguidance = "手腕转动使手掌心朝外"\n'
+            '[[segments]]\nattack_type = "lunge"\nposition = "6"\ncount = 10\ngap = 2.5\n'
+            '[[segments]]\nattack_type = "stationary"\nposition = 3\ncount = 5\nvoice = "chinese_male"\n',
+            encoding="utf-8")
+        (temp_path / "basic.json").write_text(json.dumps({
+            "segments": [{"attack_type": "stationary", "position": "4", "count": 3}]
+        }), encoding="utf-8")
+
+        loader = ProgramLoader(cache_dir=temp_path / "cache")
+        programs, _ = loader.refresh([temp_path])
+        for program in programs:
+            print(f"{program.source.name}: {program.name}，{len(program.phrase_ids)} 个命令，"
+                  f"语音 {'/'.join(program.voice_names)}，段落 {program.segment_lengths}")
+        table = loader.phrase_table
+        lunge = programs[1]
+        print("前6个命令:", " | ".join(table.text(phrase_id) for phrase_id in lunge.phrase_ids[:6]))
+
+        changed, _ = loader.refresh([temp_path])
+        print(f"未修改时重新加载: 变化 {len(changed)} 个，复用 {loader.reused} 次")
+
+        time.sleep(0.01)
+        (temp_path / "basic.json").write_text(json.dumps({
+            "segments": [{"attack_type": "stationary", "position": "4", "count": 4}]
+        }), encoding="utf-8")
+        changed, _ = loader.refresh([temp_path])
+        print(f"修改一个文件后: 变化 {[program.source.name for program in changed]}，累计编译 {loader.compiled} 次")
+
+        fresh = ProgramLoader(cache_dir=temp_path / "cache")
+        fresh.refresh([temp_path])
+        print(f"新进程加载: 磁盘缓存命中 {fresh.disk_hits} 个，编译 {fresh.compiled} 个")
+
+        (temp_path / "bad.yaml").write_text("templates:\n  count: \"{target_area}{count}！\"\n"
+                                            "segments:\n  - attack_type: [jump]\n    position: 9\n    count: 99\n",
+                                            encoding="utf-8")
+        try:
+            loader.load(temp_path / "bad.yaml")
+        except ValueError as e:
+            print(e)
+
+
+if __name__ == "__main__":
+    test_program_config()
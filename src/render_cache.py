@@ -0,0 +1,297 @@
+"""
+渲染结果缓存模块
+
+以规范化的节目配置和所用片段的内容摘要为键缓存最终输出文件。
+完全相同的请求命中后直接以写时复制（或普通复制）交付已有文件，不再调用ffmpeg。
+输出文件不与缓存条目共享inode，用户原地修改输出（如编辑标签）不会破坏缓存。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config.cache import CACHE_CONFIG
+
+# Linux写时复制克隆（FICLONE）的ioctl编号
+FICLONE = 0x40049409
+
+
+def render_key(payload: dict) -> str:
+    """
+    计算渲染结果的缓存键
+
+    Args:
+        payload: 规范化的配置和片段摘要，可JSON序列化
+
+    Returns:
+        缓存键
+    """
+    normalized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    """尝试写时复制克隆文件，文件系统不支持时返回False"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    target.unlink(missing_ok=True)
+    return False
+
+
+def reflink_or_copy(source: Path, target: Path) -> str:
+    """
+    把文件交付到目标路径：优先写时复制，文件系统不支持时普通复制
+
+    不使用硬链接：共享inode时原地修改任一方都会改动另一方。
+
+    Args:
+        source: 源文件
+        target: 目标路径（已存在时先删除）
+
+    Returns:
+        使用的方式："reflink" 或 "copy"
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.unlink(missing_ok=True)
+    if _reflink(source, target):
+        return "reflink"
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+class RenderCache:
+    """渲染结果缓存（第三级缓存）"""
+
+    def __init__(self,
+                 cache_dir: Optional[Path] = None,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None):
+        """
+        初始化渲染结果缓存
+
+        Args:
+            cache_dir: 缓存目录，默认使用CACHE_CONFIG中的配置
+            max_bytes: 缓存容量上限(字节)，超出后按最近最少使用淘汰
+            max_age: 条目保留时长(秒)，超过后未被使用的条目会被删除
+        """
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG["render_dir"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else CACHE_CONFIG["render_max_bytes"]
+        self.max_age = max_age if max_age is not None else CACHE_CONFIG["render_max_age"]
+
+        # 音频文件总字节数，首次写入时扫描一次，之后增量维护
+        self._total_bytes: Optional[int] = None
+        # store/prune可能在多个线程中并发调用，保护_total_bytes和淘汰过程
+        self._lock = threading.RLock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry_paths(self, key: str, suffix: str) -> Tuple[Path, Path]:
+        """缓存条目的音频文件和元数据文件路径"""
+        return self.cache_dir / f"{key}{suffix}", self.cache_dir / f"{key}.json"
+
+    def fetch(self, key: str, output_path: Path) -> Optional[dict]:
+        """
+        命中时把缓存的输出交付到目标路径
+
+        Args:
+            key: 缓存键
+            output_path: 输出文件路径
+
+        Returns:
+            条目元数据（含命令偏移），未命中时返回None
+        """
+        entry, meta_path = self._entry_paths(key, output_path.suffix)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if entry.stat().st_size != meta["size_bytes"]:
+                raise ValueError("缓存条目大小不一致")
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        meta["delivered_by"] = reflink_or_copy(entry, output_path)
+        # 更新访问时间用于LRU淘汰和保留期计算
+        os.utime(meta_path)
+        self.hits += 1
+        return meta
+
+    def store(self, key: str, output_path: Path, offsets: List[Tuple[int, int]]) -> Path:
+        """
+        把刚渲染的输出存入缓存
+
+        Args:
+            key: 缓存键
+            output_path: 已渲染的输出文件
+            offsets: 每个命令的(起始, 结束)样本偏移，命中时用于重新生成字幕
+
+        Returns:
+            缓存条目路径
+        """
+        entry, meta_path = self._entry_paths(key, output_path.suffix)
+        try:
+            replaced = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            reflink_or_copy(output_path, Path(tmp_name))
+            os.replace(tmp_name, entry)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        meta = {
+            "key": key,
+            "size_bytes": output_path.stat().st_size,
+            "created": time.time(),
+            "offsets": [list(offset) for offset in offsets],
+        }
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_name, meta_path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        # 首次写入时完整扫描一次（同时清理过期条目），之后只在超出预算时才扫描目录
+        with self._lock:
+            if self._total_bytes is None:
+                self.prune()
+            else:
+                self._total_bytes += meta["size_bytes"] - replaced
+                if self._total_bytes > self.max_bytes:
+                    self.prune()
+        return entry
+
+    def prune(self) -> int:
+        """
+        删除超过保留期的条目，再按容量预算淘汰最近最少使用的条目
+
+        Returns:
+            删除的条目数
+        """
+        with self._lock:
+            removed = 0
+            now = time.time()
+            # 元数据文件的修改时间记录最近一次使用；其它进程可能同时删除条目，消失的文件直接跳过
+            metas = []
+            for meta_path in self.cache_dir.glob("*.json"):
+                try:
+                    mtime = meta_path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if now - mtime > self.max_age:
+                    self._remove(meta_path.stem)
+                    removed += 1
+                else:
+                    metas.append((mtime, meta_path))
+            metas.sort()
+
+            total = self._audio_bytes()
+            for _, meta_path in metas:
+                if total <= self.max_bytes:
+                    break
+                for entry in self.cache_dir.glob(f"{meta_path.stem}.*"):
+                    if entry.suffix != ".json":
+                        try:
+                            total -= entry.stat().st_size
+                        except FileNotFoundError:
+                            continue
+                self._remove(meta_path.stem)
+                removed += 1
+
+            self._total_bytes = total
+            self.evictions += removed
+            return removed
+
+    def _audio_bytes(self) -> int:
+        """缓存的音频文件总字节数"""
+        total = 0
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_file() or entry.suffix in (".json", ".tmp"):
+                continue
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                continue
+        return total
+
+    def _remove(self, key: str):
+        """删除一个条目的全部文件"""
+        for entry in self.cache_dir.glob(f"{key}.*"):
+            entry.unlink(missing_ok=True)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for entry in self.cache_dir.iterdir():
+                if entry.is_file():
+                    entry.unlink(missing_ok=True)
+            self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self._audio_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def test_render_cache():
+    """测试渲染结果缓存"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        cache = RenderCache(cache_dir=temp_path / "render", max_bytes=1024)
+
+        output = temp_path / "output.mp3"
+        output.write_bytes(b"\xff" * 600)
+        key = render_key({"attack_count": 3, "clips": ["a", "b"]})
+        cache.store(key, output, [(0, 100), (200, 300)])
+
+        delivered = temp_path / "again.mp3"
+        meta = cache.fetch(key, delivered)
+        print(f"命中: {meta is not None}，交付方式: {meta['delivered_by']}，内容一致: "
+              f"{delivered.read_bytes() == output.read_bytes()}")
+
+        # 原地修改交付的文件（如标签编辑器）不影响缓存条目
+        with open(delivered, "r+b") as f:
+            f.write(b"ID3")
+        third = temp_path / "third.mp3"
+        intact = cache.fetch(key, third) is not None and third.read_bytes() == output.read_bytes()
+        print(f"修改输出后缓存条目不变: {intact}")
+
+        # 第二个条目超出容量预算，最旧的条目被淘汰
+        other = render_key({"attack_count": 4, "clips": ["a", "b"]})
+        cache.store(other, output, [])
+        print(f"淘汰后首个条目命中: {cache.fetch(key, delivered) is not None}")
+        print(f"缓存统计: {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_render_cache()
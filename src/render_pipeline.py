@@ -0,0 +1,204 @@
+"""
+流式渲染流水线模块
+
+按时间线顺序合成片段、随到随解码，时间线前缀一旦完整就写入编码器，
+让网络密集的语音合成和CPU密集的编码同时进行。各阶段之间使用有界队列，
+下游变慢时上游自动等待（背压）。
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.voices import PIPELINE_CONFIG
+
+# 队列结束标记
+_DONE = object()
+
+
+class StreamingRenderer:
+    """流式渲染流水线：合成 -> 解码 -> 编码"""
+
+    def __init__(self,
+                 audio_processor,
+                 fetch_clip: Callable[[str, str], Awaitable[Path]],
+                 voices: List[str],
+                 lookahead: Optional[int] = None,
+                 decode_queue_size: Optional[int] = None):
+        """
+        初始化流式渲染流水线
+
+        Args:
+            audio_processor: 音频处理器（需带PCM缓存）
+            fetch_clip: 获取片段的协程函数，参数为(语音名称, 命令文本)
+            voices: 语音配置名称列表，各语音共用同一时间线
+            lookahead: 合成阶段最多领先编码的短语数
+            decode_queue_size: 已解码等待写入的短语数上限
+        """
+        self.audio_processor = audio_processor
+        self.pcm_cache = audio_processor.pcm_cache
+        self.fetch_clip = fetch_clip
+        self.voices = voices
+        self.lookahead = lookahead or PIPELINE_CONFIG["synthesis_lookahead"]
+        self.decode_queue_size = decode_queue_size or PIPELINE_CONFIG["decode_queue_size"]
+
+        # 各阶段完成时间（相对开始时间，秒）
+        self.stats: Dict[str, float] = {}
+
+    async def _fetch_all(self, text: str) -> Dict[str, Path]:
+        """获取一个短语在所有语音下的片段"""
+        paths = await asyncio.gather(*(self.fetch_clip(voice, text) for voice in self.voices))
+        return dict(zip(self.voices, paths))
+
+    def _decode(self, clips: Dict[str, Path]) -> Dict[str, np.ndarray]:
+        """解码一个短语在所有语音下的片段（在线程池中运行）"""
+        return {voice: self.pcm_cache.get(path) for voice, path in clips.items()}
+
+    async def run(self,
+                  commands: List[str],
+                  output_paths: Dict[str, Path],
+                  include_silence: bool = True,
+                  cadence=None) -> Dict[str, Tuple[List[Tuple[int, int]], int]]:
+        """
+        渲染并编码节目
+
+        Args:
+            commands: 按时间线顺序的命令文本
+            output_paths: 语音名称 -> 输出文件路径
+            include_silence: 是否在命令间插入静音
+            cadence: 固定节奏规划器(CadencePlanner)，为None时命令间使用固定静音
+
+        Returns:
+            语音名称 -> (每个命令的(起始, 结束)样本偏移, 节目总样本数)
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        synth_queue: asyncio.Queue = asyncio.Queue(maxsize=self.lookahead)
+        decoded_queue: asyncio.Queue = asyncio.Queue(maxsize=self.decode_queue_size)
+        synth_tasks: List[asyncio.Future] = []
+
+        async def produce():
+            # 按短语首次出现的顺序提交合成，队列满时暂停提交
+            for text in dict.fromkeys(commands):
+                task = asyncio.ensure_future(self._fetch_all(text))
+                synth_tasks.append(task)
+                await synth_queue.put((text, task))
+            await synth_queue.put(_DONE)
+
+        async def decode():
+            while True:
+                item = await synth_queue.get()
+                if item is _DONE:
+                    break
+                text, task = item
+                clips = await task
+                pcm = await loop.run_in_executor(None, self._decode, clips)
+                await decoded_queue.put((text, pcm))
+            self.stats["synthesis_done"] = time.perf_counter() - started
+            await decoded_queue.put(_DONE)
+
+        encoders = {}
+        for voice, output_path in output_paths.items():
+            # 先断开旧输出（旧版本可能以硬链接交付了渲染结果缓存条目），不原地覆盖
+            output_path.unlink(missing_ok=True)
+            encoders[voice] = await asyncio.create_subprocess_exec(
+                *self.audio_processor.encoder_args(output_path),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+
+        results = {voice: ([], 0) for voice in output_paths}
+
+        async def write():
+            decoded: Dict[str, Dict[str, np.ndarray]] = {}
+            positions = {voice: 0 for voice in encoders}
+            offsets = {voice: [] for voice in encoders}
+            for i, text in enumerate(commands):
+                # 短语按首次出现的顺序到达，新短语一定是队列中的下一个
+                while text not in decoded:
+                    item = await decoded_queue.get()
+                    if item is _DONE:
+                        raise RuntimeError(f"流水线提前结束: 缺少短语 {text[:20]}")
+                    decoded[item[0]] = item[1]
+
+                pcm = decoded[text]
+                slot = max(len(pcm[voice]) for voice in encoders)
+                if not include_silence or i == len(commands) - 1:
+                    gap = 0
+                elif cadence is not None:
+                    gap = cadence.gap_after(i, slot)
+                else:
+                    gap = self.audio_processor.gap_samples(None, i)
+                for voice, encoder in encoders.items():
+                    clip = pcm[voice]
+                    offsets[voice].append((positions[voice], positions[voice] + len(clip)))
+                    positions[voice] += slot + gap
+                    encoder.stdin.write(np.ascontiguousarray(clip, dtype=np.float32).tobytes())
+                    encoder.stdin.write(bytes(4 * (slot - len(clip) + gap)))
+                if "first_write" not in self.stats:
+                    self.stats["first_write"] = time.perf_counter() - started
+                # 等待编码器读走数据（背压）
+                await asyncio.gather(*(encoder.stdin.drain() for encoder in encoders.values()))
+
+            # 节目总长即写入编码器的样本数（最后一个命令之后不补静音）
+            for voice in encoders:
+                results[voice] = (offsets[voice], positions[voice])
+
+        stages = [asyncio.ensure_future(stage()) for stage in (produce, decode, write)]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for task in stages + synth_tasks:
+                task.cancel()
+            for encoder in encoders.values():
+                if encoder.returncode is None:
+                    encoder.kill()
+                    await encoder.wait()
+            raise
+
+        for voice, encoder in encoders.items():
+            encoder.stdin.close()
+            await encoder.stdin.wait_closed()
+            stderr = await encoder.stderr.read()
+            if await encoder.wait() != 0:
+                raise RuntimeError(f"FFmpeg错误: {stderr.decode('utf-8', errors='replace')}")
+
+        self.stats["encode_done"] = time.perf_counter() - started
+        return results
+
+
+def test_render_pipeline():
+    """测试流式渲染流水线（用延迟模拟网络合成）"""
+    import tempfile
+    from src.audio_processor import AudioProcessor
+    from src.pcm_cache import PCMCache
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        processor = AudioProcessor(pcm_cache=PCMCache(cache_dir=temp_path / "pcm"))
+
+        async def fetch_clip(voice: str, text: str) -> Path:
+            await asyncio.sleep(0.1)
+            clip = temp_path / f"{voice}_{abs(hash(text))}.mp3"
+            if not clip.exists():
+                t = np.arange(int(0.3 * len(text) * processor.sample_rate)) / processor.sample_rate
+                tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+                await asyncio.get_running_loop().run_in_executor(None, processor.encode_pcm, tone, clip)
+            return clip
+
+        commands = ["开始", "一", "二", "三", "一", "二", "三", "结束"]
+        renderer = StreamingRenderer(processor, fetch_clip, ["test"])
+        output = temp_path / "stream.mp3"
+        results = asyncio.run(renderer.run(commands, {"test": output}))
+        offsets, total = results["test"]
+        print(f"命令数: {len(offsets)}，总时长: {total / processor.sample_rate:.2f} 秒，"
+              f"文件时长: {processor.get_audio_duration(output):.2f} 秒")
+        print(f"阶段耗时: {renderer.stats}")
+
+
+if __name__ == "__main__":
+    test_render_pipeline()
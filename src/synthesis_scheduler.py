@@ -0,0 +1,52 @@
+"""
+语音合成调度模块
+
+限制同时进行的合成请求数和请求速率，所有合成任务共用一个调度器。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from asyncio_throttle import Throttler
+
+from config.voices import SYNTHESIS_CONFIG
+
+
+class SynthesisScheduler:
+    """语音合成调度器"""
+
+    def __init__(self,
+                 max_concurrency: Optional[int] = None,
+                 rate_limit: Optional[int] = None,
+                 rate_period: Optional[float] = None):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrency: 同时进行的请求数上限
+            rate_limit: 每个周期内允许发起的请求数
+            rate_period: 限速周期(秒)
+        """
+        self.max_concurrency = max_concurrency or SYNTHESIS_CONFIG["max_concurrency"]
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._throttler = Throttler(
+            rate_limit=rate_limit or SYNTHESIS_CONFIG["rate_limit"],
+            period=rate_period or SYNTHESIS_CONFIG["rate_period"]
+        )
+        self.submitted = 0
+
+    async def run(self, func: Callable[..., Awaitable[Any]], *args) -> Any:
+        """
+        在并发和速率限制下执行合成任务
+
+        Args:
+            func: 异步合成函数
+            *args: 传给合成函数的参数
+
+        Returns:
+            合成函数的返回值
+        """
+        async with self._semaphore:
+            async with self._throttler:
+                self.submitted += 1
+                return await func(*args)
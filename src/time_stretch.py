@@ -0,0 +1,88 @@
+"""
+变速模块
+
+用ffmpeg的atempo滤镜对PCM做保持音调的变速（WSOLA类算法），
+用于在节奏较快时缩短计数、保持和归位口令，无需修改语速重新合成。
+"""
+
+from typing import List
+
+import ffmpeg
+import numpy as np
+
+# 单个atempo滤镜支持的倍率范围，超出时串联多个滤镜
+_ATEMPO_MIN = 0.5
+_ATEMPO_MAX = 2.0
+
+
+def atempo_chain(factor: float) -> List[float]:
+    """
+    把变速倍率拆成若干个atempo滤镜的倍率
+
+    Args:
+        factor: 变速倍率（大于1加快，小于1放慢）
+
+    Returns:
+        各滤镜的倍率，乘积等于factor
+    """
+    if factor <= 0:
+        raise ValueError(f"变速倍率必须大于0: {factor}")
+    chain = []
+    while factor > _ATEMPO_MAX:
+        chain.append(_ATEMPO_MAX)
+        factor /= _ATEMPO_MAX
+    while factor < _ATEMPO_MIN:
+        chain.append(_ATEMPO_MIN)
+        factor /= _ATEMPO_MIN
+    chain.append(factor)
+    return chain
+
+
+def time_stretch(samples: np.ndarray, factor: float, sample_rate: int) -> np.ndarray:
+    """
+    保持音调改变PCM的播放速度
+
+    Args:
+        samples: float32单声道PCM数组
+        factor: 变速倍率（1.25表示时长缩短为原来的1/1.25）
+        sample_rate: 采样率
+
+    Returns:
+        变速后的float32单声道PCM数组
+    """
+    if factor == 1.0:
+        return samples
+
+    stream = ffmpeg.input('pipe:', format='f32le', ac=1, ar=sample_rate)
+    for tempo in atempo_chain(factor):
+        stream = stream.filter('atempo', tempo)
+    try:
+        out, _ = (
+            stream
+            .output('pipe:', format='f32le', ac=1, ar=sample_rate)
+            .run(input=memoryview(np.ascontiguousarray(samples, dtype=np.float32)).cast("B"),
+                 capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        stderr_output = e.stderr.decode('utf-8') if e.stderr else 'No stderr output'
+        raise RuntimeError(f"变速处理失败: {stderr_output}")
+    return np.frombuffer(out, dtype=np.float32)
+
+
+def test_time_stretch():
+    """测试变速处理"""
+    sample_rate = 44100
+    t = np.arange(sample_rate * 2) / sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    for factor in (0.8, 1.25, 3.0):
+        stretched = time_stretch(tone, factor, sample_rate)
+        # 用过零点数估算频率，确认音调不变
+        crossings = np.count_nonzero(np.diff(np.signbit(stretched[1000:-1000])))
+        frequency = crossings / 2 / ((len(stretched) - 2000) / sample_rate)
+        print(f"倍率 {factor}: 滤镜 {atempo_chain(factor)}，时长 {len(tone) / sample_rate:.2f} -> "
+              f"{len(stretched) / sample_rate:.2f} 秒，频率约 {frequency:.0f} Hz")
+
+
+if __name__ == "__main__":
+    test_time_stretch()
@@ -4,7 +4,8 @@
 生成击剑训练的完整语音命令序列。
 """
 
-from typing import List, Dict
+import sys
+from typing import List, Dict, Iterator, Tuple
 from pathlib import Path
 import tempfile
 from config.wrist_positions import (
@@ -13,48 +14,220 @@ from config.wrist_positions import (
 
 
 
+class PhraseTable:
+    """
+    短语表
+
+    将命令文本驻留为紧凑的短语ID。模板按(部位, 攻击类型)只编译一次，
+    各组合的ID序列按(组合, 次数)备忘，生成命令时不再重复格式化字符串。
+    """
+
+    def __init__(self):
+        """初始化短语表"""
+        self.texts: List[str] = []
+        self.kinds: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._compiled: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+        self._count_ids: List[int] = []
+        self._segments: Dict[Tuple[str, str, int], Tuple[int, ...]] = {}
+
+    def intern(self, text: str, kind: str) -> int:
+        """
+        驻留命令文本
+
+        Args:
+            text: 命令文本
+            kind: 命令类型（模板键名）
+
+        Returns:
+            短语ID
+        """
+        phrase_id = self._ids.get(text)
+        if phrase_id is None:
+            phrase_id = len(self.texts)
+            self._ids[text] = phrase_id
+            self.texts.append(sys.intern(text))
+            self.kinds.append(kind)
+        return phrase_id
+
+    def text(self, phrase_id: int) -> str:
+        """获取短语ID对应的文本"""
+        return self.texts[phrase_id]
+
+    def kind(self, phrase_id: int) -> str:
+        """获取短语ID对应的命令类型"""
+        return self.kinds[phrase_id]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def compile_segment(self, target_area: str, attack_type: str) -> Tuple[int, int, int]:
+        """
+        编译单个组合的模板
+
+        Args:
+            target_area: 目标部位 ('3', '4', '5')
+            attack_type: 攻击类型 ('stationary', 'lunge')
+
+        Returns:
+            (开始命令ID, 动作指导ID, 完成命令ID)
+        """
+        key = (target_area, attack_type)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            wrist_config = WRIST_POSITIONS[target_area]
+            attack_config = ATTACK_TYPES[attack_type]
+            compiled = (
+                self.intern(STRAIGHT_CUT_TEMPLATES["segment_start"].format(
+                    target_area=wrist_config["name"],
+                    attack_type=attack_config["name"]
+                ), "segment_start"),
+                self.intern(STRAIGHT_CUT_TEMPLATES["action_guidance"].format(
+                    wrist_guidance=wrist_config["guidance"]
+                ), "action_guidance"),
+                self.intern(STRAIGHT_CUT_TEMPLATES["segment_complete"].format(
+                    target_area=wrist_config["name"],
+                    attack_type=attack_config["name"]
+                ), "segment_complete"),
+            )
+            self._compiled[key] = compiled
+        return compiled
+
+    def count_id(self, count: int) -> int:
+        """获取计数口令（"N！"）的短语ID"""
+        while len(self._count_ids) < count:
+            n = len(self._count_ids) + 1
+            self._count_ids.append(
+                self.intern(STRAIGHT_CUT_TEMPLATES["count"].format(count=n), "count")
+            )
+        return self._count_ids[count - 1]
+
+    def fixed_id(self, template_key: str) -> int:
+        """获取无参数模板（保持、归位、提醒、全部结束）的短语ID"""
+        return self.intern(STRAIGHT_CUT_TEMPLATES[template_key], template_key)
+
+    def segment_ids(self, target_area: str, attack_type: str, count: int) -> Tuple[int, ...]:
+        """
+        获取单个组合的短语ID序列（按组合和次数备忘）
+
+        Args:
+            target_area: 目标部位 ('3', '4', '5')
+            attack_type: 攻击类型 ('stationary', 'lunge')
+            count: 攻击次数
+
+        Returns:
+            短语ID元组
+        """
+        key = (target_area, attack_type, count)
+        ids = self._segments.get(key)
+        if ids is None:
+            start_id, guidance_id, complete_id = self.compile_segment(target_area, attack_type)
+            hold_id = self.fixed_id("hold")
+            return_id = self.fixed_id("return_position")
+            reminder_id = self.fixed_id("reminder")
+
+            sequence = [start_id, guidance_id]
+            for i in range(1, count + 1):
+                sequence.extend((self.count_id(i), hold_id, return_id))
+
+                # 每20次提醒
+                if i % 20 == 0:
+                    sequence.append(reminder_id)
+            sequence.append(complete_id)
+
+            ids = tuple(sequence)
+            self._segments[key] = ids
+        return ids
+
+    def reachable_ids(self, attack_types: List[str], target_areas: List[str], max_count: int) -> List[int]:
+        """
+        枚举给定攻击类型、部位和次数1..max_count可能用到的全部短语
+
+        Args:
+            attack_types: 攻击类型列表
+            target_areas: 目标部位列表
+            max_count: 最大攻击次数
+
+        Returns:
+            去重后的短语ID列表
+        """
+        phrase_ids = []
+        for attack_type in attack_types:
+            for target_area in target_areas:
+                phrase_ids.extend(self.compile_segment(target_area, attack_type))
+        phrase_ids.extend(self.count_id(i) for i in range(1, max_count + 1))
+        for template_key in ("hold", "return_position", "reminder", "all_complete"):
+            phrase_ids.append(self.fixed_id(template_key))
+        return list(dict.fromkeys(phrase_ids))
+
+
+# 进程内共享的默认短语表
+DEFAULT_PHRASE_TABLE = PhraseTable()
+
+
 class StraightCutCommandGenerator:
     """直劈训练命令生成器"""
 
-    def __init__(self, attack_types: List[str], target_areas: List[str]):
+    def __init__(self, attack_types: List[str], target_areas: List[str],
+                 phrase_table: PhraseTable = DEFAULT_PHRASE_TABLE):
         """
         初始化直劈命令生成器
 
         Args:
             attack_types: 攻击类型列表 ['stationary', 'lunge']
             target_areas: 目标部位列表 ['3', '4', '5']
+            phrase_table: 短语表，默认使用进程内共享的短语表
         """
         self.attack_types = attack_types
         self.target_areas = target_areas
+        self.phrase_table = phrase_table
         self.combinations = [
             (attack_type, target_area)
             for attack_type in attack_types
             for target_area in target_areas
         ]
 
-    def generate_all_commands(self, count: int) -> List[str]:
+    def iter_segment_phrase_ids(self, count: int) -> Iterator[Tuple[int, ...]]:
         """
-        生成所有组合的训练命令
+        逐个组合产出短语ID序列，最后产出全部结束命令
+
+        Args:
+            count: 每个组合的攻击次数
+
+        Yields:
+            短语ID元组（备忘结果，可安全共享）
+        """
+        for attack_type, target_area in self.combinations:
+            yield self.phrase_table.segment_ids(target_area, attack_type, count)
+        yield (self.phrase_table.fixed_id("all_complete"),)
+
+    def generate_all_phrase_ids(self, count: int) -> List[int]:
+        """
+        生成所有组合的短语ID序列
 
         Args:
             count: 每个组合的攻击次数
 
         Returns:
-            完整命令文本列表
+            短语ID列表
         """
-        all_commands = []
+        phrase_ids = []
+        for segment_ids in self.iter_segment_phrase_ids(count):
+            phrase_ids.extend(segment_ids)
+        return phrase_ids
 
-        # 生成所有组合的训练
-        for attack_type, target_area in self.combinations:
-            segment_commands = self._generate_segment_commands(
-                target_area, attack_type, count
-            )
-            all_commands.extend(segment_commands)
+    def generate_all_commands(self, count: int) -> List[str]:
+        """
+        生成所有组合的训练命令
 
-        # 全部训练结束
-        all_commands.append(STRAIGHT_CUT_TEMPLATES["all_complete"])
+        Args:
+            count: 每个组合的攻击次数
 
-        return all_commands
+        Returns:
+            完整命令文本列表
+        """
+        texts = self.phrase_table.texts
+        return [texts[phrase_id] for phrase_id in self.generate_all_phrase_ids(count)]
 
     def _generate_segment_commands(self, target_area: str, attack_type: str, count: int) -> List[str]:
         """
@@ -68,41 +241,8 @@ class StraightCutCommandGenerator:
         Returns:
             命令文本列表
         """
-        commands = []
-        wrist_config = WRIST_POSITIONS[target_area]
-        attack_config = ATTACK_TYPES[attack_type]
-
-        # 开始本段训练
-        start_command = STRAIGHT_CUT_TEMPLATES["segment_start"].format(
-            target_area=wrist_config["name"],
-            attack_type=attack_config["name"]
-        )
-        commands.append(start_command)
-
-        # 动作指导
-        guidance_command = STRAIGHT_CUT_TEMPLATES["action_guidance"].format(
-            wrist_guidance=wrist_config["guidance"]
-        )
-        commands.append(guidance_command)
-
-        # 计数序列
-        for i in range(1, count + 1):
-            commands.append(STRAIGHT_CUT_TEMPLATES["count"].format(count=i))
-            commands.append(STRAIGHT_CUT_TEMPLATES["hold"])
-            commands.append(STRAIGHT_CUT_TEMPLATES["return_position"])
-
-            # 每20次提醒
-            if i % 20 == 0:
-                commands.append(STRAIGHT_CUT_TEMPLATES["reminder"])
-
-        # 本段训练完成
-        complete_command = STRAIGHT_CUT_TEMPLATES["segment_complete"].format(
-            target_area=wrist_config["name"],
-            attack_type=attack_config["name"]
-        )
-        commands.append(complete_command)
-
-        return commands
+        texts = self.phrase_table.texts
+        return [texts[phrase_id] for phrase_id in self.phrase_table.segment_ids(target_area, attack_type, count)]
 
     def get_training_summary(self, attack_count: int) -> Dict:
         """
@@ -9,22 +9,33 @@ import edge_tts
 import tempfile
 import os
 from pathlib import Path
-from typing import List, Optional
-from config.voices import VOICE_CONFIG, DEFAULT_VOICE
+from typing import Dict, List, Optional
+from config.cache import CACHE_CONFIG
+from config.voices import VOICE_CONFIG, DEFAULT_VOICE, SYNTHESIS_CONFIG
+from src.clip_validator import validate_clip
 
 class TTSGenerator:
     """TTS语音生成器"""
 
-    def __init__(self, voice_name: str = DEFAULT_VOICE):
+    def __init__(self, voice_name: str = DEFAULT_VOICE, clip_cache=None, scheduler=None):
         """
         初始化TTS生成器
 
         Args:
             voice_name: 语音配置名称
+            clip_cache: 语音片段缓存(ClipCache)，提供时合成结果按文本和语音参数缓存
+            scheduler: 合成调度器(SynthesisScheduler)，提供时合成请求受其并发和速率限制
         """
+        self.voice_name = voice_name
         self.voice_config = VOICE_CONFIG.get(voice_name, VOICE_CONFIG[DEFAULT_VOICE])
         self.temp_dir = Path(tempfile.gettempdir()) / "fencing_trainer"
         self.temp_dir.mkdir(exist_ok=True)
+        self.clip_cache = clip_cache
+        self.scheduler = scheduler
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # 统计信息：校验不通过而丢弃的片段数（合成结果和已有缓存都计入）
+        self.invalid_clips = 0
 
     async def generate_audio(self, text: str, output_path: Optional[Path] = None) -> Path:
         """
@@ -53,6 +64,140 @@ class TTSGenerator:
         except Exception as e:
             raise RuntimeError(f"TTS生成失败: {text[:20]}... - {str(e)}")
 
+    def is_cached(self, text: str) -> bool:
+        """检查文本的语音片段是否已缓存且有效（无效的缓存条目会被丢弃）"""
+        if self.clip_cache is None:
+            return False
+        key = self.clip_cache.key(text, self.voice_config)
+        if not self.clip_cache.contains(key):
+            return False
+        return self._check_cached(key, self.clip_cache.path(key), text)
+
+    def _check_cached(self, key: str, path: Path, text: str) -> bool:
+        """校验已有的缓存条目，无效时丢弃以便重新合成"""
+        return self._accept_cached(key, validate_clip(path, text))
+
+    async def _check_cached_async(self, key: str, path: Path, text: str) -> bool:
+        """_check_cached的异步版本：读取和逐帧解析片段在线程池中进行，不阻塞事件循环"""
+        reason = await asyncio.get_running_loop().run_in_executor(None, validate_clip, path, text)
+        if reason is None:
+            return True
+        self.invalid_clips += 1
+        await self._cache_call(self.clip_cache.discard, key)
+        return False
+
+    async def _cache_call(self, func, *args):
+        """
+        调用片段缓存的方法
+
+        配置共享后端时，这些方法会从共享挂载复制文件或等待SQLite锁（最长30秒），
+        在线程池中运行，避免所有协程在事件循环上排队；只有本地缓存时直接调用。
+        """
+        if self.clip_cache.backend is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _accept_cached(self, key: str, reason: Optional[str]) -> bool:
+        """根据校验结果保留或丢弃缓存条目"""
+        if reason is None:
+            return True
+        self.invalid_clips += 1
+        self.clip_cache.discard(key)
+        return False
+
+    async def generate_clip(self, text: str) -> Path:
+        """
+        获取文本的缓存语音片段，未命中时合成并发布到缓存
+
+        同一文本的并发请求只合成一次。
+
+        Args:
+            text: 要合成的文本
+
+        Returns:
+            缓存中的片段路径
+        """
+        if self.clip_cache is None:
+            return await self.generate_audio(text)
+
+        key = self.clip_cache.key(text, self.voice_config)
+        cached = await self._cache_call(self.clip_cache.lookup, key)
+        if cached is not None and await self._check_cached_async(key, cached, text):
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._synthesize_to_cache(text, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    async def _wait_for_claim(self, key: str, text: str) -> Optional[Path]:
+        """
+        认领合成任务；其它节点正在合成时等待其发布，租约过期后由本节点接手
+
+        Returns:
+            其它节点已发布的片段路径，需要本节点合成时返回None
+        """
+        while True:
+            claimed = await self._cache_call(self.clip_cache.claim, key)
+            while not claimed:
+                await asyncio.sleep(CACHE_CONFIG["shared_poll_interval"])
+                if await self._cache_call(self.clip_cache.contains, key):
+                    break
+                claimed = await self._cache_call(self.clip_cache.claim, key)
+
+            # 认领前后其它节点可能刚好发布完成
+            if await self._cache_call(self.clip_cache.contains, key):
+                cached = await self._cache_call(self.clip_cache.lookup, key)
+                if cached is not None and await self._check_cached_async(key, cached, text):
+                    if claimed:
+                        await self._cache_call(self.clip_cache.release, key)
+                    return cached
+                if not claimed:
+                    # 发布的片段无效已被丢弃：重新认领，不能在未认领时合成，否则等待的节点会各自重复合成
+                    continue
+            return None
+
+    async def _synthesize_to_cache(self, text: str, key: str) -> Path:
+        """合成到临时文件，校验通过后原子发布到缓存；失败或片段无效时有限次重试"""
+        cached = await self._wait_for_claim(key, text)
+        if cached is not None:
+            return cached
+
+        max_attempts = SYNTHESIS_CONFIG["max_attempts"]
+        for attempt in range(1, max_attempts + 1):
+            temp_path = self.clip_cache.temp_path(key)
+            try:
+                if self.scheduler is not None:
+                    await self.scheduler.run(self.generate_audio, text, temp_path)
+                else:
+                    await self.generate_audio(text, temp_path)
+                reason = await asyncio.get_running_loop().run_in_executor(None, validate_clip, temp_path, text)
+                if reason is not None:
+                    self.invalid_clips += 1
+                    raise RuntimeError(f"语音片段无效: {text[:20]} - {reason}")
+                return await self._cache_call(self.clip_cache.publish, key, temp_path)
+            except Exception:
+                if attempt == max_attempts:
+                    await self._cache_call(self.clip_cache.release, key)
+                    raise
+                await asyncio.sleep(SYNTHESIS_CONFIG["retry_backoff"] * 2 ** (attempt - 1))
+            finally:
+                temp_path.unlink(missing_ok=True)
+
+    async def generate_clips(self, texts: List[str]) -> List[Path]:
+        """
+        并发获取多个文本的缓存语音片段
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            片段路径列表，顺序与texts一致
+        """
+        return await asyncio.gather(*(self.generate_clip(text) for text in texts))
+
     async def generate_multiple_audio(self, texts: List[str]) -> List[Path]:
         """
         批量生成多个文本的音频文件